@@ -112,12 +112,12 @@ export function ChatInterface() {
             setCurrentStatus(status as { step: "generating_sql" | "executing_sql" | "generating_answer" | "generating_chart"; message: string });
           }
         },
-        (chartBase64) => {
+        (chartUrl) => {
           // Chart image received
           setMessages((prev) =>
             prev.map((msg) =>
               msg.id === assistantMessageId
-                ? { ...msg, chartImage: chartBase64 }
+                ? { ...msg, chartUrl }
                 : msg
             )
           );
@@ -71,7 +71,7 @@ export function MessageBubble({ message }: MessageBubbleProps) {
         )}
 
         {/* 2.5. Chart Image - Show after results, before answer */}
-        {message.chartImage && (
+        {message.chartUrl && (
           <div className="w-full rounded-lg bg-[#1a1a1a] border border-white/10 p-3">
             <div className="flex items-center gap-2 mb-2">
               <svg className="w-4 h-4 text-white/60" fill="none" stroke="currentColor" viewBox="0 0 24 24">
@@ -82,7 +82,7 @@ export function MessageBubble({ message }: MessageBubbleProps) {
               </span>
             </div>
             <img 
-              src={`data:image/png;base64,${message.chartImage}`}
+              src={message.chartUrl}
               alt="Generated chart"
               className="w-full rounded-lg"
             />
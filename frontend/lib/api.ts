@@ -2,6 +2,12 @@ import { ChatResponse } from "@/types/chat";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
+// One conversation per page load, so follow-ups ("now only the top 5") can reuse the last result
+const SESSION_ID =
+  typeof crypto !== "undefined" && "randomUUID" in crypto
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
 export async function sendChatMessage(
   question: string,
   stream: boolean = true,
@@ -9,7 +15,7 @@ export async function sendChatMessage(
   onChunk?: (chunk: string, eventType?: string) => void,
   onMetadata?: (metadata: { sql: string; data: any[] }) => void,
   onStatus?: (status: { step: string; message: string }) => void,
-  onChart?: (chartBase64: string) => void
+  onChart?: (chartUrl: string) => void
 ): Promise<ChatResponse> {
   if (stream) {
     // Streaming response
@@ -18,7 +24,7 @@ export async function sendChatMessage(
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify({ question, stream: true, document_mode: documentMode }),
+      body: JSON.stringify({ question, stream: true, document_mode: documentMode, session_id: SESSION_ID }),
     });
 
     if (!response.ok) {
@@ -30,7 +36,7 @@ export async function sendChatMessage(
     let sql = "";
     let responseData: any[] = [];
     let answer = "";
-    let chartImage: string | undefined;
+    let chartUrl: string | undefined;
 
     if (!reader) {
       throw new Error("No response body");
@@ -74,10 +80,10 @@ export async function sendChatMessage(
                 onMetadata({ sql, data: responseData });
               }
             } else if (data.type === "chart_image") {
-              // Chart image received
-              chartImage = data.image;
+              // Chart stored server-side; the event only carries its URL
+              chartUrl = `${API_URL}${data.url}`;
               if (onChart) {
-                onChart(data.image);
+                onChart(chartUrl);
               }
             } else if (data.type === "chart_error") {
               console.warn("Chart generation failed:", data.error);
@@ -139,7 +145,7 @@ export async function sendChatMessage(
       generated_sql: sql,
       data: responseData,
       answer,
-      chart_image: chartImage,
+      chart_url: chartUrl,
       status: "success",
     };
   } else {
@@ -149,7 +155,7 @@ export async function sendChatMessage(
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify({ question, stream: false, document_mode: documentMode }),
+      body: JSON.stringify({ question, stream: false, document_mode: documentMode, session_id: SESSION_ID }),
     });
 
     if (!response.ok) {
@@ -5,7 +5,7 @@ export interface ChatMessage {
   timestamp: Date;
   sql?: string;
   data?: any[];
-  chartImage?: string; // base64 encoded image
+  chartUrl?: string; // absolute URL of the stored chart image
 }
 
 export interface ChatResponse {
@@ -13,7 +13,7 @@ export interface ChatResponse {
   generated_sql: string;
   data: any[];
   answer: string;
-  chart_image?: string;
+  chart_url?: string;
   status: "success" | "error";
   error?: string;
 }
@@ -0,0 +1,109 @@
+-- SQL Setup for the partitioned sales_transactions schema (optional)
+-- Run this in your Supabase SQL Editor (Dashboard -> SQL Editor -> New Query)
+--
+-- sales_transactions is range-partitioned by year, so queries that filter on `year`
+-- only scan the matching partitions and single-year query time stays flat as history
+-- grows. Each partition gets a BRIN index on invoice_date (tiny, ideal for data that is
+-- appended roughly in date order) and a b-tree on month for month-level filters.
+-- Rows for years without a partition land in sales_transactions_default;
+-- ensure_sales_partition(year) creates a year's partition (moving any of its rows out of
+-- the default partition). The ingestion scripts call it before loading each year, with the
+-- service-role key (SUPABASE_SERVICE_ROLE_KEY): it runs DDL as SECURITY DEFINER, so it is
+-- not granted to the anon or authenticated roles the API uses.
+
+-- ==================== Table ====================
+
+CREATE TABLE public.sales_transactions (
+    id BIGSERIAL,
+    master_distributor TEXT,
+    distributor TEXT,
+    line_of_business TEXT,
+    supplier TEXT,
+    agency TEXT,
+    category TEXT,
+    segment TEXT,
+    brand TEXT,
+    sub_brand TEXT,
+    country TEXT,
+    city TEXT,
+    area TEXT,
+    retailer_group TEXT,
+    retailer_sub_group TEXT,
+    channel TEXT,
+    sub_channel TEXT,
+    salesman TEXT,
+    order_number TEXT,
+    customer TEXT,
+    customer_account_name TEXT,
+    customer_account_number TEXT,
+    item TEXT,
+    item_description TEXT,
+    promo_item BOOLEAN,
+    foc_nonfoc TEXT,
+    unit_selling_price NUMERIC,
+    invoice_number TEXT,
+    invoice_date DATE,
+    year INTEGER,
+    month INTEGER,
+    invoiced_quantity INTEGER,
+    value NUMERIC,
+    -- The partition key must be part of the primary key
+    PRIMARY KEY (id, year)
+) PARTITION BY RANGE (year);
+
+-- Rows whose year has no partition yet (year is NOT NULL as part of the primary key)
+CREATE TABLE public.sales_transactions_default PARTITION OF public.sales_transactions DEFAULT;
+
+-- Indexes declared on the parent are created on every partition automatically
+CREATE INDEX sales_transactions_invoice_date_brin ON public.sales_transactions USING BRIN (invoice_date);
+CREATE INDEX sales_transactions_month_idx ON public.sales_transactions (month);
+
+-- ==================== Partition management ====================
+
+CREATE OR REPLACE FUNCTION public.ensure_sales_partition(p_year integer)
+RETURNS text
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  partition_name text := format('sales_transactions_y%s', p_year);
+BEGIN
+  IF to_regclass('public.' || partition_name) IS NOT NULL THEN
+    RETURN partition_name;
+  END IF;
+
+  -- A new partition cannot be attached while the default partition holds rows for its
+  -- range, so build it standalone, move those rows over, then attach it.
+  EXECUTE format('CREATE TABLE public.%I (LIKE public.sales_transactions INCLUDING DEFAULTS)', partition_name);
+  EXECUTE format(
+    'WITH moved AS (DELETE FROM public.sales_transactions_default WHERE year = %s RETURNING *) '
+    'INSERT INTO public.%I SELECT * FROM moved', p_year, partition_name);
+  EXECUTE format(
+    'ALTER TABLE public.sales_transactions ATTACH PARTITION public.%I FOR VALUES FROM (%s) TO (%s)',
+    partition_name, p_year, p_year + 1);
+  RETURN partition_name;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.ensure_sales_partition(integer) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.ensure_sales_partition(integer) TO service_role;
+
+-- Initial partitions
+SELECT public.ensure_sales_partition(y) FROM generate_series(2022, EXTRACT(YEAR FROM CURRENT_DATE)::int + 1) AS y;
+
+-- ==================== Migrating an existing (non-partitioned) table ====================
+-- 1. Rename the old table before running the script above:
+--      ALTER TABLE public.sales_transactions RENAME TO sales_transactions_heap;
+-- 2. Run this script, then copy the data (rows are routed to their year's partition):
+--      SELECT public.ensure_sales_partition(year) FROM (SELECT DISTINCT year FROM public.sales_transactions_heap WHERE year IS NOT NULL) y;
+--      INSERT INTO public.sales_transactions SELECT * FROM public.sales_transactions_heap;
+--    If the old table stores month as TEXT ('JAN'..'DEC', as older ingestion wrote it), list the
+--    columns instead of SELECT * and convert month to 1-12:
+--      CASE WHEN btrim(month) ~ '^[0-9]+$' THEN btrim(month)::integer
+--           ELSE EXTRACT(MONTH FROM to_date(left(btrim(month), 3), 'MON'))::integer END
+--      SELECT setval(pg_get_serial_sequence('public.sales_transactions', 'id'), (SELECT MAX(id) FROM public.sales_transactions));
+-- 3. Verify row counts, then DROP TABLE public.sales_transactions_heap;
+
+-- ==================== Checks ====================
+-- Partition pruning: only sales_transactions_y2024 should appear in the plan
+EXPLAIN SELECT SUM(value) FROM public.sales_transactions WHERE year = 2024 AND month = 3;
@@ -1,12 +1,26 @@
 # src/app.py
-from fastapi import FastAPI
+from . import lifecycle  # imported first so start-up timing covers the whole app import
+from fastapi import FastAPI, Request
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, Response
+from fastapi.responses import StreamingResponse, Response, JSONResponse, FileResponse
 from pydantic import BaseModel
-from .llm import generate_sql, generate_final_answer, generate_final_answer_stream, generate_sql_stream, needs_chart, generate_chart_image, analyze_documents_stream, analyze_documents
-from .query import execute_sql
-import json
-import base64
+from typing import Dict, List, Literal, Optional
+from .llm import generate_final_answer_stream, generate_sql_stream, needs_chart, analyze_documents_stream, get_client, clean_sql, remember_sql, TEXT_MODEL
+from .query import execute_sql, execute_approximate, estimate_distinct
+from .pipeline import run_sql_question, run_document_question
+from .batch import run_batch, MAX_BATCH_QUESTIONS
+from .conversation import derive_follow_up, derived_sql_comment, save_context
+from .repair import SqlRepair
+from .narration import narrate, approximate_note
+from .planner import looks_compound, decompose, DecomposedQuery
+from .serialization import SSEEncoder, wants_gzip
+from .chart_store import get_or_create_chart, chart_url, load_chart, is_valid_chart_id, CACHE_CONTROL
+from .database import get_supabase
+from .cache import get_cache, record_request
+from .scheduler import get_scheduler, QueueStatus, SchedulerOverloaded
+from .profiling import SamplingProfiler, profile_stream, profile_requested, is_admin, list_profiles, profile_path, is_valid_profile_id
+from functools import lru_cache
 import os
 from pathlib import Path
 
@@ -25,10 +39,29 @@ class ChatRequest(BaseModel):
     question: str
     stream: bool = False
     document_mode: bool = False
+    # Enables conversational follow-ups that reuse this session's previous result
+    session_id: Optional[str] = None
+    # "auto": simple results are narrated from a template without an LLM call; "llm": always use the LLM
+    narration: Literal["auto", "llm"] = "auto"
+    # Estimate aggregations from the stratified sample (scaled, with confidence intervals)
+    approximate: bool = False
+    # Count active stores exactly instead of merging the HyperLogLog sketches
+    exact: bool = False
 
 
+class BatchRequest(BaseModel):
+    questions: List[str]
+    document_mode: bool = False
+    parallelism: int = 4
+    include_charts: bool = False
+    narration: Literal["auto", "llm"] = "auto"
+    # Requests/second per upstream provider ("gemini", "supabase"); 0 disables the limit
+    rate_limits: Optional[Dict[str, float]] = None
+
+
+@lru_cache(maxsize=1)
 def load_md_documents():
-    """Load Purchase Order and Proforma Invoice markdown documents"""
+    """Load Purchase Order and Proforma Invoice markdown documents (read once per process)"""
     # Get the project root directory (parent of src)
     project_root = Path(__file__).parent.parent
     pdf_data_dir = project_root / "pdf_data"
@@ -46,17 +79,226 @@ def load_md_documents():
         raise Exception(f"Failed to load MD documents: {str(e)}")
 
 
+# Warm-up hooks (run on start-up only when WARMUP_ON_STARTUP=1)
+@lifecycle.warmup_hook
+def warm_gemini_client():
+    get_client()
+
+
+@lifecycle.warmup_hook
+def warm_supabase_connection():
+    # Opens the HTTP connection pool and verifies the execute_sql RPC is reachable
+    get_supabase()
+    execute_sql("SELECT 1 AS ok")
+
+
+@lifecycle.warmup_hook
+def warm_documents():
+    load_md_documents()
+
+
+@app.on_event("startup")
+def on_startup():
+    lifecycle.run_startup()
+
+
 @app.get("/")
 def root():
-    return {"message": "Sales Analytics API is running", "endpoints": ["/chat", "/chat/stream", "/docs"]}
+    return {"message": "Sales Analytics API is running", "endpoints": ["/chat", "/chat/stream", "/chat/batch", "/healthz", "/readyz", "/cache/stats", "/llm/queue", "/docs"]}
+
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests (never touches upstream services)"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: start-up (and warm-up, if enabled) has finished; includes import-to-ready timings"""
+    report = lifecycle.startup_report()
+    if not report["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **report})
+    return {"status": "ready", **report}
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Shared cache hit rates and sizes per namespace, aggregated across all workers"""
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    last_warmup = cache.get_json("warmer", "last_report")
+    return {
+        "enabled": True,
+        "namespaces": cache.stats(),
+        "last_warmup": {k: v for k, v in last_warmup.items() if k != "entries"} if last_warmup else None,
+    }
+
+
+@app.get("/llm/queue")
+def llm_queue():
+    """Current LLM scheduler queue depth per model"""
+    return {"max_queue": get_scheduler().max_queue, "models": get_scheduler().stats()}
+
+
+@app.get("/admin/profiles")
+def admin_profiles(http_request: Request):
+    """Stored request profiles, newest first (admin only)"""
+    if not is_admin(http_request.headers.get("x-admin-token", "")):
+        return admin_forbidden()
+    return {"profiles": list_profiles()}
+
+
+@app.get("/admin/profiles/{profile_id}")
+def admin_profile(profile_id: str, http_request: Request):
+    """Download a profile as a speedscope file (open it at https://www.speedscope.app)"""
+    if not is_admin(http_request.headers.get("x-admin-token", "")):
+        return admin_forbidden()
+    path = profile_path(profile_id) if is_valid_profile_id(profile_id) else None
+    if path is None:
+        return JSONResponse(status_code=404, content={"status": "error", "error": "Profile not found"})
+    return FileResponse(path, media_type="application/json", filename=f"{profile_id}.speedscope.json")
+
+
+@app.get("/charts/{chart_id}")
+def get_chart(chart_id: str, request: Request):
+    """Serve a stored chart; content-addressed, so it can be cached forever by browsers and proxies"""
+    if not is_valid_chart_id(chart_id):
+        return JSONResponse(status_code=404, content={"status": "error", "error": "Chart not found"})
+    chart = load_chart(chart_id, request.headers.get("accept", ""))
+    if chart is None:
+        return JSONResponse(status_code=404, content={"status": "error", "error": "Chart not found"})
+    body, media_type, etag = chart
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def event_stream_response(events, http_request: Request, profiler: SamplingProfiler = None) -> StreamingResponse:
+    """Wrap a generator of event dicts as an SSE response (coalesced frames, optional gzip, optional profiling)"""
+    gzip = wants_gzip(http_request.headers.get("accept-encoding", ""))
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    if profiler is not None:
+        # The encoder pulls events on its producer thread; tracking is per thread, so profile the events there
+        events = profile_stream(profiler, events)
+    body = SSEEncoder(gzip=gzip).stream(events)
+    return StreamingResponse(body, media_type="text/event-stream", headers=headers)
+
+
+def overloaded_response(error: SchedulerOverloaded, question: str = None) -> JSONResponse:
+    """429 with Retry-After for requests shed by the LLM scheduler"""
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(max(1, round(error.retry_after)))},
+        content={"question": question, "error": str(error), "status": "error"},
+    )
+
+
+def queue_event(status: QueueStatus) -> dict:
+    return {'type': 'status', 'step': 'queued', 'queue_position': status.position,
+            'message': f'Waiting for model capacity (position {status.position} in queue)...'}
+
+
+def llm_events(chunks, event_type: str):
+    """Map an LLM text stream to events; queue positions become `status` events"""
+    for chunk in chunks:
+        if isinstance(chunk, QueueStatus):
+            yield queue_event(chunk)
+        else:
+            yield {'type': event_type, 'content': chunk}
+
+
+def error_event(error: Exception) -> dict:
+    event = {'type': 'error', 'error': str(error)}
+    if isinstance(error, SchedulerOverloaded):
+        event['status_code'] = 429
+        event['retry_after'] = error.retry_after
+    return event
+
+
+def chart_events(question: str, sql: str, data: list):
+    """Chart step: charts are served by URL from the content-addressed store, not inlined"""
+    if not needs_chart(question):
+        return
+    yield {'type': 'status', 'step': 'generating_chart', 'message': 'Generating chart...'}
+    try:
+        chart_key = get_or_create_chart(question, sql, data)
+        yield {'type': 'chart_image', 'url': chart_url(chart_key), 'chart_id': chart_key}
+    except Exception as chart_error:
+        print(f"Chart generation failed: {chart_error}")
+        yield {'type': 'chart_error', 'error': str(chart_error)}
+
+
+def decomposed_events(question: str, decomposition: DecomposedQuery):
+    """Events for a compound question answered by concurrent sub-queries"""
+    yield {'type': 'status', 'step': 'executing_sql',
+           'message': f'Running {len(decomposition.subquestions)} sub-queries in parallel...'}
+    yield decomposition.plan_event()
+    yield from decomposition.run()
+
+    sql, data = decomposition.sql, decomposition.data
+    yield {'type': 'sql_complete', 'sql': sql, 'decomposed': True}
+    yield {'type': 'sql_result', 'data': data, 'data_count': len(data), 'derived': False, 'decomposed': True}
+    if decomposition.succeeded:
+        yield from chart_events(question, sql, data)
+
+    # Combined results always need the LLM to relate the parts to each other
+    yield {'type': 'status', 'step': 'generating_answer', 'message': 'Generating answer...', 'narration': 'llm'}
+    yield from llm_events(generate_final_answer_stream(question, sql, data, report_queue=True), 'answer_chunk')
+    yield {'type': 'done'}
+
+
+def admin_forbidden() -> JSONResponse:
+    return JSONResponse(status_code=403, content={"status": "error", "error": "Admin token required"})
+
 
 @app.post("/chat")
-def chat(request: ChatRequest):
+def chat(request: ChatRequest, http_request: Request, response: Response):
     """
     Chat endpoint that takes a natural language question.
     Routes to either SQL analysis (sales data) or document analysis (PO/PI comparison).
+    Admins can profile a single request with `X-Profile: 1` (or `?profile=1`) plus `X-Admin-Token`.
     """
+    if not profile_requested(http_request.headers, http_request.query_params):
+        return handle_chat(request, http_request)
+    if not is_admin(http_request.headers.get("x-admin-token", "")):
+        return admin_forbidden()
+
+    profiler = SamplingProfiler(f"/chat {request.question[:80]}").start()
+    profile_headers = {"X-Profile-Id": profiler.id, "X-Profile-Url": f"/admin/profiles/{profiler.id}"}
     try:
+        with profiler.track():
+            result = handle_chat(request, http_request, profiler)
+    except BaseException:
+        profiler.finish()
+        raise
+    if isinstance(result, StreamingResponse):
+        # The stream finishes the profile when its last chunk has been produced; the background
+        # task also runs when the client disconnects before the body is iterated at all
+        result.headers.update(profile_headers)
+        result.background = BackgroundTask(profiler.finish)
+        return result
+    profiler.finish()
+    if isinstance(result, Response):
+        result.headers.update(profile_headers)
+    else:
+        response.headers.update(profile_headers)
+    return result
+
+
+def handle_chat(request: ChatRequest, http_request: Request, profiler: SamplingProfiler = None):
+    try:
+        # Shed load before any work starts when the LLM queue is already full
+        get_scheduler().admission_check(TEXT_MODEL)
+
         # DOCUMENT MODE: Analyze Purchase Orders and Proforma Invoices
         if request.document_mode:
             po_content, pi_content = load_md_documents()
@@ -65,137 +307,184 @@ def chat(request: ChatRequest):
                 # Streaming document analysis
                 def generate():
                     try:
-                        yield f"data: {json.dumps({'type': 'status', 'step': 'generating_answer', 'message': 'Analyzing documents...'})}\n\n"
+                        yield {'type': 'status', 'step': 'generating_answer', 'message': 'Analyzing documents...'}
                         
-                        for chunk in analyze_documents_stream(request.question, po_content, pi_content):
-                            yield f"data: {json.dumps({'type': 'answer_chunk', 'content': chunk})}\n\n"
+                        yield from llm_events(analyze_documents_stream(request.question, po_content, pi_content, report_queue=True), 'answer_chunk')
                         
-                        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                        yield {'type': 'done'}
                     except Exception as e:
-                        yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+                        yield error_event(e)
                 
-                return StreamingResponse(
-                    generate(),
-                    media_type="text/event-stream",
-                    headers={
-                        "Cache-Control": "no-cache",
-                        "Connection": "keep-alive",
-                        "X-Accel-Buffering": "no",
-                    }
-                )
+                return event_stream_response(generate(), http_request, profiler)
             else:
                 # Non-streaming document analysis
-                answer = analyze_documents(request.question, po_content, pi_content)
-                return {
-                    "question": request.question,
-                    "answer": answer,
-                    "status": "success",
-                    "mode": "document_analysis"
-                }
+                return run_document_question(request.question, po_content, pi_content)
         
         # SQL MODE: Original sales data analysis
         if request.stream:
             # Return streaming response with step-by-step flow
             def generate():
                 try:
-                    # Step 1: Generate SQL (streaming)
-                    yield f"data: {json.dumps({'type': 'status', 'step': 'generating_sql', 'message': 'Generating SQL query...'})}\n\n"
-                    
-                    sql = ""
-                    for chunk in generate_sql_stream(request.question):
-                        sql += chunk
-                        # Clean chunk before sending (remove markdown markers)
-                        clean_chunk = chunk.replace("```sql", "").replace("```", "")
-                        if clean_chunk:
-                            yield f"data: {json.dumps({'type': 'sql_chunk', 'content': clean_chunk})}\n\n"
+                    # Follow-ups that only filter/sort/limit/re-aggregate reuse the previous result
+                    derived = derive_follow_up(request.session_id, request.question) if request.session_id else None
+                    approximate = None
                     
-                    # Final cleanup of SQL
-                    sql = sql.strip().replace("```sql", "").replace("```", "").strip()
-                    if sql.endswith(";"):
-                        sql = sql[:-1]
+                    # Compound questions are split into sub-queries that run concurrently
+                    if not derived and looks_compound(request.question):
+                        yield {'type': 'status', 'step': 'planning', 'message': 'Planning sub-queries...'}
+                        decomposition = decompose(request.question)
+                        if decomposition is not None:
+                            yield from decomposed_events(request.question, decomposition)
+                            return
                     
-                    # Send complete SQL
-                    yield f"data: {json.dumps({'type': 'sql_complete', 'sql': sql})}\n\n"
-                    
-                    # Step 2: Execute SQL
-                    yield f"data: {json.dumps({'type': 'status', 'step': 'executing_sql', 'message': 'Executing SQL query...'})}\n\n"
-                    try:
-                        data = execute_sql(sql)
-                        if data is None:
-                            data = []
-                        yield f"data: {json.dumps({'type': 'sql_result', 'data': data, 'data_count': len(data) if isinstance(data, list) else 0})}\n\n"
+                    if derived:
+                        yield {'type': 'status', 'step': 'deriving_result', 'message': 'Refining previous result...'}
+                        base_sql = derived['sql']
+                        sql = derived_sql_comment(base_sql, derived['derivation'])
+                        yield {'type': 'sql_complete', 'sql': base_sql, 'derived': True}
+                        yield {'type': 'derived_result', 'base_question': derived['base_question'], 'derivation': derived['derivation']}
+                    else:
+                        # Step 1: Generate SQL (streaming)
+                        yield {'type': 'status', 'step': 'generating_sql', 'message': 'Generating SQL query...'}
                         
-                        # Step 3: Check if chart is needed
-                        if needs_chart(request.question):
-                            yield f"data: {json.dumps({'type': 'status', 'step': 'generating_chart', 'message': 'Generating chart...'})}\n\n"
-                            try:
-                                chart_bytes = generate_chart_image(request.question, sql, data)
-                                # Convert image bytes to base64 for transmission
-                                chart_base64 = base64.b64encode(chart_bytes).decode('utf-8')
-                                yield f"data: {json.dumps({'type': 'chart_image', 'image': chart_base64})}\n\n"
-                            except Exception as chart_error:
-                                print(f"Chart generation failed: {chart_error}")
-                                yield f"data: {json.dumps({'type': 'chart_error', 'error': str(chart_error)})}\n\n"
+                        sql = ""
+                        for chunk in generate_sql_stream(request.question, report_queue=True):
+                            if isinstance(chunk, QueueStatus):
+                                yield queue_event(chunk)
+                                continue
+                            sql += chunk
+                            # Clean chunk before sending (remove markdown markers)
+                            clean_chunk = chunk.replace("```sql", "").replace("```", "")
+                            if clean_chunk:
+                                yield {'type': 'sql_chunk', 'content': clean_chunk}
+                        
+                        # Final cleanup of SQL
+                        sql = clean_sql(sql)
+                        base_sql = sql
                         
-                        # Step 4: Generate final answer (streaming)
-                        yield f"data: {json.dumps({'type': 'status', 'step': 'generating_answer', 'message': 'Generating answer...'})}\n\n"
+                        # Send complete SQL
+                        yield {'type': 'sql_complete', 'sql': sql}
                         
-                        for chunk in generate_final_answer_stream(request.question, sql, data):
-                            yield f"data: {json.dumps({'type': 'answer_chunk', 'content': chunk})}\n\n"
+                        # Step 2: Execute SQL
+                        yield {'type': 'status', 'step': 'executing_sql', 'message': 'Executing SQL query...'}
+                        if request.approximate:
+                            approximate = execute_approximate(sql)
+                        if approximate is None and not request.exact:
+                            # Active-store counts are merged from HyperLogLog sketches when they cover the query
+                            approximate = estimate_distinct(sql)
+                        if request.approximate and approximate is None:
+                            yield {'type': 'status', 'step': 'executing_sql', 'approximate': False,
+                                   'message': 'This query cannot be estimated from the sample; running it exactly...'}
+                    error_msg = None
+                    try:
+                        if derived:
+                            data = derived['data']
+                        elif approximate:
+                            data, estimate = approximate
+                        else:
+                            data = execute_sql(sql)
                     except Exception as sql_error:
-                        # If SQL execution fails, still try to generate an explanation
                         error_msg = str(sql_error)
-                        yield f"data: {json.dumps({'type': 'sql_error', 'error': error_msg})}\n\n"
+                        yield {'type': 'sql_error', 'error': error_msg}
+                        
+                        # Feed the database error back to the generator for a bounded number of repairs
+                        repair = SqlRepair(request.question, sql, error_msg)
+                        for event in repair.run():
+                            yield event
+                        if repair.succeeded:
+                            sql = base_sql = repair.sql
+                            data = repair.data
+                            error_msg = None
+                            yield {'type': 'sql_complete', 'sql': sql, 'repaired': True}
+                    
+                    if error_msg is None:
+                        if data is None:
+                            data = []
+                        result_event = {'type': 'sql_result', 'data': data, 'data_count': len(data) if isinstance(data, list) else 0, 'derived': bool(derived)}
+                        if approximate:
+                            result_event.update(approximate=True, estimate=estimate)
+                        yield result_event
+                        if not approximate:
+                            # Follow-ups are derived from exact results only
+                            save_context(request.session_id, request.question, base_sql, data,
+                                         derived['derivation'] if derived else None)
+                        if not derived:
+                            # SQL is cached only once it has executed; popular questions are re-run by the warmer
+                            remember_sql(request.question, base_sql)
+                            record_request(request.question, base_sql)
                         
-                        # Generate answer explaining the error
-                        yield f"data: {json.dumps({'type': 'status', 'step': 'generating_answer', 'message': 'Generating answer...'})}\n\n"
+                        # Step 3: Check if chart is needed
+                        yield from chart_events(request.question, sql, data)
+                        
+                        # Step 4: Generate final answer (streaming); simple result shapes are narrated locally
+                        answer = narrate(request.question, sql, data) if request.narration == "auto" else None
+                        note = approximate_note(estimate) if approximate else ""
+                        if answer is not None:
+                            yield {'type': 'status', 'step': 'generating_answer', 'message': 'Summarizing result...', 'narration': 'template'}
+                            yield {'type': 'answer_chunk', 'content': note + answer}
+                        else:
+                            yield {'type': 'status', 'step': 'generating_answer', 'message': 'Generating answer...', 'narration': 'llm'}
+                            if note:
+                                yield {'type': 'answer_chunk', 'content': note}
+                            yield from llm_events(generate_final_answer_stream(request.question, sql, data, report_queue=True), 'answer_chunk')
+                    else:
+                        # Repair did not succeed: still try to generate an explanation
+                        yield {'type': 'status', 'step': 'generating_answer', 'message': 'Generating answer...'}
                         try:
-                            for chunk in generate_final_answer_stream(request.question, sql, []):
-                                yield f"data: {json.dumps({'type': 'answer_chunk', 'content': chunk})}\n\n"
+                            yield from llm_events(generate_final_answer_stream(request.question, sql, [], report_queue=True), 'answer_chunk')
                         except Exception as answer_error:
-                            yield f"data: {json.dumps({'type': 'answer_chunk', 'content': f'SQL execution failed: {error_msg}'})}\n\n"
+                            yield {'type': 'answer_chunk', 'content': f'SQL execution failed: {error_msg}'}
                     
                     # Send completion
-                    yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                    yield {'type': 'done'}
                     
                 except Exception as e:
-                    yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+                    yield error_event(e)
             
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no",
-                }
-            )
+            return event_stream_response(generate(), http_request, profiler)
         else:
             # Non-streaming response
-            sql = generate_sql(request.question)
-            data = execute_sql(sql)
-            answer = generate_final_answer(request.question, sql, data)
-            
-            # Check if chart is needed
-            chart_base64 = None
-            if needs_chart(request.question):
-                try:
-                    chart_bytes = generate_chart_image(request.question, sql, data)
-                    chart_base64 = base64.b64encode(chart_bytes).decode('utf-8')
-                except Exception as chart_error:
-                    print(f"Chart generation failed: {chart_error}")
-            
-            return {
-                "question": request.question,
-                "generated_sql": sql,
-                "data": data,
-                "answer": answer,
-                "chart_image": chart_base64,
-                "status": "success"
-            }
+            return run_sql_question(request.question, session_id=request.session_id, narration=request.narration,
+                                    approximate=request.approximate, exact=request.exact)
+    except SchedulerOverloaded as e:
+        return overloaded_response(e, request.question)
     except Exception as e:
         return {
             "question": request.question,
             "error": str(e),
             "status": "error"
         }
+
+
+@app.post("/chat/batch")
+def chat_batch(request: BatchRequest):
+    """
+    Answer many questions in one call. Duplicates are answered once; results stream back
+    as NDJSON lines in completion order, followed by a summary line.
+    """
+    if not request.questions:
+        return JSONResponse(status_code=400, content={"status": "error", "error": "No questions provided"})
+    if len(request.questions) > MAX_BATCH_QUESTIONS:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "error": f"Batch too large: {len(request.questions)} questions (max {MAX_BATCH_QUESTIONS})",
+        })
+
+    if request.document_mode:
+        po_content, pi_content = load_md_documents()
+
+        def run_one(question, before_call):
+            return run_document_question(question, po_content, pi_content, before_call=before_call)
+    else:
+        def run_one(question, before_call):
+            return run_sql_question(question, before_call=before_call, include_chart=request.include_charts,
+                                    narration=request.narration)
+
+    return StreamingResponse(
+        run_batch(request.questions, run_one, parallelism=request.parallelism, rate_limits=request.rate_limits),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+lifecycle.mark_imported()
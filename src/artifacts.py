@@ -0,0 +1,69 @@
+# artifacts.py
+# Process-wide access to the files ingestion builds for the API (cube, sample, sketches,
+# value index). Each is loaded on first use and re-loaded when ingestion replaces the file.
+#
+# The artifact modules are also imported by the ingestion scripts run from src/, so they
+# import nothing from the package except cube.py and this module (stdlib only).
+import os
+import threading
+import time
+
+# Seconds between mtime checks of a loaded artifact
+RELOAD_CHECK_SECONDS = 30
+
+
+class ReloadingArtifact:
+    """
+    Lazily loaded artifact file shared by all threads of a worker.
+
+    get() returns the loaded object, or None when the artifact is disabled (`enabled_env` set
+    to something other than 1/true/yes), the file does not exist or it cannot be loaded. The
+    file's mtime is checked at most every RELOAD_CHECK_SECONDS; a changed file is loaded again.
+    A file that fails to load is logged and treated as absent until it is replaced, so a corrupt
+    artifact falls back to the database instead of failing every query.
+    """
+
+    def __init__(self, path, load, describe, enabled_env: str = None):
+        self.path = path
+        self.load = load
+        self.describe = describe
+        self.enabled_env = enabled_env
+        self._value = None
+        self._mtime = None
+        self._failed_mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def enabled(self) -> bool:
+        return self.enabled_env is None or os.getenv(self.enabled_env, "1").lower() in ("1", "true", "yes")
+
+    def get(self):
+        if not self.enabled():
+            return None
+        now = time.monotonic()
+        if self._value is not None and now - self._checked < RELOAD_CHECK_SECONDS:
+            return self._value
+        with self._lock:
+            self._checked = now
+            path = self.path()
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                self._value = None
+                return None
+            if self._value is None and mtime == self._failed_mtime:
+                return None
+            if self._value is None or mtime != self._mtime:
+                started = time.perf_counter()
+                try:
+                    value = self.load(path)
+                except Exception as e:
+                    print(f"Could not load {path}, ignoring it until it is rebuilt: {e}")
+                    self._value = None
+                    self._failed_mtime = mtime
+                    return None
+                self._value = value
+                self._mtime = mtime
+                self._failed_mtime = None
+                print(f"Loaded {self.describe(self._value)} in {time.perf_counter() - started:.2f}s")
+            return self._value
@@ -0,0 +1,96 @@
+# batch.py
+# Batch question execution: deduplicate, run with bounded parallelism and per-provider
+# rate limits, and stream NDJSON lines back as each question completes.
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .ratelimit import TokenBucket
+from .scheduler import priority_class, BATCH
+from .serialization import dumps
+
+MAX_BATCH_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+MAX_BATCH_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", "16"))
+
+# Default requests/second per upstream provider for batch traffic (0 = unlimited)
+DEFAULT_RATE_LIMITS = {
+    "gemini": float(os.getenv("BATCH_GEMINI_RPS", "5")),
+    "supabase": float(os.getenv("BATCH_SUPABASE_RPS", "20")),
+}
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form used to detect duplicate questions"""
+    return " ".join(question.lower().split())
+
+
+def dedupe_questions(questions: list) -> list:
+    """Group identical questions, keeping first-seen order: [(question, [indices]), ...]"""
+    groups = {}
+    for index, question in enumerate(questions):
+        key = normalize_question(question)
+        if key not in groups:
+            groups[key] = (question, [])
+        groups[key][1].append(index)
+    return list(groups.values())
+
+
+def run_batch(questions: list, run_one, parallelism: int = 4, rate_limits: dict = None):
+    """
+    Run `run_one(question, before_call)` for each unique question and yield NDJSON lines
+    in completion order, followed by a summary line.
+    """
+    parallelism = max(1, min(parallelism, MAX_BATCH_PARALLELISM))
+    limits = dict(DEFAULT_RATE_LIMITS)
+    limits.update(rate_limits or {})
+    buckets = {provider: TokenBucket(rate) for provider, rate in limits.items()}
+
+    def before_call(provider: str):
+        bucket = buckets.get(provider)
+        if bucket is not None:
+            bucket.acquire()
+
+    def timed(question):
+        started = time.perf_counter()
+        try:
+            # Batch LLM calls queue behind interactive traffic in the scheduler
+            with priority_class(BATCH):
+                result = run_one(question, before_call)
+            return result, None, time.perf_counter() - started
+        except Exception as e:
+            return None, str(e), time.perf_counter() - started
+
+    groups = dedupe_questions(questions)
+    batch_started = time.perf_counter()
+    succeeded = failed = 0
+
+    executor = ThreadPoolExecutor(max_workers=parallelism)
+    try:
+        futures = {executor.submit(timed, question): (question, indices) for question, indices in groups}
+        for future in as_completed(futures):
+            question, indices = futures[future]
+            result, error, seconds = future.result()
+            if error is None and result.get("status") != "error":
+                succeeded += 1
+                line = {"type": "result", "indices": indices, "question": question,
+                        "status": "success", "seconds": round(seconds, 4), "result": result}
+            else:
+                failed += 1
+                line = {"type": "result", "indices": indices, "question": question,
+                        "status": "error", "seconds": round(seconds, 4),
+                        "error": error or result.get("error")}
+            yield dumps(line) + b"\n"
+    finally:
+        # A client disconnect closes this generator: drop the questions that have not started
+        # instead of running (and paying for) the rest of the batch
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    yield dumps({
+        "type": "summary",
+        "total": len(questions),
+        "unique": len(groups),
+        "succeeded": succeeded,
+        "failed": failed,
+        "parallelism": parallelism,
+        "seconds": round(time.perf_counter() - batch_started, 4),
+    }) + b"\n"
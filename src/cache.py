@@ -0,0 +1,339 @@
+# cache.py
+# Cross-worker shared cache backed by a single SQLite file.
+# Every uvicorn worker opens the same file, so entries (and hit/miss counters) are shared
+# between processes and survive restarts. No external service is required.
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+_DEFAULT_PATH = Path(__file__).parent.parent / ".cache" / "shared_cache.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS request_history (
+    day TEXT NOT NULL,
+    question_key TEXT NOT NULL,
+    question TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 1,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (day, question_key)
+);
+"""
+
+# Days of request history kept for the post-ingestion cache warmer
+HISTORY_RETENTION_DAYS = 30
+# Hit/miss counters and LRU access times are buffered in memory and written at most this often
+BOOKKEEPING_FLUSH_SECONDS = 1.0
+# How long a bookkeeping flush from the read path may wait for the write lock (ms)
+_BOOKKEEPING_BUSY_TIMEOUT_MS = 50
+_BUSY_TIMEOUT_MS = 10000
+
+
+def cache_key(*parts) -> str:
+    """Build a fixed-length key from arbitrary parts (strings, numbers, JSON-serializable values)"""
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SharedCache:
+    """
+    Byte-bounded key/value store with TTLs, shared by all processes using the same file.
+
+    Writes are atomic (single SQLite transaction). When the total stored size exceeds
+    max_bytes, least-recently-accessed entries are evicted. Values are raw bytes;
+    use get_json/set_json for structured data.
+
+    Reads never take the write lock: hit/miss counters and access times are buffered and
+    flushed in the background of later calls. SQLite errors are logged and treated as
+    misses (reads) or no-ops (writes), so a broken cache never fails a request.
+    """
+
+    def __init__(self, path, max_bytes: int = 256 * 1024 * 1024, default_ttl: float = None):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._pending_access = {}
+        self._pending_counts = {}
+        self._flushed_at = time.monotonic()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite handles cross-process locking
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _note(self, namespace: str, key: str, hit: bool, now: float):
+        with self._pending_lock:
+            counts = self._pending_counts.setdefault(namespace, [0, 0])
+            counts[0 if hit else 1] += 1
+            if hit:
+                self._pending_access[(namespace, key)] = now
+            due = time.monotonic() - self._flushed_at >= BOOKKEEPING_FLUSH_SECONDS
+        if due:
+            self._flush_bookkeeping()
+
+    def _take_pending(self):
+        with self._pending_lock:
+            access, counts = self._pending_access, self._pending_counts
+            self._pending_access, self._pending_counts = {}, {}
+            self._flushed_at = time.monotonic()
+        return access, counts
+
+    def _restore_pending(self, access: dict, counts: dict):
+        # Put back what a failed flush took, unless newer reads already touched the same keys
+        with self._pending_lock:
+            for item, accessed_at in access.items():
+                self._pending_access.setdefault(item, accessed_at)
+            for namespace, (hits, misses) in counts.items():
+                pending = self._pending_counts.setdefault(namespace, [0, 0])
+                pending[0] += hits
+                pending[1] += misses
+
+    def _write_pending(self, conn, access: dict, counts: dict):
+        conn.executemany(
+            "UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE namespace = ? AND key = ?",
+            [(accessed_at, namespace, key) for (namespace, key), accessed_at in access.items()],
+        )
+        conn.executemany(
+            "INSERT INTO stats (namespace, hits, misses) VALUES (?, ?, ?) "
+            "ON CONFLICT(namespace) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+            [(namespace, hits, misses) for namespace, (hits, misses) in counts.items()],
+        )
+
+    def _flush_bookkeeping(self):
+        """Write buffered counters and access times; skipped (and retried later) if the lock is busy"""
+        access, counts = self._take_pending()
+        if not access and not counts:
+            return
+        conn = self._conn()
+        try:
+            conn.execute(f"PRAGMA busy_timeout = {_BOOKKEEPING_BUSY_TIMEOUT_MS}")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_pending(conn, access, counts)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            self._restore_pending(access, counts)
+        finally:
+            try:
+                conn.execute(f"PRAGMA busy_timeout = {_BUSY_TIMEOUT_MS}")
+            except sqlite3.Error:
+                pass
+
+    def get(self, namespace: str, key: str):
+        """Return the cached bytes, or None on a miss, an expired entry or a cache error"""
+        now = time.time()
+        try:
+            row = self._conn().execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Cache read failed ({namespace}): {e}")
+            return None
+        # Expired entries are left for the next write's eviction pass
+        if row is not None and row[1] is not None and row[1] <= now:
+            row = None
+        self._note(namespace, key, row is not None, now)
+        return bytes(row[0]) if row is not None else None
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float = None):
+        """Store bytes under (namespace, key) and evict LRU entries if over the byte budget"""
+        if ttl is None:
+            ttl = self.default_ttl
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        access, counts = self._take_pending()
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, size, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, key, sqlite3.Binary(value), size, expires_at, now),
+                )
+                # Buffered access times go in first so eviction sees the real LRU order
+                self._write_pending(conn, access, counts)
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._restore_pending(access, counts)
+            print(f"Cache write failed ({namespace}): {e}")
+
+    def _evict(self, conn, now: float):
+        conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        overflow = total - self.max_bytes
+        freed = 0
+        victims = []
+        for namespace, key, size in conn.execute(
+            "SELECT namespace, key, size FROM entries ORDER BY accessed_at ASC"
+        ):
+            victims.append((namespace, key))
+            freed += size
+            if freed >= overflow:
+                break
+        conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+
+    def delete(self, namespace: str, key: str):
+        try:
+            self._conn().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.Error as e:
+            print(f"Cache delete failed ({namespace}): {e}")
+
+    def clear(self, namespace: str = None):
+        """Drop all entries (optionally only one namespace), e.g. after a data refresh"""
+        try:
+            conn = self._conn()
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+        except sqlite3.Error as e:
+            print(f"Cache clear failed ({namespace or 'all'}): {e}")
+
+    def get_json(self, namespace: str, key: str):
+        raw = self.get(namespace, key)
+        return json.loads(raw) if raw is not None else None
+
+    def set_json(self, namespace: str, key: str, value, ttl: float = None):
+        self.set(namespace, key, json.dumps(value, default=str).encode("utf-8"), ttl=ttl)
+
+    def record_request(self, question: str, sql: str):
+        """Count a successfully answered question (per day) for the post-ingestion cache warmer"""
+        question = " ".join(question.split())
+        question_key = cache_key(question.lower())
+        now = time.time()
+        day = time.strftime("%Y-%m-%d", time.gmtime(now))
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT INTO request_history (day, question_key, question, sql, count, last_seen) "
+                "VALUES (?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT(day, question_key) DO UPDATE SET count = count + 1, sql = excluded.sql, "
+                "last_seen = excluded.last_seen",
+                (day, question_key, question, sql, now),
+            )
+            # Prune old days on roughly 1% of writes
+            if random.random() < 0.01:
+                cutoff = time.strftime("%Y-%m-%d", time.gmtime(now - HISTORY_RETENTION_DAYS * 86400))
+                conn.execute("DELETE FROM request_history WHERE day < ?", (cutoff,))
+        except sqlite3.Error as e:
+            print(f"Request history write failed: {e}")
+
+    def top_requests(self, limit: int = 50, days: int = 7) -> list:
+        """Most frequent questions over the last `days` days: [{"question", "sql", "count", "last_seen"}]"""
+        cutoff = time.strftime("%Y-%m-%d", time.gmtime(time.time() - days * 86400))
+        result = []
+        try:
+            conn = self._conn()
+            rows = conn.execute(
+                "SELECT question_key, SUM(count) AS total, MAX(last_seen) AS seen FROM request_history "
+                "WHERE day >= ? GROUP BY question_key ORDER BY total DESC, seen DESC LIMIT ?",
+                (cutoff, limit),
+            ).fetchall()
+            for question_key, total, seen in rows:
+                # Latest question text and SQL for this question
+                question, sql = conn.execute(
+                    "SELECT question, sql FROM request_history WHERE question_key = ? ORDER BY last_seen DESC LIMIT 1",
+                    (question_key,),
+                ).fetchone()
+                result.append({"question": question, "sql": sql, "count": total, "last_seen": seen})
+        except sqlite3.Error as e:
+            print(f"Request history read failed: {e}")
+        return result
+
+    def stats(self) -> dict:
+        """Hit/miss counters and stored bytes per namespace, aggregated across all workers"""
+        self._flush_bookkeeping()
+        conn = self._conn()
+        result = {}
+        for namespace, hits, misses in conn.execute("SELECT namespace, hits, misses FROM stats"):
+            lookups = hits + misses
+            result[namespace] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+        for namespace, entries, size in conn.execute(
+            "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY namespace"
+        ):
+            result.setdefault(namespace, {"hits": 0, "misses": 0, "hit_rate": 0.0})
+            result[namespace].update({"entries": entries, "bytes": size})
+        return result
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache_enabled() -> bool:
+    return os.getenv("CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+
+
+def get_cache():
+    """Return the process-wide SharedCache (created on first use), or None when caching is disabled"""
+    global _cache
+    if not cache_enabled():
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SharedCache(
+                    os.getenv("CACHE_PATH", str(_DEFAULT_PATH)),
+                    max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+                )
+    return _cache
+
+
+def record_request(question: str, sql: str):
+    """Best-effort request-history logging (never fails the request)"""
+    cache = get_cache()
+    if cache is None or not sql:
+        return
+    try:
+        cache.record_request(question, sql)
+    except Exception as e:
+        print(f"Request history write failed: {e}")
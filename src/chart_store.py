@@ -0,0 +1,113 @@
+# chart_store.py
+# Content-addressed chart storage.
+# Charts are keyed by hash(SQL) + hash(result data), written once to a chart directory
+# shared by all workers and served by URL (/charts/{chart_id}) with a strong ETag and
+# long-lived Cache-Control, so browsers and proxies can cache them and identical questions
+# never regenerate a chart. The directory is never evicted (unlike the shared cache), so a
+# URL that was handed out keeps resolving.
+#
+# Formats: the stored PNG, plus a WebP variant when Pillow is installed. SVG is not offered,
+# since the image model returns raster images and there is no vector source to serve.
+import hashlib
+import io
+import json
+import os
+import re
+from pathlib import Path
+
+from .llm import generate_chart_image
+
+try:
+    # Optional: WebP variants are only offered when Pillow is installed
+    from PIL import Image
+except ImportError:
+    Image = None
+
+_DEFAULT_PATH = Path(__file__).parent.parent / ".cache" / "charts"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+_CHART_ID_RE = re.compile(r"^[0-9a-f]{40}$")
+
+
+def chart_id(sql: str, data: list) -> str:
+    """Content address of a chart: hash of the SQL hash plus the result-data hash"""
+    sql_hash = hashlib.sha256(sql.strip().encode("utf-8")).hexdigest()
+    data_hash = hashlib.sha256(
+        json.dumps(data, sort_keys=True, default=str, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+    return hashlib.sha256(f"{sql_hash}:{data_hash}".encode("ascii")).hexdigest()[:40]
+
+
+def is_valid_chart_id(value: str) -> bool:
+    return bool(_CHART_ID_RE.match(value))
+
+
+def store_path() -> Path:
+    return Path(os.getenv("CHART_STORE_PATH", str(_DEFAULT_PATH)))
+
+
+def _chart_file(key: str, extension: str) -> Path:
+    return store_path() / f"{key}.{extension}"
+
+
+def _write(path: Path, content: bytes):
+    """Atomic write (temp file + rename): concurrent workers never serve a partial image"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _read(path: Path):
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def get_or_create_chart(question: str, sql: str, data: list) -> str:
+    """Return the chart id for this SQL + result, generating and storing the PNG only on a miss"""
+    key = chart_id(sql, data)
+    path = _chart_file(key, "png")
+    if path.exists():
+        print(f"Chart {key} served from store")
+        return key
+    png = generate_chart_image(question, sql, data)
+    _write(path, png)
+    return key
+
+
+def chart_url(key: str) -> str:
+    return f"/charts/{key}"
+
+
+def _to_webp(png: bytes) -> bytes:
+    with Image.open(io.BytesIO(png)) as image:
+        output = io.BytesIO()
+        image.save(output, format="WEBP", quality=90, method=4)
+        return output.getvalue()
+
+
+def load_chart(key: str, accept: str = ""):
+    """
+    Return (bytes, media_type, etag) for a stored chart, or None if unknown.
+    Serves a WebP variant (created once, then stored) when the client accepts it and Pillow is available.
+    """
+    png = _read(_chart_file(key, "png"))
+    if png is None:
+        return None
+
+    if Image is not None and "image/webp" in (accept or ""):
+        variant_path = _chart_file(key, "webp")
+        webp = _read(variant_path)
+        if webp is None:
+            try:
+                webp = _to_webp(png)
+                _write(variant_path, webp)
+            except Exception as e:
+                print(f"WebP conversion failed for chart {key}: {e}")
+                webp = None
+        if webp is not None:
+            return webp, "image/webp", f'"{key}-webp"'
+
+    return png, "image/png", f'"{key}"'
@@ -0,0 +1,336 @@
+# conversation.py
+# Session-scoped conversation context and in-process follow-up derivation.
+# Follow-ups such as "now only the top 5" or "sort by value ascending" that only filter,
+# sort, limit or re-aggregate the previous result are answered from that result with
+# pandas instead of another LLM SQL call and database round trip.
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from .cache import get_cache, cache_key
+
+SESSION_TTL = float(os.getenv("CONVERSATION_TTL", "1800"))
+MAX_CONTEXT_ROWS = int(os.getenv("CONVERSATION_MAX_ROWS", "5000"))
+_MAX_LOCAL_SESSIONS = 1000
+
+# Numeric columns that are dimensions, not metrics
+_NUMERIC_DIMENSIONS = {"year", "month"}
+# Metrics whose values cannot be summed again (averages, distinct counts, ratios)
+_NON_ADDITIVE_HINTS = ("avg", "average", "mean", "distinct", "unique", "active", "ratio", "pct", "percent", "share", "rate")
+# Words that refer to "the main metric" when no column is named explicitly
+_METRIC_WORDS = {"value", "values", "sales", "revenue", "amount", "total", "totals", "quantity", "number"}
+# Filler words that carry no operation
+_STOPWORDS = {
+    "now", "only", "just", "the", "show", "me", "please", "and", "then", "in", "of", "for",
+    "results", "result", "rows", "row", "those", "them", "these", "it", "this", "that", "list",
+    "give", "instead", "same", "but", "with", "a", "an", "to", "can", "you", "what", "about",
+    "how", "keep", "filter", "filtered", "limit", "limited", "display", "return", "is", "are",
+    "on", "from", "data", "ones", "entries", "records",
+}
+_DESC_WORDS = {"top", "highest", "largest", "biggest", "best", "most"}
+_ASC_WORDS = {"bottom", "lowest", "smallest", "worst", "least"}
+_SORT_WORDS = {"sort", "sorted", "order", "ordered", "rank", "ranked", "arrange"}
+_NEGATE_WORDS = {"exclude", "excluding", "without", "except", "remove", "not"}
+_GT_WORDS = {"above", "over", "greater", "more", "exceeding", ">"}
+_LT_WORDS = {"below", "under", "less", "fewer", "<"}
+
+_local_sessions = OrderedDict()
+_local_lock = threading.Lock()
+
+
+# ==================== Session store ====================
+
+def load_context(session_id: str):
+    """Return the last result context for a session, or None"""
+    if not session_id:
+        return None
+    cache = get_cache()
+    if cache:
+        # Stored in the shared cache so follow-ups work whichever worker handles them
+        return cache.get_json("session", cache_key(session_id))
+    with _local_lock:
+        entry = _local_sessions.get(session_id)
+        if entry is None or entry[0] < time.time():
+            _local_sessions.pop(session_id, None)
+            return None
+        return entry[1]
+
+
+def save_context(session_id: str, question: str, sql: str, data: list, derivation: list = None):
+    """Remember the latest result of a session so the next question can drill into it"""
+    if not session_id or not isinstance(data, list) or len(data) > MAX_CONTEXT_ROWS:
+        return
+    context = {"question": question, "sql": sql, "data": data, "derivation": derivation or []}
+    cache = get_cache()
+    if cache:
+        cache.set_json("session", cache_key(session_id), context, ttl=SESSION_TTL)
+        return
+    with _local_lock:
+        _local_sessions[session_id] = (time.time() + SESSION_TTL, context)
+        _local_sessions.move_to_end(session_id)
+        while len(_local_sessions) > _MAX_LOCAL_SESSIONS:
+            _local_sessions.popitem(last=False)
+
+
+# ==================== Follow-up classifier ====================
+
+def _tokenize(text: str) -> list:
+    return re.findall(r"[a-z0-9_&'.\-]+|[<>]", text.lower())
+
+
+def _parse_number(token: str):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([km]?)", token.replace(",", ""))
+    if not match:
+        return None
+    number = float(match.group(1))
+    return number * {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2)]
+
+
+def _column_kinds(data: list):
+    """Split result columns into (dimensions, metrics) based on the values they hold"""
+    columns = list(data[0].keys())
+    dimensions, metrics = [], []
+    for column in columns:
+        values = [row.get(column) for row in data if row.get(column) is not None]
+        numeric = values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+        if numeric and column.lower() not in _NUMERIC_DIMENSIONS:
+            metrics.append(column)
+        else:
+            dimensions.append(column)
+    return dimensions, metrics
+
+
+def _phrase_maps(data: list, dimensions: list, metrics: list):
+    """Map lower-cased token tuples to columns and to (column, value) pairs"""
+    columns = {}
+    for column in dimensions + metrics:
+        columns[tuple(_tokenize(column.replace("_", " ")))] = column
+    values = {}
+    for column in dimensions:
+        for row in data:
+            value = row.get(column)
+            if value is None:
+                continue
+            tokens = tuple(_tokenize(str(value)))
+            if tokens:
+                values.setdefault(tokens, (column, value))
+    return columns, values
+
+
+def _match(tokens: list, i: int, phrases: dict):
+    """Longest phrase in `phrases` starting at tokens[i]; returns (match, length) or (None, 0)"""
+    for length in range(min(6, len(tokens) - i), 0, -1):
+        key = tuple(tokens[i:i + length])
+        if key in phrases:
+            return phrases[key], length
+    return None, 0
+
+
+def classify_follow_up(question: str, context: dict):
+    """
+    Decide whether `question` only filters, sorts, limits or re-aggregates the previous result.
+    Returns a list of operations, or None when the question needs a fresh SQL query.
+    Every token must be understood; anything unrecognized falls back to the full pipeline.
+    """
+    data = (context or {}).get("data") or []
+    if not data or not isinstance(data[0], dict):
+        return None
+    dimensions, metrics = _column_kinds(data)
+    if not metrics:
+        return None
+    main_metric = metrics[-1]
+    columns, values = _phrase_maps(data, dimensions, metrics)
+
+    tokens = _tokenize(question)
+    ops = []
+    filters = {}
+    sort = None
+    negate = False
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+
+        if token in _DESC_WORDS | _ASC_WORDS and following and _parse_number(following):
+            ascending = token in _ASC_WORDS
+            ops.append({"op": "sort", "column": main_metric, "ascending": ascending})
+            ops.append({"op": "limit", "n": int(_parse_number(following))})
+            i += 2
+            continue
+        if token in ("first", "last") and following and _parse_number(following):
+            ops.append({"op": "head" if token == "first" else "tail", "n": int(_parse_number(following))})
+            i += 2
+            continue
+        if token in _SORT_WORDS:
+            sort = {"op": "sort", "column": main_metric, "ascending": False}
+            ops.append(sort)
+            i += 1
+            if following == "by":
+                i += 1
+                column, length = _match(tokens, i, columns)
+                if column is not None:
+                    sort["column"] = column
+                    i += length
+                elif i < len(tokens) and tokens[i] in _METRIC_WORDS:
+                    i += 1
+                else:
+                    return None
+            continue
+        if token in ("asc", "ascending", "increasing") or (token in _ASC_WORDS and sort and following in (None, "first")):
+            if sort is None:
+                sort = {"op": "sort", "column": main_metric, "ascending": True}
+                ops.append(sort)
+            sort["ascending"] = True
+            i += 2 if following == "first" else 1
+            continue
+        if token in ("desc", "descending", "decreasing") or (token in _DESC_WORDS and sort and following in (None, "first")):
+            if sort is None:
+                sort = {"op": "sort", "column": main_metric, "ascending": False}
+                ops.append(sort)
+            sort["ascending"] = False
+            i += 2 if following == "first" else 1
+            continue
+        if token in _GT_WORDS | _LT_WORDS:
+            j = i + 1
+            if j < len(tokens) and tokens[j] == "than":
+                j += 1
+            number = _parse_number(tokens[j]) if j < len(tokens) else None
+            if number is None:
+                return None
+            ops.append({"op": "compare", "column": main_metric, "gt": token in _GT_WORDS, "value": number})
+            i = j + 1
+            continue
+        if token == "by":
+            column, length = _match(tokens, i + 1, columns)
+            if column is None or column not in dimensions:
+                return None
+            ops.append({"op": "regroup", "by": column})
+            i += 1 + length
+            continue
+        if token in _NEGATE_WORDS:
+            negate = True
+            i += 1
+            continue
+
+        match, length = _match(tokens, i, values)
+        if match is not None:
+            column, value = match
+            include, exclude = filters.setdefault(column, (set(), set()))
+            (exclude if negate else include).add(value)
+            i += length
+            continue
+        if token in ("total", "totals", "sum"):
+            # "total by channel" re-aggregates via the following "by"; a trailing "total" sums everything
+            if following is None:
+                ops.append({"op": "regroup", "by": None})
+            elif following != "by":
+                return None
+            i += 1
+            continue
+        if token in _STOPWORDS or token == "or":
+            i += 1
+            continue
+        return None
+
+    for column, (include, exclude) in filters.items():
+        ops.insert(0, {"op": "filter", "column": column, "include": sorted(include, key=str), "exclude": sorted(exclude, key=str)})
+
+    if not ops:
+        return None
+    for op in ops:
+        if op["op"] == "regroup" and any(hint in m.lower() for m in metrics for hint in _NON_ADDITIVE_HINTS):
+            # Averages and distinct counts cannot be re-aggregated from the prior rows
+            return None
+    return ops
+
+
+# ==================== In-process derivation ====================
+
+def describe(op: dict) -> str:
+    """Human/LLM-readable description of an operation"""
+    kind = op["op"]
+    if kind == "filter":
+        parts = []
+        if op["include"]:
+            parts.append(f"{op['column']} IN {op['include']}")
+        if op["exclude"]:
+            parts.append(f"{op['column']} NOT IN {op['exclude']}")
+        return "filter " + " AND ".join(parts)
+    if kind == "sort":
+        return f"sort by {op['column']} {'ascending' if op['ascending'] else 'descending'}"
+    if kind in ("limit", "head"):
+        return f"keep first {op['n']} rows"
+    if kind == "tail":
+        return f"keep last {op['n']} rows"
+    if kind == "compare":
+        return f"filter {op['column']} {'>' if op['gt'] else '<'} {op['value']:g}"
+    if kind == "regroup":
+        return f"re-aggregate by {op['by']}" if op["by"] else "re-aggregate to grand total"
+    return kind
+
+
+def apply_follow_up(data: list, ops: list) -> list:
+    """Apply classified operations to the previous result rows with pandas"""
+    import pandas as pd  # deferred: only needed when a follow-up is actually derived
+
+    _, metrics = _column_kinds(data)
+    df = pd.DataFrame(data)
+    for op in ops:
+        kind = op["op"]
+        if kind == "filter":
+            if op["include"]:
+                df = df[df[op["column"]].isin(op["include"])]
+            if op["exclude"]:
+                df = df[~df[op["column"]].isin(op["exclude"])]
+        elif kind == "sort":
+            df = df.sort_values(op["column"], ascending=op["ascending"], kind="stable")
+        elif kind in ("limit", "head"):
+            df = df.head(op["n"])
+        elif kind == "tail":
+            df = df.tail(op["n"])
+        elif kind == "compare":
+            df = df[df[op["column"]] > op["value"]] if op["gt"] else df[df[op["column"]] < op["value"]]
+        elif kind == "regroup":
+            if op["by"] is None:
+                df = df[metrics].sum().to_frame().T
+            else:
+                df = df.groupby(op["by"], as_index=False, sort=False)[metrics].sum()
+                df = df.sort_values(metrics[-1], ascending=False) if metrics else df
+    df = df.astype(object).where(pd.notnull(df), None)
+    # Unwrap NumPy scalars so the rows stay JSON-serializable
+    return [
+        {key: value.item() if hasattr(value, "item") else value for key, value in row.items()}
+        for row in df.to_dict("records")
+    ]
+
+
+def derive_follow_up(session_id: str, question: str):
+    """
+    Try to answer `question` from the session's previous result.
+    Returns {"sql", "data", "derivation", "base_question"} or None if a fresh query is needed.
+    """
+    context = load_context(session_id)
+    if not context:
+        return None
+    ops = classify_follow_up(question, context)
+    if not ops:
+        return None
+    try:
+        data = apply_follow_up(context["data"], ops)
+    except Exception as e:
+        print(f"Follow-up derivation failed, falling back to SQL: {e}")
+        return None
+    derivation = context.get("derivation", []) + [describe(op) for op in ops]
+    return {
+        "sql": context["sql"],
+        "data": data,
+        "derivation": derivation,
+        "base_question": context["question"],
+    }
+
+
+def derived_sql_comment(sql: str, derivation: list) -> str:
+    """SQL text annotated with the in-process steps, used when narrating a derived result"""
+    return sql + "\n-- then, applied to the previous result: " + "; ".join(derivation)
@@ -0,0 +1,591 @@
+# cube.py
+# In-process, dictionary-encoded OLAP cube over sales_transactions.
+# Each dimension is stored as a small integer code array plus its label list, each metric
+# as a float64 array. Filtered group-by sums and distinct counts are answered with
+# vectorized NumPy operations (isin / unique / bincount) instead of a database scan.
+import json
+import math
+import os
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from .artifacts import ReloadingArtifact
+except ImportError:
+    # Imported by the ingestion scripts run from src/
+    from artifacts import ReloadingArtifact
+
+DEFAULT_CUBE_PATH = Path(__file__).parent.parent / "data" / "sales_cube.npz"
+
+DIMENSIONS = [
+    'master_distributor', 'distributor',
+    'line_of_business', 'supplier', 'agency',
+    'category', 'segment', 'brand', 'sub_brand',
+    'country', 'city', 'area',
+    'retailer_group', 'retailer_sub_group', 'channel', 'sub_channel',
+    'salesman',
+    'customer_account_number', 'customer_account_name',
+    'promo_item', 'foc_nonfoc',
+    'year', 'month',
+]
+METRICS = ['value', 'invoiced_quantity']
+# Integer-valued columns: labels are kept as ints so `year = 2024` matches
+_INTEGER_DIMENSIONS = {'year', 'month'}
+# Metrics returned as integers (Postgres SUM over an INTEGER column is a bigint)
+_INTEGER_METRICS = {'invoiced_quantity'}
+# Other (NUMERIC) sums are rounded to drop float noise such as 1236974.7799999996
+_NUMERIC_DIGITS = 6
+# Group codes are packed into one int64 key while the product of the column radices fits
+_MAX_PACKED_KEY = 2 ** 63 - 1
+_MONTH_NAMES = {name: number for number, names in enumerate([
+    ('jan', 'january'), ('feb', 'february'), ('mar', 'march'), ('apr', 'april'),
+    ('may',), ('jun', 'june'), ('jul', 'july'), ('aug', 'august'),
+    ('sep', 'sept', 'september'), ('oct', 'october'), ('nov', 'november'), ('dec', 'december'),
+], start=1) for name in names}
+
+
+def month_number(value):
+    """Month as 1-12 from an int, a digit string or a month name ('JAN', 'January'); None otherwise"""
+    if value is None or isinstance(value, bool):
+        return None
+    text = str(value).strip().lower()
+    if text in _MONTH_NAMES:
+        return _MONTH_NAMES[text]
+    try:
+        number = int(float(text))
+    except ValueError:
+        return None
+    return number if 1 <= number <= 12 and number == float(text) else None
+
+
+def _code_dtype(cardinality: int):
+    """Smallest signed integer type that can hold codes 0..cardinality-1 plus -1 for NULL"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if cardinality < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _normalize_label(column: str, value):
+    if value is None:
+        return None
+    if column == 'month':
+        return month_number(value)
+    if column in _INTEGER_DIMENSIONS:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if isinstance(value, bool):
+        return value
+    return str(value)
+
+
+class SalesCube:
+    """
+    Columnar in-memory copy of sales_transactions.
+
+    dims:    {column: (codes ndarray[int], labels list)}  - code -1 means NULL
+    metrics: {column: ndarray[float64]}                   - NaN means NULL
+    """
+
+    def __init__(self, dims: dict, metrics: dict, n_rows: int, built_at: float = None):
+        self.dims = dims
+        self.metrics = metrics
+        self.n_rows = n_rows
+        self.built_at = built_at or time.time()
+        self._label_index = {name: {label: code for code, label in enumerate(labels)}
+                             for name, (_, labels) in dims.items()}
+
+    # ==================== Construction & persistence ====================
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build a cube from an ingestion DataFrame (only columns present in the frame are used)"""
+        import pandas as pd  # deferred: only ingestion builds cubes
+
+        dims = {}
+        for column in DIMENSIONS:
+            if column not in df.columns:
+                continue
+            series = df[column]
+            if column == 'month':
+                series = series.map(month_number).astype('Int64')
+            elif column in _INTEGER_DIMENSIONS:
+                series = pd.to_numeric(series, errors='coerce').round().astype('Int64')
+            else:
+                series = series.where(pd.notnull(series), None).map(lambda v: None if v is None else _normalize_label(column, v))
+            codes, uniques = pd.factorize(series, sort=True, use_na_sentinel=True)
+            labels = [_normalize_label(column, v) for v in uniques.tolist()]
+            dims[column] = (codes.astype(_code_dtype(len(labels))), labels)
+
+        metrics = {}
+        for column in METRICS:
+            if column in df.columns:
+                metrics[column] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+        return cls(dims, metrics, len(df))
+
+    def append(self, other: "SalesCube") -> "SalesCube":
+        """Return a new cube with `other`'s rows appended (labels are merged and codes remapped)"""
+        dims = {}
+        for name in set(self.dims) & set(other.dims):
+            codes_a, labels_a = self.dims[name]
+            codes_b, labels_b = other.dims[name]
+            index = dict(self._label_index[name])
+            labels = list(labels_a)
+            for label in labels_b:
+                if label not in index:
+                    index[label] = len(labels)
+                    labels.append(label)
+            remap = np.array([index[label] for label in labels_b] + [-1], dtype=np.int64)
+            # codes_b == -1 indexes the trailing -1 entry, so NULLs stay NULL
+            merged = np.concatenate([codes_a.astype(np.int64), remap[codes_b.astype(np.int64)]])
+            dims[name] = (merged.astype(_code_dtype(len(labels))), labels)
+        metrics = {name: np.concatenate([self.metrics[name], other.metrics[name]])
+                   for name in set(self.metrics) & set(other.metrics)}
+        return SalesCube(dims, metrics, self.n_rows + other.n_rows)
+
+    def save(self, path):
+        """Write the cube atomically (temp file + rename) so readers never see a partial file"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {f"dim__{name}": codes for name, (codes, _) in self.dims.items()}
+        arrays.update({f"metric__{name}": values for name, values in self.metrics.items()})
+        arrays.update(self._extra_arrays())
+        meta = {
+            "labels": {name: labels for name, (_, labels) in self.dims.items()},
+            "n_rows": self.n_rows,
+            "built_at": self.built_at,
+        }
+        arrays["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as archive:
+            meta = json.loads(archive["meta"].tobytes().decode("utf-8"))
+            dims = {}
+            metrics = {}
+            for key in archive.files:
+                if key.startswith("dim__"):
+                    name = key[len("dim__"):]
+                    dims[name] = (archive[key], meta["labels"][name])
+                elif key.startswith("metric__"):
+                    metrics[key[len("metric__"):]] = archive[key]
+        return cls(dims, metrics, meta["n_rows"], meta.get("built_at"))
+
+    def _extra_arrays(self) -> dict:
+        """Additional arrays stored by subclasses (see sampling.py)"""
+        return {}
+
+    def nbytes(self) -> int:
+        return sum(codes.nbytes for codes, _ in self.dims.values()) + sum(v.nbytes for v in self.metrics.values())
+
+    # ==================== Query primitives ====================
+
+    def codes_for(self, column: str, values) -> np.ndarray:
+        """Codes of the given label values (unknown values are dropped)"""
+        index = self._label_index[column]
+        codes = []
+        for value in values:
+            code = index.get(_normalize_label(column, value))
+            if code is not None:
+                codes.append(code)
+        return np.array(codes, dtype=np.int64)
+
+    def mask(self, filters) -> np.ndarray:
+        """
+        Boolean row mask for a list of (column, op, values) filters, ANDed together.
+        ops: "in", "not in", ">", ">=", "<", "<=" (comparisons only on integer dimensions).
+        """
+        mask = np.ones(self.n_rows, dtype=bool)
+        for column, op, values in filters:
+            codes, labels = self.dims[column]
+            if op in ("in", "not in"):
+                hit = np.isin(codes, self.codes_for(column, values))
+                mask &= hit if op == "in" else (~hit & (codes >= 0))
+            else:
+                bound = _normalize_label(column, values[0])
+                compare = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}[op]
+                allowed = [code for code, label in enumerate(labels) if label is not None and compare(label, bound)]
+                mask &= np.isin(codes, np.array(allowed, dtype=np.int64))
+        return mask
+
+    def _groups(self, by: list, mask: np.ndarray):
+        """
+        Group the selected rows by the `by` columns.
+        Returns (label tuple per group, group index per selected row); groups are ordered by code.
+        Codes are packed into one int64 key per row when the product of the column radices fits,
+        otherwise the stacked code rows are grouped directly (slower, but cannot overflow).
+        """
+        n_selected = int(mask.sum())
+        if not by:
+            return [()], np.zeros(n_selected, dtype=np.int64)
+        # NULL codes (-1) are shifted to 0
+        codes = [self.dims[column][0][mask].astype(np.int64) + 1 for column in by]
+        radices = [len(self.dims[column][1]) + 1 for column in by]
+        if math.prod(radices) <= _MAX_PACKED_KEY:
+            keys = np.zeros(n_selected, dtype=np.int64)
+            for column_codes, radix in zip(codes, radices):
+                keys = keys * radix + column_codes
+            packed, inverse = np.unique(keys, return_inverse=True)
+            group_codes = []
+            for radix in reversed(radices):
+                group_codes.append(packed % radix)
+                packed = packed // radix
+            group_codes.reverse()
+        else:
+            rows, inverse = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+            group_codes = list(rows.T)
+        columns = []
+        for column, column_codes in zip(by, group_codes):
+            labels = self.dims[column][1]
+            columns.append([labels[c - 1] if c > 0 else None for c in column_codes.tolist()])
+        return list(zip(*columns)), inverse.reshape(-1)
+
+    def aggregate(self, by: list, aggregates: list, filters=()) -> list:
+        """
+        Filtered group-by over the cube.
+        aggregates: list of (kind, column) with kind in "sum", "count", "count_distinct".
+        Returns a list of (group_labels_tuple, [aggregate values]) sorted by group labels.
+        """
+        mask = self.mask(filters)
+        labels, inverse = self._groups(by, mask)
+        if by and not len(inverse):
+            return []
+        n_groups = len(labels)
+
+        results = []
+        for kind, column in aggregates:
+            if kind == "sum":
+                values = self.metrics[column][mask]
+                present = ~np.isnan(values)
+                totals = np.bincount(inverse[present], weights=values[present], minlength=n_groups)
+                counts = np.bincount(inverse[present], minlength=n_groups)
+                # SUM over only NULLs is NULL in SQL
+                results.append([float(t) if c else None for t, c in zip(totals.tolist(), counts.tolist())])
+            elif kind == "count":
+                results.append(np.bincount(inverse, minlength=n_groups).tolist())
+            elif kind == "count_distinct":
+                codes = self.dims[column][0][mask].astype(np.int64)
+                present = codes >= 0
+                radix = max(1, len(self.dims[column][1]))
+                pairs = np.unique(inverse[present] * radix + codes[present])
+                results.append(np.bincount(pairs // radix, minlength=n_groups).tolist())
+            else:
+                raise ValueError(f"Unsupported aggregate: {kind}")
+
+        return [(labels[g], [r[g] for r in results]) for g in range(n_groups)]
+
+    # ==================== SQL shape matching ====================
+
+    def try_execute(self, sql: str):
+        """Answer `sql` from the cube if it has a supported aggregation shape, else return None"""
+        plan = parse_aggregate_sql(sql)
+        if plan is None or not self._supports(plan):
+            return None
+        return execute_plan(self, plan)
+
+    def can_answer(self, sql: str) -> bool:
+        """Whether try_execute(sql) would answer from the cube"""
+        plan = parse_aggregate_sql(sql)
+        return plan is not None and self._supports(plan)
+
+    def _supports(self, plan: dict) -> bool:
+        for column in plan["group_by"]:
+            if column not in self.dims:
+                return False
+        for column, op, values in plan["filters"]:
+            if column not in self.dims:
+                return False
+            if op not in ("in", "not in") and column not in _INTEGER_DIMENSIONS:
+                return False
+            # Literals that do not map onto stored labels (month = 'Q1') are left to the database
+            if any(value is not None and _normalize_label(column, value) is None for value in values):
+                return False
+        for item in plan["select"]:
+            if item["kind"] == "column" and item["column"] not in self.dims:
+                return False
+            if item["kind"] == "sum" and item["column"] not in self.metrics:
+                return False
+            if item["kind"] == "count_distinct" and item["column"] not in self.dims:
+                return False
+        return True
+
+
+_IDENT = r"[a-z_][a-z0-9_]*"
+_SHAPE_RE = re.compile(
+    r"^\s*SELECT\s+(?P<select>.+?)\s+FROM\s+(?P<table>" + _IDENT + r")"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+GROUP\s+BY\s+(?P<group>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?"
+    r"(?:\s+LIMIT\s+(?P<limit>\d+))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_UNSUPPORTED_RE = re.compile(r"\b(JOIN|HAVING|UNION|OVER|WITH|CASE|DISTINCT\s+ON|OFFSET)\b|\(\s*SELECT\b", re.IGNORECASE)
+_AGG_RE = re.compile(
+    r"^(?:(?P<func>SUM|COUNT)\s*\(\s*(?P<distinct>DISTINCT\s+)?(?P<arg>\*|" + _IDENT + r")\s*\)|(?P<col>" + _IDENT + r"))"
+    r"(?:\s+(?:AS\s+)?(?P<alias>" + _IDENT + r"|\"[^\"]+\"))?$",
+    re.IGNORECASE,
+)
+_LITERAL = r"(?:'(?:[^']|'')*'|-?\d+(?:\.\d+)?|TRUE|FALSE)"
+_COND_RE = re.compile(
+    r"^(?P<col>" + _IDENT + r")\s*(?:"
+    r"(?P<op>=|<>|!=|>=|<=|>|<)\s*(?P<lit>" + _LITERAL + r")"
+    r"|(?P<not>NOT\s+)?IN\s*\((?P<list>[^()]*)\)"
+    r"|BETWEEN\s+(?P<low>" + _LITERAL + r")\s+AND\s+(?P<high>" + _LITERAL + r"))$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _split_top_level(text: str, separator_re: str) -> list:
+    """Split on a separator regex, ignoring separators inside parentheses or quotes"""
+    parts, depth, quoted, start = [], 0, False, 0
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "'":
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0:
+            match = re.match(separator_re, text[i:], re.IGNORECASE)
+            # Word separators (AND) must not match inside identifiers such as "brand"
+            word = match and match.group(0).strip()[:1].isalpha()
+            if match and not (word and i > 0 and (text[i - 1].isalnum() or text[i - 1] == "_")):
+                parts.append(text[start:i])
+                i += match.end()
+                start = i
+                continue
+        i += 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _literal(text: str):
+    text = text.strip()
+    if text.startswith("'"):
+        return text[1:-1].replace("''", "'")
+    if text.upper() in ("TRUE", "FALSE"):
+        return text.upper() == "TRUE"
+    return float(text) if "." in text else int(text)
+
+
+def _parse_conditions(where: str):
+    # BETWEEN's inner AND is glued back onto its condition below
+    pieces = _split_top_level(where, r"\s*\bAND\b\s*")
+    conditions = []
+    i = 0
+    while i < len(pieces):
+        piece = pieces[i]
+        if re.search(r"\bBETWEEN\b", piece, re.IGNORECASE) and i + 1 < len(pieces):
+            piece = f"{piece} AND {pieces[i + 1]}"
+            i += 1
+        conditions.append(piece.strip().strip("()").strip() if piece.count("(") == 1 and piece.startswith("(") else piece)
+        i += 1
+
+    filters = []
+    for condition in conditions:
+        match = _COND_RE.match(condition)
+        if not match:
+            return None
+        column = match.group("col").lower()
+        if match.group("op"):
+            op = match.group("op")
+            value = _literal(match.group("lit"))
+            if op == "=":
+                filters.append((column, "in", [value]))
+            elif op in ("<>", "!="):
+                filters.append((column, "not in", [value]))
+            else:
+                filters.append((column, op, [value]))
+        elif match.group("list") is not None:
+            values = [_literal(v) for v in _split_top_level(match.group("list"), r"\s*,\s*")]
+            filters.append((column, "not in" if match.group("not") else "in", values))
+        else:
+            filters.append((column, ">=", [_literal(match.group("low"))]))
+            filters.append((column, "<=", [_literal(match.group("high"))]))
+    return filters
+
+
+def parse_aggregate_sql(sql: str, table: str = "sales_transactions"):
+    """
+    Parse the common single-table aggregation shape into a plan dict, or return None:
+    SELECT dims, SUM(metric), COUNT(*), COUNT(DISTINCT dim) FROM <table>
+    [WHERE simple AND-ed predicates] [GROUP BY dims] [ORDER BY ...] [LIMIT n]
+    """
+    sql = sql.strip().rstrip(";")
+    if _UNSUPPORTED_RE.search(sql):
+        return None
+    match = _SHAPE_RE.match(sql)
+    if not match or match.group("table").lower() != table:
+        return None
+
+    select = []
+    for item in _split_top_level(match.group("select"), r"\s*,\s*"):
+        m = _AGG_RE.match(item)
+        if not m:
+            return None
+        alias = m.group("alias").strip('"') if m.group("alias") else None
+        if m.group("col"):
+            column = m.group("col").lower()
+            select.append({"kind": "column", "column": column, "name": alias or column})
+        elif m.group("func").upper() == "SUM":
+            if m.group("distinct") or m.group("arg") == "*":
+                return None
+            select.append({"kind": "sum", "column": m.group("arg").lower(), "name": alias or "sum"})
+        elif m.group("distinct"):
+            select.append({"kind": "count_distinct", "column": m.group("arg").lower(), "name": alias or "count"})
+        elif m.group("arg") == "*":
+            select.append({"kind": "count", "column": None, "name": alias or "count"})
+        else:
+            # COUNT(col) skips NULLs; not supported by the cube primitives
+            return None
+
+    filters = _parse_conditions(match.group("where")) if match.group("where") else []
+    if filters is None:
+        return None
+
+    group_by = []
+    if match.group("group"):
+        for item in _split_top_level(match.group("group"), r"\s*,\s*"):
+            if item.isdigit():
+                index = int(item) - 1
+                if not 0 <= index < len(select) or select[index]["kind"] != "column":
+                    return None
+                group_by.append(select[index]["column"])
+            elif re.fullmatch(_IDENT, item, re.IGNORECASE):
+                group_by.append(item.lower())
+            else:
+                return None
+
+    plain_columns = [s["column"] for s in select if s["kind"] == "column"]
+    has_aggregates = any(s["kind"] != "column" for s in select)
+    if not has_aggregates or set(plain_columns) != set(group_by):
+        # Plain column selects must be exactly the GROUP BY columns
+        return None
+
+    order = []
+    if match.group("order"):
+        for item in _split_top_level(match.group("order"), r"\s*,\s*"):
+            m = re.fullmatch(r"(?P<expr>.+?)(?:\s+(?P<dir>ASC|DESC))?(?:\s+NULLS\s+(?:FIRST|LAST))?", item, re.IGNORECASE | re.DOTALL)
+            expr = m.group("expr").strip()
+            position = _resolve_order_target(expr, select)
+            if position is None:
+                return None
+            order.append((position, (m.group("dir") or "ASC").upper() == "DESC"))
+
+    return {
+        "select": select,
+        "filters": filters,
+        "group_by": group_by,
+        "order": order,
+        "limit": int(match.group("limit")) if match.group("limit") else None,
+    }
+
+
+def _resolve_order_target(expr: str, select: list):
+    """Index of the select item an ORDER BY expression refers to (alias, expression or ordinal)"""
+    if expr.isdigit():
+        index = int(expr) - 1
+        return index if 0 <= index < len(select) else None
+    normalized = re.sub(r"\s+", "", expr.lower())
+    for index, item in enumerate(select):
+        if normalized == item["name"].lower():
+            return index
+        if item["kind"] == "column" and normalized == item["column"]:
+            return index
+        expression = {
+            "sum": f"sum({item['column']})",
+            "count": "count(*)",
+            "count_distinct": f"count(distinct{item['column']})",
+        }.get(item["kind"])
+        if expression and normalized == expression:
+            return index
+    return None
+
+
+def _sort_rows(rows: list, order: list, names: list) -> list:
+    # Stable multi-key sort applied from the last key to the first; NULLs sort as largest (Postgres default)
+    for position, descending in reversed(order):
+        name = names[position]
+        present = [r for r in rows if r[name] is not None]
+        missing = [r for r in rows if r[name] is None]
+        present.sort(key=lambda r: r[name], reverse=descending)
+        rows = missing + present if descending else present + missing
+    return rows
+
+
+def execute_plan(cube: SalesCube, plan: dict, finalize=None) -> list:
+    """
+    Run a parsed plan on a cube and shape the output like the execute_sql RPC would.
+    `finalize(kind, column, value)` replaces the default post-processing of aggregate values
+    (rounding of sums to the column's precision); approximate mode uses it to keep interval estimates.
+    """
+    aggregates = [(s["kind"], s["column"]) for s in plan["select"] if s["kind"] != "column"]
+    grouped = cube.aggregate(plan["group_by"], aggregates, plan["filters"])
+
+    names = [s["name"] for s in plan["select"]]
+    rows = []
+    for labels, values in grouped:
+        by_column = dict(zip(plan["group_by"], labels))
+        aggregate_values = iter(values)
+        row = {}
+        for item in plan["select"]:
+            if item["kind"] == "column":
+                row[item["name"]] = by_column[item["column"]]
+                continue
+            value = next(aggregate_values)
+            if finalize is not None:
+                value = finalize(item["kind"], item["column"], value)
+            elif item["kind"] == "sum" and value is not None:
+                value = int(round(value)) if item["column"] in _INTEGER_METRICS else round(value, _NUMERIC_DIGITS)
+            row[item["name"]] = value
+        rows.append(row)
+
+    if plan["order"]:
+        rows = _sort_rows(rows, plan["order"], names)
+    if plan["limit"] is not None:
+        rows = rows[:plan["limit"]]
+    return rows
+
+
+# ==================== Process-wide cube ====================
+
+def cube_path() -> Path:
+    return Path(os.getenv("CUBE_PATH", str(DEFAULT_CUBE_PATH)))
+
+
+_cube = ReloadingArtifact(cube_path, SalesCube.load, enabled_env="CUBE_ENABLED",
+                          describe=lambda cube: f"sales cube: {cube.n_rows} rows, {cube.nbytes() / 1e6:.1f} MB")
+
+
+def get_cube():
+    """Return the loaded cube, or None if disabled or not built yet (re-loaded when ingestion replaces it)"""
+    return _cube.get()
+
+
+def build_and_save_cube(df, append: bool = False):
+    """
+    Ingestion hook: build the cube from the ingested frame (optionally appending to the existing one).
+    Raises FileNotFoundError when appending without an existing cube, since the frame alone
+    does not cover the table; the caller rebuilds from the full table instead.
+    """
+    path = cube_path()
+    if append and not path.exists():
+        raise FileNotFoundError(f"Cannot append to a missing cube ({path})")
+    cube = SalesCube.from_frame(df)
+    if append:
+        cube = SalesCube.load(path).append(cube)
+    cube.save(path)
+    print(f"✓ Sales cube saved to {path} ({cube.n_rows} rows, {cube.nbytes() / 1e6:.1f} MB)")
+    return cube
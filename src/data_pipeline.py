@@ -1,8 +1,44 @@
-# ingest.py
+# data_pipeline.py
+# Sales workbook ingestion into sales_transactions. Run directly for the single default
+# workbook, or use ingest.py to ingest many workbooks in parallel.
 import os
+import subprocess
+import sys
+import warnings
 import pandas as pd
+from collections import defaultdict
 from datetime import datetime
-from database import supabase
+
+try:
+    from .database import get_supabase, get_service_supabase
+    from .cache import get_cache
+    from .cube import build_and_save_cube, cube_path, month_number
+    from .sampling import build_and_save_sample, sample_path
+    from .hll import build_and_save_sketches, sketch_path
+    from .value_index import build_and_save_value_index, index_path
+except ImportError:
+    # Run as a script from src/
+    from database import get_supabase, get_service_supabase
+    from cache import get_cache
+    from cube import build_and_save_cube, cube_path, month_number
+    from sampling import build_and_save_sample, sample_path
+    from hll import build_and_save_sketches, sketch_path
+    from value_index import build_and_save_value_index, index_path
+
+TABLE = "sales_transactions"
+SHEET = "Sales 2022 Onwards"
+BATCH_SIZE = 1000
+# Rows per request when reading the whole table back to rebuild the API artifacts
+FETCH_PAGE_SIZE = 1000
+# API artifacts built from the cleaned frame: (builder, path of the saved artifact)
+ARTIFACTS = [
+    (build_and_save_cube, cube_path),
+    (build_and_save_sample, sample_path),
+    (build_and_save_sketches, sketch_path),
+    (build_and_save_value_index, index_path),
+]
+# Re-run popular questions against the new data once ingestion has finished
+WARM_AFTER_INGEST = os.getenv("WARM_AFTER_INGEST", "1").lower() in ("1", "true", "yes")
 
 # Get the project root directory (parent of src/)
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -35,34 +71,8 @@ SCHEMA_COLUMNS = [
     'invoiced_quantity', 'value'
 ]
 
-# Check if data already exists in the table
-try:
-    existing_data = supabase.table("sales_transactions").select("id", count="exact").limit(1).execute()
-    if existing_data.count and existing_data.count > 0:
-        print(f"⚠️  Warning: Table 'sales_transactions' already contains {existing_data.count} records.")
-        response = input("Do you want to continue and add more data? (yes/no): ").strip().lower()
-        if response != "yes":
-            print("Operation cancelled.")
-            exit(0)
-except Exception as e:
-    print(f"Note: Could not check existing data: {e}")
-    print("Proceeding with data ingestion...")
-
-# Read Excel file
-print("Reading Excel file...")
-print(f"Looking for file at: {excel_path}")
-if not os.path.exists(excel_path):
-    print(f"❌ Error: File not found at {excel_path}")
-    exit(1)
-print("Reading sheet: 'Sales 2022 Onwards'")
-df = pd.read_excel(excel_path, sheet_name="Sales 2022 Onwards")
-print(f"Loaded {len(df)} rows from Excel")
-
-# Clean column names to match your schema
-df.columns = df.columns.str.lower().str.replace(" ", "_")
-
 # Map common column name variations to schema column names
-column_mapping = {
+COLUMN_MAPPING = {
     'salesmen': 'salesman',  # Handle plural form
     'sales_men': 'salesman',
     'quantity': 'invoiced_quantity',  # Map old column name to new
@@ -71,59 +81,29 @@ column_mapping = {
     'invoice_id': 'invoice_number',  # Map old column name to new
 }
 
-# Apply column name mapping
-for old_name, new_name in column_mapping.items():
-    if old_name in df.columns and new_name not in df.columns:
-        df.rename(columns={old_name: new_name}, inplace=True)
-
-# Filter to only include columns that exist in the database schema
-available_columns = [col for col in SCHEMA_COLUMNS if col in df.columns]
-missing_columns = [col for col in SCHEMA_COLUMNS if col not in df.columns]
-
-if missing_columns:
-    print(f"⚠️  Warning: The following schema columns are missing from Excel: {', '.join(missing_columns)}")
 
-if not available_columns:
-    print("❌ Error: No matching columns found between Excel and database schema!")
-    exit(1)
-
-print(f"✓ Found {len(available_columns)} matching columns: {', '.join(available_columns)}")
-df = df[available_columns]  # Keep only schema columns
-
-# Convert datetime columns to strings (for JSON serialization)
-# Suppress warnings for datetime parsing
-import warnings
-warnings.filterwarnings('ignore', category=UserWarning)
-
-for col in df.columns:
-    if col == 'invoice_date' or 'date' in col.lower():
-        # Convert datetime to date string (YYYY-MM-DD format)
-        df[col] = pd.to_datetime(df[col], errors='coerce', infer_datetime_format=False).dt.strftime('%Y-%m-%d')
-        # Replace NaT (Not a Time) with None
-        df[col] = df[col].replace('NaT', None).replace('nan', None)
-
-# Replace NaN/NaT with None for proper JSON serialization
-df = df.where(pd.notnull(df), None)
-
-# Convert boolean columns properly (handle string booleans too)
-if 'promo_item' in df.columns:
-    if df['promo_item'].dtype == 'bool':
-        # Already boolean, just ensure None handling
-        df['promo_item'] = df['promo_item'].where(pd.notnull(df['promo_item']), None)
-    else:
-        # Convert string/other types to boolean
-        def convert_to_bool(val):
-            if pd.isna(val) or val is None:
-                return None
-            val_str = str(val).lower().strip()
-            if val_str in ['true', 'yes', '1', 'y']:
+def confirm_append(supabase, assume_yes: bool = False) -> bool:
+    """
+    Check whether the table already holds data and ask before adding more (unless assume_yes).
+    Returns True when appending to existing data; exits if the user declines.
+    """
+    try:
+        existing_data = supabase.table(TABLE).select("id", count="exact").limit(1).execute()
+        if existing_data.count and existing_data.count > 0:
+            print(f"⚠️  Warning: Table '{TABLE}' already contains {existing_data.count} records.")
+            if assume_yes:
                 return True
-            elif val_str in ['false', 'no', '0', 'n']:
-                return False
-            return None
-        df['promo_item'] = df['promo_item'].apply(convert_to_bool)
+            response = input("Do you want to continue and add more data? (yes/no): ").strip().lower()
+            if response != "yes":
+                print("Operation cancelled.")
+                sys.exit(0)
+            return True
+    except Exception as e:
+        print(f"Note: Could not check existing data: {e}")
+        print("Proceeding with data ingestion...")
+    return False
+
 
-# Convert integer columns (handle float to int conversion properly)
 def convert_to_int64(series):
     """Convert a series to nullable Int64, handling float values and NaN"""
     # Convert to numeric first (handles strings, etc.)
@@ -133,54 +113,294 @@ def convert_to_int64(series):
     # Convert to Int64 (nullable integer type)
     return numeric.astype('Int64')
 
-if 'invoiced_quantity' in df.columns:
-    df['invoiced_quantity'] = convert_to_int64(df['invoiced_quantity'])
-if 'year' in df.columns:
-    df['year'] = convert_to_int64(df['year'])
-# month is kept as text (as it comes from Excel) - no conversion needed
-
-# Replace NaN/NaT with None for proper JSON serialization
-df = df.where(pd.notnull(df), None)
-
-# Convert DataFrame to list of dictionaries
-records = df.to_dict('records')
-
-# Additional cleanup: ensure all datetime objects are strings and handle NaN/NA values
-for record in records:
-    for key, value in record.items():
-        if isinstance(value, datetime):
-            record[key] = value.strftime('%Y-%m-%d')
-        elif pd.isna(value) or value == 'nan' or value == 'NaT' or str(value) == '<NA>':
-            record[key] = None
-        # Convert pandas nullable integer to Python int or None
-        elif isinstance(value, (int, float)) and not pd.isna(value):
-            # Convert to int if it's a whole number, otherwise keep as float
-            if isinstance(value, float) and value.is_integer():
-                record[key] = int(value)
-            elif isinstance(value, int):
-                record[key] = value
-total_batches = (len(records) + 999) // 1000  # Calculate total batches
-
-# Insert in batches (Supabase has limits on batch size, typically 1000 rows)
-batch_size = 1000
-inserted_count = 0
-failed_batches = 0
-
-print(f"\nStarting data ingestion ({total_batches} batches)...")
-for i in range(0, len(records), batch_size):
-    batch = records[i:i + batch_size]
-    batch_num = i//batch_size + 1
+
+def convert_to_bool(val):
+    if pd.isna(val) or val is None:
+        return None
+    val_str = str(val).lower().strip()
+    if val_str in ['true', 'yes', '1', 'y']:
+        return True
+    elif val_str in ['false', 'no', '0', 'n']:
+        return False
+    return None
+
+
+def transform(df: pd.DataFrame, verbose: bool = True):
+    """
+    Clean a raw sales sheet into the sales_transactions schema.
+    Returns (frame, records): the cleaned frame (used for the cube and value index) and
+    JSON-ready row dicts for the loader. Raises ValueError if no schema column is present.
+    """
+    # Clean column names to match your schema
+    df = df.copy()
+    df.columns = [str(col).lower().replace(" ", "_") for col in df.columns]
+
+    # Apply column name mapping
+    for old_name, new_name in COLUMN_MAPPING.items():
+        if old_name in df.columns and new_name not in df.columns:
+            df.rename(columns={old_name: new_name}, inplace=True)
+
+    # Filter to only include columns that exist in the database schema
+    available_columns = [col for col in SCHEMA_COLUMNS if col in df.columns]
+    missing_columns = [col for col in SCHEMA_COLUMNS if col not in df.columns]
+
+    if missing_columns and verbose:
+        print(f"⚠️  Warning: The following schema columns are missing from Excel: {', '.join(missing_columns)}")
+
+    if not available_columns:
+        raise ValueError("No matching columns found between Excel and database schema!")
+
+    if verbose:
+        print(f"✓ Found {len(available_columns)} matching columns: {', '.join(available_columns)}")
+    df = df[available_columns]  # Keep only schema columns
+
+    # Convert datetime columns to strings (for JSON serialization)
+    # Suppress warnings for datetime parsing
+    warnings.filterwarnings('ignore', category=UserWarning)
+
+    for col in df.columns:
+        if col == 'invoice_date' or 'date' in col.lower():
+            # Convert datetime to date string (YYYY-MM-DD format)
+            df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
+            # Replace NaT (Not a Time) with None
+            df[col] = df[col].replace('NaT', None).replace('nan', None)
+
+    # Replace NaN/NaT with None for proper JSON serialization
+    df = df.where(pd.notnull(df), None)
+
+    # Convert boolean columns properly (handle string booleans too)
+    if 'promo_item' in df.columns:
+        if df['promo_item'].dtype == 'bool':
+            # Already boolean, just ensure None handling
+            df['promo_item'] = df['promo_item'].where(pd.notnull(df['promo_item']), None)
+        else:
+            # Convert string/other types to boolean
+            df['promo_item'] = df['promo_item'].apply(convert_to_bool)
+
+    # Convert integer columns (handle float to int conversion properly)
+    if 'invoiced_quantity' in df.columns:
+        df['invoiced_quantity'] = convert_to_int64(df['invoiced_quantity'])
+    if 'year' in df.columns:
+        df['year'] = convert_to_int64(df['year'])
+        # year is the partition key (NOT NULL in the partitioned schema): fill gaps from
+        # invoice_date and skip rows that have neither, instead of failing their whole batch
+        missing = df['year'].isna()
+        if missing.any() and 'invoice_date' in df.columns:
+            df.loc[missing, 'year'] = pd.to_datetime(df.loc[missing, 'invoice_date'], errors='coerce').dt.year.astype('Int64')
+        rejected = df['year'].isna()
+        if rejected.any():
+            print(f"⚠️  Warning: skipping {int(rejected.sum())} rows with no year and no invoice_date to derive it from")
+            df = df[~rejected].copy()
+    if 'month' in df.columns:
+        # The workbook has month names ('JAN'); the table stores month as INTEGER 1-12
+        months = df['month'].map(month_number).astype('Int64')
+        unparsed = int((months.isna() & df['month'].notna()).sum())
+        if unparsed and verbose:
+            print(f"⚠️  Warning: {unparsed} rows have an unrecognized month; stored as NULL")
+        df['month'] = months
+
+    # Replace NaN/NaT with None for proper JSON serialization
+    df = df.where(pd.notnull(df), None)
+
+    # Convert DataFrame to list of dictionaries
+    records = df.to_dict('records')
+
+    # Additional cleanup: ensure all datetime objects are strings and handle NaN/NA values
+    for record in records:
+        for key, value in record.items():
+            if isinstance(value, datetime):
+                record[key] = value.strftime('%Y-%m-%d')
+            elif pd.isna(value) or value == 'nan' or value == 'NaT' or str(value) == '<NA>':
+                record[key] = None
+            # Convert pandas nullable integer to Python int or None
+            elif isinstance(value, (int, float)) and not pd.isna(value):
+                # Convert to int if it's a whole number, otherwise keep as float
+                if isinstance(value, float) and value.is_integer():
+                    record[key] = int(value)
+                elif isinstance(value, int):
+                    record[key] = value
+    return df, records
+
+
+# Years whose partition is known to exist (partitioned schema, see setup_partitioned_sales.sql)
+_ensured_years = set()
+
+
+def ensure_partitions(years) -> bool:
+    """
+    Create any missing year partitions via the ensure_sales_partition RPC.
+    The RPC runs DDL and is only granted to the service role, so it is called with the
+    SUPABASE_SERVICE_ROLE_KEY client. Returns False when that key is not set or the RPC is
+    unavailable (non-partitioned schema); loading still works then, and on the partitioned
+    schema rows for years without a partition go to the default partition.
+    """
+    missing = sorted(set(years) - _ensured_years)
+    if not missing:
+        return True
+    service = get_service_supabase()
+    if service is None:
+        print("Note: SUPABASE_SERVICE_ROLE_KEY is not set, so year partitions are not created; "
+              "rows for years without a partition go to the default partition.")
+        return False
+    for year in missing:
+        try:
+            service.rpc("ensure_sales_partition", {"p_year": int(year)}).execute()
+            _ensured_years.add(year)
+        except Exception as e:
+            print(f"Note: Could not ensure partition for {year} ({e}); assuming a non-partitioned table.")
+            return False
+    return True
+
+
+def load(records: list, supabase, batch_size: int = BATCH_SIZE, verbose: bool = True):
+    """
+    Insert records in batches (Supabase has limits on batch size, typically 1000 rows). Returns (inserted, failed_batches)
+    Rows are grouped by year so every batch targets a single year partition, and missing partitions are created first.
+    """
+    by_year = defaultdict(list)
+    for record in records:
+        by_year[record.get('year')].append(record)
+    ensure_partitions([year for year in by_year if year is not None])
+
+    batches = []
+    for year in sorted(by_year, key=lambda y: (y is None, y or 0)):
+        group = by_year[year]
+        batches.extend(group[i:i + batch_size] for i in range(0, len(group), batch_size))
+    total_batches = len(batches)
+    inserted_count = 0
+    failed_batches = 0
+
+    if verbose:
+        print(f"\nStarting data ingestion ({total_batches} batches across {len(by_year)} years)...")
+    for batch_num, batch in enumerate(batches, start=1):
+        try:
+            supabase.table(TABLE).insert(batch).execute()
+            inserted_count += len(batch)
+            if verbose:
+                print(f"✓ Inserted batch {batch_num}/{total_batches} ({len(batch)} rows, year {batch[0].get('year')}) - Total: {inserted_count} rows")
+        except Exception as e:
+            failed_batches += 1
+            print(f"✗ Error inserting batch {batch_num}/{total_batches}: {e}")
+    return inserted_count, failed_batches
+
+
+def fetch_table_frame(supabase) -> pd.DataFrame:
+    """Read the whole sales table back (paginated) as a cleaned frame, for full artifact rebuilds"""
+    rows = []
+    while True:
+        page = (supabase.table(TABLE).select(",".join(SCHEMA_COLUMNS)).order("id")
+                .range(len(rows), len(rows) + FETCH_PAGE_SIZE - 1).execute().data or [])
+        rows.extend(page)
+        if len(page) < FETCH_PAGE_SIZE:
+            break
+    print(f"Read {len(rows)} rows back from '{TABLE}' to rebuild the API artifacts")
+    df, _ = transform(pd.DataFrame(rows, columns=SCHEMA_COLUMNS), verbose=False)
+    return df
+
+
+def build_artifacts(df: pd.DataFrame, appending: bool, supabase=None):
+    """
+    Build the in-process OLAP cube, the approximate-mode sample, the distinct-count sketches and
+    the dimension-value index the API uses.
+    When rows were appended to an existing table, they are appended to the existing artifacts too.
+    An artifact that does not exist yet is rebuilt from the whole table instead, and one whose
+    build fails is removed, so the API never serves an artifact that misses rows.
+    """
+    full_frame = None
+    for build_artifact, artifact_path in ARTIFACTS:
+        try:
+            if appending and not artifact_path().exists():
+                if full_frame is None:
+                    full_frame = fetch_table_frame(supabase or get_supabase())
+                build_artifact(full_frame, append=False)
+            else:
+                build_artifact(df, append=appending)
+        except Exception as e:
+            print(f"⚠️  {build_artifact.__name__} failed: {e}")
+            remove_artifact(artifact_path())
+
+
+def remove_artifact(path):
     try:
-        supabase.table("sales_transactions").insert(batch).execute()
-        inserted_count += len(batch)
-        print(f"✓ Inserted batch {batch_num}/{total_batches} ({len(batch)} rows) - Total: {inserted_count} rows")
+        os.remove(path)
+        print(f"Removed stale {path}; the API answers those queries from the database until the next build")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️  Could not remove stale {path}: {e}")
+
+
+def invalidate_artifacts():
+    """Remove all API artifacts, e.g. when rows were inserted but the artifacts could not be updated"""
+    for _, artifact_path in ARTIFACTS:
+        remove_artifact(artifact_path())
+
+
+def clear_cached_results():
+    """Drop cached query results after new rows were inserted: they were computed on the old data"""
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        cache.clear("result")
+        print("✓ Cleared cached query results")
+    except Exception as e:
+        print(f"⚠️  Could not clear cached query results: {e}")
+
+
+def warm_caches_after_ingest():
+    """
+    Run the cache warmer (src/warmer.py) for the popular questions in the request history.
+    It runs as `python -m src.warmer` in a separate process because it needs the API package.
+    """
+    if not WARM_AFTER_INGEST:
+        return
+    print("Warming caches for popular questions...")
+    try:
+        subprocess.run([sys.executable, "-m", "src.warmer"], cwd=project_root, check=True)
     except Exception as e:
-        failed_batches += 1
-        print(f"✗ Error inserting batch {batch_num}/{total_batches}: {e}")
-
-print(f"\n{'='*50}")
-if failed_batches == 0:
-    print(f"✅ Data ingested successfully! Total rows inserted: {inserted_count}")
-else:
-    print(f"⚠️  Completed with errors. Inserted: {inserted_count} rows, Failed batches: {failed_batches}")
-print(f"{'='*50}")
\ No newline at end of file
+        print(f"⚠️  Cache warm-up failed: {e}")
+
+
+def main():
+    supabase = get_supabase()
+    appending = confirm_append(supabase)
+
+    # Read Excel file
+    print("Reading Excel file...")
+    print(f"Looking for file at: {excel_path}")
+    if not os.path.exists(excel_path):
+        print(f"❌ Error: File not found at {excel_path}")
+        sys.exit(1)
+    print(f"Reading sheet: '{SHEET}'")
+    df = pd.read_excel(excel_path, sheet_name=SHEET)
+    print(f"Loaded {len(df)} rows from Excel")
+
+    try:
+        df, records = transform(df)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    inserted_count, failed_batches = load(records, supabase)
+
+    print(f"\n{'='*50}")
+    if failed_batches == 0:
+        print(f"✅ Data ingested successfully! Total rows inserted: {inserted_count}")
+    else:
+        print(f"⚠️  Completed with errors. Inserted: {inserted_count} rows, Failed batches: {failed_batches}")
+    print(f"{'='*50}")
+
+    if inserted_count > 0:
+        clear_cached_results()
+    if inserted_count > 0 and failed_batches == 0:
+        build_artifacts(df, appending, supabase)
+        warm_caches_after_ingest()
+    elif inserted_count > 0:
+        print("⚠️  Cube, sample, sketches and value index not rebuilt because some batches failed.")
+        # They would miss the inserted rows; the next ingestion rebuilds them from the whole table
+        invalidate_artifacts()
+
+
+if __name__ == "__main__":
+    main()
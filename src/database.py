@@ -1,9 +1,49 @@
 import os
-from supabase import create_client, Client
+import threading
 
-url: str = os.getenv("SUPABASE_URL")
-key: str = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+# Supabase client is created lazily on first use (see get_supabase) so importing
+# this module does not open connections or require credentials
+_supabase = None
+_service_supabase = None
+_supabase_lock = threading.Lock()
 
 
+def get_supabase():
+    """Return the shared Supabase client, initializing it on first use (thread-safe)"""
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                # Deferred import: the supabase SDK pulls in httpx, realtime, storage, ...
+                from supabase import create_client
 
+                url: str = os.getenv("SUPABASE_URL")
+                key: str = os.getenv("SUPABASE_KEY")
+                _supabase = create_client(url, key)
+    return _supabase
+
+
+def get_service_supabase():
+    """
+    Return a Supabase client authenticated with the service-role key, or None when
+    SUPABASE_SERVICE_ROLE_KEY is not set. Only ingestion uses it, for privileged calls
+    such as creating year partitions; the API never needs it.
+    """
+    global _service_supabase
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not key:
+        return None
+    if _service_supabase is None:
+        with _supabase_lock:
+            if _service_supabase is None:
+                from supabase import create_client
+
+                _service_supabase = create_client(os.getenv("SUPABASE_URL"), key)
+    return _service_supabase
+
+
+def __getattr__(name):
+    # Keep `from database import supabase` working for existing scripts, but initialize lazily
+    if name == "supabase":
+        return get_supabase()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
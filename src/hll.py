@@ -0,0 +1,284 @@
+# hll.py
+# HyperLogLog sketches of customer_account_number for active-store counts.
+# Ingestion builds one mergeable sketch (2^HLL_PRECISION one-byte registers) per
+# (year, month), and per (year, month, value) of each HLL_DIMENSIONS column. Active stores
+# over any union of months and dimension values are then estimated by taking the
+# register-wise max of the matching sketches - a few kilobytes per sketch - instead of a
+# COUNT(DISTINCT) scan. Estimates carry the HyperLogLog standard error 1.04 / sqrt(2^p).
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from .artifacts import ReloadingArtifact
+    from .cube import parse_aggregate_sql, _normalize_label, _sort_rows
+except ImportError:
+    # Imported by the ingestion scripts run from src/
+    from artifacts import ReloadingArtifact
+    from cube import parse_aggregate_sql, _normalize_label, _sort_rows
+
+DEFAULT_SKETCH_PATH = Path(__file__).parent.parent / "data" / "distinct_sketches.npz"
+
+DISTINCT_COLUMN = "customer_account_number"
+PRECISION = int(os.getenv("HLL_PRECISION", "12"))
+DIMENSIONS = [c.strip() for c in os.getenv("HLL_DIMENSIONS", "brand,channel,city,salesman").split(",") if c.strip()]
+_TIME_COLUMNS = ("year", "month")
+# Two-sided 95% normal quantile for the reported error bound
+_Z95 = 1.96
+
+
+# ==================== HyperLogLog primitives ====================
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Vectorized int.bit_length() for uint64 arrays"""
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= (np.uint64(1) << np.uint64(shift))
+        lengths[high] += shift
+        values[high] >>= np.uint64(shift)
+    return lengths + (values > 0)
+
+
+def register_updates(hashes: np.ndarray, precision: int = PRECISION):
+    """(register index, rank) per 64-bit hash: the top p bits pick the register, the rank is leading zeros + 1 of the rest"""
+    rest_bits = 64 - precision
+    index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+    rest = hashes & np.uint64((1 << rest_bits) - 1)
+    rank = (rest_bits - _bit_length(rest) + 1).astype(np.uint8)
+    return index, rank
+
+
+def estimate_cardinality(registers: np.ndarray) -> float:
+    """HyperLogLog estimate with the linear-counting correction for small cardinalities"""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / float(np.sum(np.exp2(-registers.astype(np.float64))))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and zeros:
+        return m * math.log(m / zeros)
+    return raw
+
+
+def relative_standard_error(precision: int = PRECISION) -> float:
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def _matches(label, op: str, values: list) -> bool:
+    if op == "in":
+        return label in values
+    if label is None:
+        return False
+    if op == "not in":
+        return label not in values
+    bound = values[0]
+    return {">": label > bound, ">=": label >= bound, "<": label < bound, "<=": label <= bound}[op]
+
+
+class SketchIndex:
+    """
+    Sketches keyed by (dimension, value, year, month); dimension "" holds the per-month totals.
+
+    keys:      list of [dimension, value, year, month]
+    registers: ndarray[uint8] of shape (len(keys), 2^precision)
+    """
+
+    def __init__(self, keys: list, registers: np.ndarray, precision: int = PRECISION, built_at: float = None):
+        self.keys = [tuple(key) for key in keys]
+        self.registers = registers
+        self.precision = precision
+        self.built_at = built_at or time.time()
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self._by_dimension = {}
+        for row, (dimension, value, year, month) in enumerate(self.keys):
+            self._by_dimension.setdefault(dimension, []).append((value, year, month, row))
+
+    # ==================== Construction & persistence ====================
+
+    @classmethod
+    def from_frame(cls, df, precision: int = PRECISION, dimensions: list = None):
+        """Build the sketches from an ingestion DataFrame"""
+        import pandas as pd  # deferred: only ingestion builds sketches
+
+        if DISTINCT_COLUMN not in df.columns:
+            raise ValueError(f"{DISTINCT_COLUMN} is missing from the frame")
+        accounts = df[DISTINCT_COLUMN].map(lambda v: None if pd.isna(v) else _normalize_label(DISTINCT_COLUMN, v))
+        present = accounts.notna().to_numpy()
+        hashes = pd.util.hash_pandas_object(accounts[present], index=False).to_numpy(dtype=np.uint64)
+        index, rank = register_updates(hashes, precision)
+
+        def labels(column):
+            if column not in df.columns:
+                return [None] * int(present.sum())
+            return [None if pd.isna(v) else _normalize_label(column, v) for v in df[column][present].tolist()]
+
+        years, months = labels("year"), labels("month")
+        m = 1 << precision
+        keys, blocks = [], []
+        for dimension in [""] + [d for d in (DIMENSIONS if dimensions is None else dimensions) if d in df.columns]:
+            values = labels(dimension) if dimension else [None] * len(years)
+            codes, uniques = pd.factorize(pd.Series(list(zip(values, years, months)), dtype=object))
+            registers = np.zeros(len(uniques) * m, dtype=np.uint8)
+            np.maximum.at(registers, codes.astype(np.int64) * m + index, rank)
+            keys.extend((dimension,) + tuple(key) for key in uniques)
+            blocks.append(registers.reshape(len(uniques), m))
+        registers = np.concatenate(blocks) if blocks else np.zeros((0, m), dtype=np.uint8)
+        return cls(keys, registers, precision)
+
+    def merge(self, other: "SketchIndex") -> "SketchIndex":
+        """Union with `other` (e.g. appended rows): matching sketches take the register-wise max"""
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge sketches of precision {self.precision} and {other.precision}")
+        registers = list(self.registers)
+        keys = list(self.keys)
+        rows = dict(self._rows)
+        for key, sketch in zip(other.keys, other.registers):
+            row = rows.get(key)
+            if row is None:
+                rows[key] = len(keys)
+                keys.append(key)
+                registers.append(sketch)
+            else:
+                registers[row] = np.maximum(registers[row], sketch)
+        return SketchIndex(keys, np.array(registers, dtype=np.uint8).reshape(len(keys), -1), self.precision)
+
+    def save(self, path):
+        """Write the sketches atomically (temp file + rename); mostly-empty registers compress well"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {"keys": [list(key) for key in self.keys], "precision": self.precision, "built_at": self.built_at}
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, registers=self.registers,
+                                meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as archive:
+            meta = json.loads(archive["meta"].tobytes().decode("utf-8"))
+            return cls(meta["keys"], archive["registers"], meta["precision"], meta.get("built_at"))
+
+    def nbytes(self) -> int:
+        return self.registers.nbytes
+
+    # ==================== Query path ====================
+
+    def _plan(self, sql: str):
+        """
+        Match COUNT(DISTINCT customer_account_number) queries the sketches can answer:
+        year/month filters, at most one sketched dimension (filtered and/or grouped by), and
+        GROUP BY year, month and that dimension. Returns (plan, dimension) or None.
+        """
+        plan = parse_aggregate_sql(sql)
+        if plan is None:
+            return None
+        aggregates = [item for item in plan["select"] if item["kind"] != "column"]
+        if len(aggregates) != 1 or aggregates[0]["kind"] != "count_distinct" or aggregates[0]["column"] != DISTINCT_COLUMN:
+            return None
+        dimensions = set()
+        for column in [c for c, _, _ in plan["filters"]] + plan["group_by"]:
+            if column in _TIME_COLUMNS:
+                continue
+            if column not in self._by_dimension or not column:
+                return None
+            dimensions.add(column)
+        if len(dimensions) > 1:
+            # Sketches of different dimensions cannot be intersected
+            return None
+        for column, _, values in plan["filters"]:
+            # A literal that maps to no stored label (month = 'Q1') would match the NULL labels
+            if any(value is not None and _normalize_label(column, value) is None for value in values):
+                return None
+        return plan, (dimensions.pop() if dimensions else "")
+
+    def estimate(self, sql: str):
+        """
+        Estimate an active-store count from the sketches. Returns (rows, info) like
+        StratifiedSample.estimate, or None when the query shape is not covered.
+        """
+        planned = self._plan(sql)
+        if planned is None:
+            return None
+        plan, dimension = planned
+        group_fields = ["value" if column == dimension else column for column in plan["group_by"]]
+        filters = [("value" if column == dimension else column, op, [_normalize_label(column, v) for v in values])
+                   for column, op, values in plan["filters"]]
+
+        # Sketches of every matching (value, year, month) cell, grouped by the output row they merge into
+        groups = {}
+        for value, year, month, row in self._by_dimension[dimension]:
+            labels = {"value": value, "year": year, "month": month}
+            if all(_matches(labels[field], op, values) for field, op, values in filters):
+                groups.setdefault(tuple(labels[field] for field in group_fields), []).append(row)
+        if not plan["group_by"] and not groups:
+            groups[()] = []
+
+        m = 1 << self.precision
+        error = relative_standard_error(self.precision)
+        rows, estimates = [], []
+        for group, members in sorted(groups.items(), key=lambda item: [(v is None, v) for v in item[0]]):
+            merged = self.registers[members].max(axis=0) if members else np.zeros(m, dtype=np.uint8)
+            count = estimate_cardinality(merged)
+            if plan["group_by"] and count == 0:
+                continue
+            by_column = dict(zip(plan["group_by"], group))
+            row = {}
+            for item in plan["select"]:
+                row[item["name"]] = int(round(count)) if item["kind"] != "column" else by_column[item["column"]]
+            rows.append(row)
+            estimates.append(count)
+
+        name = next(item["name"] for item in plan["select"] if item["kind"] != "column")
+        if plan["order"]:
+            rows = _sort_rows(rows, plan["order"], [item["name"] for item in plan["select"]])
+        if plan["limit"] is not None:
+            rows = rows[:plan["limit"]]
+        intervals = []
+        for row in rows:
+            margin = _Z95 * error * row[name]
+            intervals.append({name: {"low": max(0, int(math.floor(row[name] - margin))),
+                                     "high": int(math.ceil(row[name] + margin)),
+                                     "margin": int(math.ceil(margin))}})
+        info = {
+            "method": "hyperloglog",
+            "confidence": 0.95,
+            "relative_standard_error": round(error, 6),
+            "sketch_bytes": m,
+            "intervals": intervals,
+        }
+        return rows, info
+
+
+# ==================== Process-wide sketches ====================
+
+def sketch_path() -> Path:
+    return Path(os.getenv("HLL_PATH", str(DEFAULT_SKETCH_PATH)))
+
+
+_sketches = ReloadingArtifact(sketch_path, SketchIndex.load, enabled_env="HLL_ENABLED",
+                              describe=lambda sketches: f"{len(sketches.keys)} distinct-count sketches "
+                                                        f"({sketches.nbytes() / 1e6:.1f} MB)")
+
+
+def get_sketches():
+    """Return the loaded sketches, or None if disabled or not built yet"""
+    return _sketches.get()
+
+
+def build_and_save_sketches(df, append: bool = False):
+    """Ingestion hook: sketch the ingested frame (merged into the existing sketches when appending)"""
+    path = sketch_path()
+    if append and not path.exists():
+        raise FileNotFoundError(f"Cannot append to a missing sketches ({path})")
+    sketches = SketchIndex.from_frame(df)
+    if append:
+        sketches = SketchIndex.load(path).merge(sketches)
+    sketches.save(path)
+    print(f"✓ Distinct-count sketches saved to {path} ({len(sketches.keys)} sketches, "
+          f"{sketches.nbytes() / 1e6:.1f} MB in memory)")
+    return sketches
@@ -0,0 +1,233 @@
+# ingest.py
+# Unified ingestion CLI for many workbooks at once.
+# Workbooks are parsed and transformed in a process pool (one workbook per task, across
+# all cores); each finished workbook is handed straight to the table loaders while the
+# remaining ones are still parsing. Prints a per-file throughput report at the end.
+#
+# Usage:
+#   python src/ingest.py data/2025-06/                      # every .xlsx/.xls in a directory
+#   python src/ingest.py "data/regions/**/*.xlsx" --yes
+#   python src/ingest.py data/sales.xlsx --map "Sales 2022 Onwards=sales_transactions"
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+try:
+    from . import data_pipeline, ingest_active_store
+    from .database import get_supabase
+except ImportError:
+    # Run as a script from src/
+    import data_pipeline
+    import ingest_active_store
+    from database import get_supabase
+
+# Target table -> module providing transform() / load() / confirm_append()
+TARGETS = {
+    data_pipeline.TABLE: data_pipeline,
+    ingest_active_store.TABLE: ingest_active_store,
+}
+DEFAULT_SHEET_MAP = {module.SHEET: table for table, module in TARGETS.items()}
+# Tables whose cleaned frames feed the API's cube, sample, sketches and value index
+ARTIFACT_TABLES = {data_pipeline.TABLE}
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+
+
+def parse_sheet_map(values: list) -> dict:
+    """Parse repeated --map "Sheet Name=table" options"""
+    sheet_map = {}
+    for value in values:
+        sheet, sep, table = value.rpartition("=")
+        sheet, table = sheet.strip(), table.strip()
+        if not sep or not sheet or not table:
+            raise ValueError(f"Invalid --map {value!r}; expected \"Sheet Name=table\"")
+        if table not in TARGETS:
+            raise ValueError(f"Unknown table {table!r} in --map; supported: {', '.join(TARGETS)}")
+        sheet_map[sheet] = table
+    return sheet_map
+
+
+def expand_inputs(inputs: list) -> list:
+    """Resolve files, directories and glob patterns to a sorted, de-duplicated list of workbooks"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = [os.path.join(item, name) for name in os.listdir(item)]
+        elif glob.has_magic(item):
+            candidates = glob.glob(item, recursive=True)
+        else:
+            candidates = [item]
+        for path in candidates:
+            name = os.path.basename(path)
+            # Skip Excel lock files ("~$book.xlsx")
+            if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith("~$") and os.path.isfile(path):
+                paths.append(os.path.abspath(path))
+    return sorted(set(paths))
+
+
+def parse_workbook(path: str, sheet_map: dict) -> dict:
+    """
+    Worker: read every mapped sheet of one workbook and transform it for its target table.
+    Returns {"path", "bytes", "parse_seconds", "sheets": [{"sheet", "table", "records", "frame", "error", "parse_seconds"}]}.
+    """
+    started = time.perf_counter()
+    sheets = []
+    with pd.ExcelFile(path) as workbook:
+        for sheet, table in sheet_map.items():
+            if sheet not in workbook.sheet_names:
+                continue
+            sheet_started = time.perf_counter()
+            try:
+                frame, records = TARGETS[table].transform(workbook.parse(sheet), verbose=False)
+                sheets.append({
+                    "sheet": sheet, "table": table, "records": records,
+                    "frame": frame if table in ARTIFACT_TABLES else None, "error": None,
+                })
+            except Exception as e:
+                sheets.append({"sheet": sheet, "table": table, "records": [], "frame": None, "error": str(e)})
+            sheets[-1]["parse_seconds"] = time.perf_counter() - sheet_started
+    return {
+        "path": path,
+        "bytes": os.path.getsize(path),
+        "parse_seconds": time.perf_counter() - started,
+        "sheets": sheets,
+    }
+
+
+def print_report(rows: list, total_seconds: float):
+    print(f"\n{'='*50}")
+    print("Ingestion report")
+    print(f"{'='*50}")
+    header = f"{'file':<40} {'sheet -> table':<42} {'rows':>9} {'parse s':>8} {'load s':>8} {'rows/s':>9} {'MB/s':>6}  status"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        # rows/s covers parse + load of the sheet; MB/s is the workbook size over the sheet's parse time
+        busy = row["parse_seconds"] + row["load_seconds"]
+        rows_per_second = row["rows"] / busy if busy else 0
+        mb_per_second = row["bytes"] / 1e6 / row["parse_seconds"] if row["parse_seconds"] else 0
+        print(f"{row['file'][-40:]:<40} {row['target'][:42]:<42} {row['rows']:>9} "
+              f"{row['parse_seconds']:>8.2f} {row['load_seconds']:>8.2f} {rows_per_second:>9.0f} "
+              f"{mb_per_second:>6.2f}  {row['status']}")
+    total_rows = sum(row["rows"] for row in rows)
+    print("-" * len(header))
+    print(f"{len({row['file'] for row in rows})} files, {total_rows} rows in {total_seconds:.2f}s "
+          f"({total_rows / total_seconds if total_seconds else 0:.0f} rows/s overall)")
+
+
+def ingest(paths: list, sheet_map: dict, workers: int = None, batch_size: int = 1000,
+           dry_run: bool = False, assume_yes: bool = False, build_artifacts: bool = True,
+           warm_caches: bool = True) -> bool:
+    """Ingest workbooks; returns True when every sheet parsed and loaded without errors"""
+    started = time.perf_counter()
+    supabase = None if dry_run else get_supabase()
+    appending = {}
+    if not dry_run:
+        for table in sorted(set(sheet_map.values())):
+            appending[table] = TARGETS[table].confirm_append(supabase, assume_yes=assume_yes)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    print(f"Parsing {len(paths)} workbook(s) with {workers} worker process(es)...")
+
+    report = []
+    artifact_frames = []
+    failed_tables = set()
+    inserted_tables = set()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(parse_workbook, path, sheet_map): path for path in paths}
+        # Load each workbook as soon as it is parsed, while the others are still being parsed
+        for future in as_completed(futures):
+            path = futures[future]
+            name = os.path.relpath(path)
+            try:
+                parsed = future.result()
+            except Exception as e:
+                print(f"✗ {name}: could not read workbook: {e}")
+                report.append({"file": name, "target": "-", "rows": 0, "bytes": os.path.getsize(path),
+                               "parse_seconds": 0.0, "load_seconds": 0.0, "status": "read error"})
+                failed_tables.update(sheet_map.values())
+                continue
+            if not parsed["sheets"]:
+                print(f"⚠️  {name}: none of the mapped sheets found")
+            for sheet in parsed["sheets"]:
+                row = {
+                    "file": name, "target": f"{sheet['sheet']} -> {sheet['table']}",
+                    "rows": len(sheet["records"]), "bytes": parsed["bytes"],
+                    "parse_seconds": sheet["parse_seconds"], "load_seconds": 0.0, "status": "ok",
+                }
+                if sheet["error"]:
+                    print(f"✗ {name} [{sheet['sheet']}]: {sheet['error']}")
+                    row["status"] = "transform error"
+                    failed_tables.add(sheet["table"])
+                elif not dry_run:
+                    load_started = time.perf_counter()
+                    inserted, failed_batches = TARGETS[sheet["table"]].load(
+                        sheet["records"], supabase, batch_size=batch_size, verbose=False)
+                    row["load_seconds"] = time.perf_counter() - load_started
+                    if inserted:
+                        inserted_tables.add(sheet["table"])
+                    print(f"✓ {name} [{sheet['sheet']}]: inserted {inserted} rows into {sheet['table']}"
+                          + (f", {failed_batches} failed batches" if failed_batches else ""))
+                    if failed_batches:
+                        row["status"] = f"{failed_batches} failed batches"
+                        failed_tables.add(sheet["table"])
+                else:
+                    print(f"✓ {name} [{sheet['sheet']}]: parsed {len(sheet['records'])} rows (dry run)")
+                if sheet["frame"] is not None and not sheet["error"]:
+                    artifact_frames.append(sheet["frame"])
+                report.append(row)
+
+    if inserted_tables:
+        # Independent of the warmer, which may be disabled or fail
+        data_pipeline.clear_cached_results()
+    table = next(iter(ARTIFACT_TABLES))
+    if build_artifacts and not dry_run and artifact_frames and not ARTIFACT_TABLES & failed_tables:
+        TARGETS[table].build_artifacts(pd.concat(artifact_frames, ignore_index=True), appending.get(table, False),
+                                       supabase)
+    elif ARTIFACT_TABLES & inserted_tables:
+        # Artifacts that miss the inserted rows must not be served; the next ingestion rebuilds them
+        # from the whole table
+        print("⚠️  Cube, sample, sketches and value index not rebuilt"
+              + (" because some sales rows failed." if ARTIFACT_TABLES & failed_tables else " (--no-artifacts)."))
+        TARGETS[table].invalidate_artifacts()
+    if warm_caches and not dry_run and artifact_frames and not ARTIFACT_TABLES & failed_tables:
+        data_pipeline.warm_caches_after_ingest()
+
+    print_report(report, time.perf_counter() - started)
+    return not failed_tables
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest one or more Excel workbooks into Supabase")
+    parser.add_argument("inputs", nargs="+", help="Workbook files, directories or glob patterns")
+    parser.add_argument("--map", dest="maps", action="append", default=[], metavar="SHEET=TABLE",
+                        help="Sheet-to-table mapping (repeatable); defaults to the standard sales and active-store sheets")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per insert request")
+    parser.add_argument("--yes", action="store_true", help="Append to non-empty tables without asking")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and transform only; do not load anything")
+    parser.add_argument("--no-artifacts", action="store_true", help="Do not rebuild the cube, sample, sketches and value index")
+    parser.add_argument("--no-warm", action="store_true", help="Do not warm caches for popular questions afterwards")
+    args = parser.parse_args(argv)
+
+    try:
+        sheet_map = parse_sheet_map(args.maps) if args.maps else dict(DEFAULT_SHEET_MAP)
+    except ValueError as e:
+        parser.error(str(e))
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print(f"❌ Error: No workbooks found for: {', '.join(args.inputs)}")
+        sys.exit(1)
+
+    ok = ingest(paths, sheet_map, workers=args.workers, batch_size=args.batch_size,
+                dry_run=args.dry_run, assume_yes=args.yes, build_artifacts=not args.no_artifacts,
+                warm_caches=not args.no_warm)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,19 @@
 # ingest_active_store.py
+# Active-store workbook ingestion into active_store. Run directly for the single default
+# workbook, or use ingest.py to ingest many workbooks in parallel.
 import os
+import sys
 import pandas as pd
-from database import supabase
+
+try:
+    from .database import get_supabase
+except ImportError:
+    # Run as a script from src/
+    from database import get_supabase
+
+TABLE = "active_store"
+SHEET = "Active Store"
+BATCH_SIZE = 1000
 
 # Get the project root directory (parent of src/)
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -25,51 +37,8 @@ SCHEMA_COLUMNS = [
     'grand_total'
 ]
 
-# Check if data already exists in the table
-try:
-    existing_data = supabase.table("active_store").select("customer_account_name", count="exact").limit(1).execute()
-    if existing_data.count and existing_data.count > 0:
-        print(f"⚠️  Warning: Table 'active_store' already contains {existing_data.count} records.")
-        response = input("Do you want to continue and add more data? (yes/no): ").strip().lower()
-        if response != "yes":
-            print("Operation cancelled.")
-            exit(0)
-except Exception as e:
-    print(f"Note: Could not check existing data: {e}")
-    print("Proceeding with data ingestion...")
-
-# Read Excel file
-print("Reading Excel file...")
-print(f"Looking for file at: {excel_path}")
-if not os.path.exists(excel_path):
-    print(f"❌ Error: File not found at {excel_path}")
-    exit(1)
-
-print("Reading sheet: 'Active Store'")
-try:
-    df = pd.read_excel(excel_path, sheet_name="Active Store")
-    print(f"Loaded {len(df)} rows from Excel")
-except Exception as e:
-    print(f"❌ Error reading sheet 'Active Store': {e}")
-    print("Available sheets:", pd.ExcelFile(excel_path).sheet_names)
-    exit(1)
-
-# Check if DataFrame is empty
-if df.empty:
-    print("❌ Error: The sheet 'Active Store' is empty or has no data!")
-    exit(1)
-
-# Check if DataFrame has columns
-if len(df.columns) == 0:
-    print("❌ Error: The sheet 'Active Store' has no columns!")
-    exit(1)
-
-# Clean column names to match your schema (lowercase, replace spaces with underscores)
-# Convert column names to strings first to handle any non-string column names
-df.columns = [str(col).lower().replace(" ", "_").strip() for col in df.columns]
-
 # Map common column name variations to schema column names
-column_mapping = {
+COLUMN_MAPPING = {
     'customer_account_name': 'customer_account_name',
     'customer name': 'customer_account_name',
     'account_name': 'customer_account_name',
@@ -107,32 +76,30 @@ column_mapping = {
     'total': 'grand_total',
 }
 
-# Apply column name mapping
-for old_name, new_name in column_mapping.items():
-    if old_name in df.columns and new_name not in df.columns:
-        df.rename(columns={old_name: new_name}, inplace=True)
-
-# Filter to only include columns that exist in the database schema
-available_columns = [col for col in SCHEMA_COLUMNS if col in df.columns]
-missing_columns = [col for col in SCHEMA_COLUMNS if col not in df.columns]
-
-if missing_columns:
-    print(f"⚠️  Warning: The following schema columns are missing from Excel: {', '.join(missing_columns)}")
 
-# Ensure customer_account_name exists (it's required as PRIMARY KEY)
-if 'customer_account_name' not in df.columns:
-    print("❌ Error: 'customer_account_name' column is required but not found in Excel!")
-    print(f"Available columns: {', '.join(df.columns)}")
-    exit(1)
 
-if not available_columns:
-    print("❌ Error: No matching columns found between Excel and database schema!")
-    exit(1)
+def confirm_append(supabase, assume_yes: bool = False) -> bool:
+    """
+    Check whether the table already holds data and ask before adding more (unless assume_yes).
+    Returns True when appending to existing data; exits if the user declines.
+    """
+    try:
+        existing_data = supabase.table(TABLE).select("customer_account_name", count="exact").limit(1).execute()
+        if existing_data.count and existing_data.count > 0:
+            print(f"⚠️  Warning: Table '{TABLE}' already contains {existing_data.count} records.")
+            if assume_yes:
+                return True
+            response = input("Do you want to continue and add more data? (yes/no): ").strip().lower()
+            if response != "yes":
+                print("Operation cancelled.")
+                sys.exit(0)
+            return True
+    except Exception as e:
+        print(f"Note: Could not check existing data: {e}")
+        print("Proceeding with data ingestion...")
+    return False
 
-print(f"✓ Found {len(available_columns)} matching columns: {', '.join(available_columns)}")
-df = df[available_columns]  # Keep only schema columns
 
-# Convert integer columns (handle float to int conversion properly)
 def convert_to_int64(series):
     """Convert a series to nullable Int64, handling float values and NaN"""
     # Convert to numeric first (handles strings, etc.)
@@ -142,66 +109,143 @@ def convert_to_int64(series):
     # Convert to Int64 (nullable integer type)
     return numeric.astype('Int64')
 
-# Convert all numeric columns (except customer_account_name) to integers
-for col in df.columns:
-    if col != 'customer_account_name':
-        df[col] = convert_to_int64(df[col])
-
-# Replace NaN/NaT with None for proper JSON serialization
-df = df.where(pd.notnull(df), None)
-
-# Convert DataFrame to list of dictionaries
-records = df.to_dict('records')
-
-# Additional cleanup: handle NaN/NA values and convert pandas nullable integers
-for record in records:
-    for key, value in record.items():
-        if pd.isna(value) or value == 'nan' or value == 'NaT' or str(value) == '<NA>':
-            record[key] = None
-        # Convert pandas nullable integer to Python int or None
-        elif isinstance(value, (int, float)) and not pd.isna(value):
-            # Convert to int if it's a whole number
-            if isinstance(value, float) and value.is_integer():
-                record[key] = int(value)
-            elif isinstance(value, int):
-                record[key] = value
-        # Ensure customer_account_name is a string
-        elif key == 'customer_account_name' and value is not None:
-            record[key] = str(value).strip()
-
-# Remove any records with None customer_account_name (invalid primary key)
-records = [r for r in records if r.get('customer_account_name') is not None and r.get('customer_account_name') != '']
-
-if not records:
-    print("❌ Error: No valid records to insert (all records have empty customer_account_name)")
-    exit(1)
-
-total_batches = (len(records) + 999) // 1000  # Calculate total batches
-
-# Insert in batches (Supabase has limits on batch size, typically 1000 rows)
-batch_size = 1000
-inserted_count = 0
-failed_batches = 0
-
-print(f"\nStarting data ingestion ({total_batches} batches)...")
-for i in range(0, len(records), batch_size):
-    batch = records[i:i + batch_size]
-    batch_num = i//batch_size + 1
+
+def transform(df: pd.DataFrame, verbose: bool = True):
+    """
+    Clean a raw active-store sheet into the active_store schema.
+    Returns (frame, records); raises ValueError when the sheet cannot be mapped.
+    """
+    # Check if DataFrame is empty
+    if df.empty:
+        raise ValueError(f"The sheet '{SHEET}' is empty or has no data!")
+
+    # Check if DataFrame has columns
+    if len(df.columns) == 0:
+        raise ValueError(f"The sheet '{SHEET}' has no columns!")
+
+    # Clean column names to match your schema (lowercase, replace spaces with underscores)
+    # Convert column names to strings first to handle any non-string column names
+    df = df.copy()
+    df.columns = [str(col).lower().replace(" ", "_").strip() for col in df.columns]
+
+    # Apply column name mapping
+    for old_name, new_name in COLUMN_MAPPING.items():
+        if old_name in df.columns and new_name not in df.columns:
+            df.rename(columns={old_name: new_name}, inplace=True)
+
+    # Filter to only include columns that exist in the database schema
+    available_columns = [col for col in SCHEMA_COLUMNS if col in df.columns]
+    missing_columns = [col for col in SCHEMA_COLUMNS if col not in df.columns]
+
+    if missing_columns and verbose:
+        print(f"⚠️  Warning: The following schema columns are missing from Excel: {', '.join(missing_columns)}")
+
+    # Ensure customer_account_name exists (it's required as PRIMARY KEY)
+    if 'customer_account_name' not in df.columns:
+        raise ValueError(
+            "'customer_account_name' column is required but not found in Excel! "
+            f"Available columns: {', '.join(df.columns)}"
+        )
+
+    if verbose:
+        print(f"✓ Found {len(available_columns)} matching columns: {', '.join(available_columns)}")
+    df = df[available_columns]  # Keep only schema columns
+
+    # Convert all numeric columns (except customer_account_name) to integers
+    for col in df.columns:
+        if col != 'customer_account_name':
+            df[col] = convert_to_int64(df[col])
+
+    # Replace NaN/NaT with None for proper JSON serialization
+    df = df.where(pd.notnull(df), None)
+
+    # Convert DataFrame to list of dictionaries
+    records = df.to_dict('records')
+
+    # Additional cleanup: handle NaN/NA values and convert pandas nullable integers
+    for record in records:
+        for key, value in record.items():
+            if pd.isna(value) or value == 'nan' or value == 'NaT' or str(value) == '<NA>':
+                record[key] = None
+            # Convert pandas nullable integer to Python int or None
+            elif isinstance(value, (int, float)) and not pd.isna(value):
+                # Convert to int if it's a whole number
+                if isinstance(value, float) and value.is_integer():
+                    record[key] = int(value)
+                elif isinstance(value, int):
+                    record[key] = value
+            # Ensure customer_account_name is a string
+            elif key == 'customer_account_name' and value is not None:
+                record[key] = str(value).strip()
+
+    # Remove any records with None customer_account_name (invalid primary key)
+    records = [r for r in records if r.get('customer_account_name') is not None and r.get('customer_account_name') != '']
+
+    if not records:
+        raise ValueError("No valid records to insert (all records have empty customer_account_name)")
+    return df, records
+
+
+def load(records: list, supabase, batch_size: int = BATCH_SIZE, verbose: bool = True):
+    """Insert records in batches (Supabase has limits on batch size, typically 1000 rows). Returns (inserted, failed_batches)"""
+    total_batches = (len(records) + batch_size - 1) // batch_size  # Calculate total batches
+    inserted_count = 0
+    failed_batches = 0
+
+    if verbose:
+        print(f"\nStarting data ingestion ({total_batches} batches)...")
+    for i in range(0, len(records), batch_size):
+        batch = records[i:i + batch_size]
+        batch_num = i//batch_size + 1
+        try:
+            supabase.table(TABLE).insert(batch).execute()
+            inserted_count += len(batch)
+            if verbose:
+                print(f"✓ Inserted batch {batch_num}/{total_batches} ({len(batch)} rows) - Total: {inserted_count} rows")
+        except Exception as e:
+            failed_batches += 1
+            print(f"✗ Error inserting batch {batch_num}/{total_batches}: {e}")
+            # Print first record of failed batch for debugging
+            if batch:
+                print(f"  Sample record keys: {list(batch[0].keys())}")
+    return inserted_count, failed_batches
+
+
+def main():
+    supabase = get_supabase()
+    confirm_append(supabase)
+
+    # Read Excel file
+    print("Reading Excel file...")
+    print(f"Looking for file at: {excel_path}")
+    if not os.path.exists(excel_path):
+        print(f"❌ Error: File not found at {excel_path}")
+        sys.exit(1)
+
+    print(f"Reading sheet: '{SHEET}'")
     try:
-        supabase.table("active_store").insert(batch).execute()
-        inserted_count += len(batch)
-        print(f"✓ Inserted batch {batch_num}/{total_batches} ({len(batch)} rows) - Total: {inserted_count} rows")
+        df = pd.read_excel(excel_path, sheet_name=SHEET)
+        print(f"Loaded {len(df)} rows from Excel")
     except Exception as e:
-        failed_batches += 1
-        print(f"✗ Error inserting batch {batch_num}/{total_batches}: {e}")
-        # Print first record of failed batch for debugging
-        if batch:
-            print(f"  Sample record keys: {list(batch[0].keys())}")
-
-print(f"\n{'='*50}")
-if failed_batches == 0:
-    print(f"✅ Data ingested successfully! Total rows inserted: {inserted_count}")
-else:
-    print(f"⚠️  Completed with errors. Inserted: {inserted_count} rows, Failed batches: {failed_batches}")
-print(f"{'='*50}")
+        print(f"❌ Error reading sheet '{SHEET}': {e}")
+        print("Available sheets:", pd.ExcelFile(excel_path).sheet_names)
+        sys.exit(1)
+
+    try:
+        df, records = transform(df)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    inserted_count, failed_batches = load(records, supabase)
+
+    print(f"\n{'='*50}")
+    if failed_batches == 0:
+        print(f"✅ Data ingested successfully! Total rows inserted: {inserted_count}")
+    else:
+        print(f"⚠️  Completed with errors. Inserted: {inserted_count} rows, Failed batches: {failed_batches}")
+    print(f"{'='*50}")
+
 
+if __name__ == "__main__":
+    main()
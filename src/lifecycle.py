@@ -0,0 +1,80 @@
+# lifecycle.py
+# Process start-up bookkeeping: import-to-ready timing and optional warm-up hooks.
+# Imported first by app.py so PROCESS_STARTED marks the beginning of the app import.
+import os
+import threading
+import time
+
+PROCESS_STARTED = time.perf_counter()
+
+_warmup_hooks = []
+_state_lock = threading.Lock()
+_state = {
+    "ready": False,
+    "import_seconds": None,
+    "warmup_seconds": None,
+    "ready_seconds": None,
+    "warmup": {},
+}
+
+
+def warmup_hook(fn):
+    """Register a function to run during warm-up (decorator). Hooks run in registration order."""
+    _warmup_hooks.append(fn)
+    return fn
+
+
+def warmup_enabled() -> bool:
+    """Warm-up is opt-in via WARMUP_ON_STARTUP=1 so cold starts stay cheap by default"""
+    return os.getenv("WARMUP_ON_STARTUP", "0").lower() in ("1", "true", "yes")
+
+
+def mark_imported():
+    """Record how long it took to import the app module"""
+    with _state_lock:
+        if _state["import_seconds"] is None:
+            _state["import_seconds"] = round(time.perf_counter() - PROCESS_STARTED, 4)
+
+
+def run_startup(warmup: bool = None) -> dict:
+    """
+    Run warm-up hooks (if enabled) and mark the process ready.
+    A failing hook is reported but does not keep the worker out of rotation.
+    """
+    if warmup is None:
+        warmup = warmup_enabled()
+
+    results = {}
+    warmup_started = time.perf_counter()
+    if warmup:
+        for hook in _warmup_hooks:
+            hook_started = time.perf_counter()
+            try:
+                hook()
+                status = "ok"
+            except Exception as e:
+                status = f"error: {e}"
+            results[hook.__name__] = {
+                "status": status,
+                "seconds": round(time.perf_counter() - hook_started, 4),
+            }
+
+    with _state_lock:
+        _state["warmup"] = results
+        _state["warmup_seconds"] = round(time.perf_counter() - warmup_started, 4) if warmup else None
+        _state["ready_seconds"] = round(time.perf_counter() - PROCESS_STARTED, 4)
+        _state["ready"] = True
+        report = dict(_state)
+
+    print(f"Startup complete: import {report['import_seconds']}s, ready {report['ready_seconds']}s"
+          + (f", warm-up {report['warmup_seconds']}s" if warmup else ""))
+    return report
+
+
+def is_ready() -> bool:
+    return _state["ready"]
+
+
+def startup_report() -> dict:
+    with _state_lock:
+        return dict(_state)
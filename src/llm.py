@@ -1,17 +1,42 @@
+import json
 import os
+import threading
 from dotenv import load_dotenv
-from google import genai
+from .cache import get_cache, cache_key
+from .value_index import get_value_index
+from .scheduler import get_scheduler, is_quota_error, QueueStatus, SchedulerOverloaded
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Gemini client
-_api_key = os.getenv("GEMINI_API_KEY")
-if not _api_key:
-    raise ValueError("GEMINI_API_KEY not found in environment variables or .env file")
+# Gemini client is created lazily on first use (see get_client) so importing
+# this module stays cheap and does not fail when GEMINI_API_KEY is missing
+_client = None
+_client_lock = threading.Lock()
 
-client = genai.Client(api_key=_api_key)
-print("Gemini client initialized successfully")
+
+def get_client():
+    """Return the shared Gemini client, initializing it on first use (thread-safe)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Deferred import: google.genai is heavy and only needed once we call Gemini
+                from google import genai
+
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise ValueError("GEMINI_API_KEY not found in environment variables or .env file")
+                _client = genai.Client(api_key=api_key)
+                print("Gemini client initialized successfully")
+    return _client
+
+
+def __getattr__(name):
+    # Keep `from .llm import client` working for existing callers, but initialize lazily
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 SQL_SYSTEM_PROMPT = """
 You are an AI data analyst that generates STRICT, EXECUTABLE PostgreSQL SQL.
@@ -68,6 +93,15 @@ CRITICAL RULES (MANDATORY)
 11. The SQL MUST be executable directly in Supabase PostgreSQL.
 12. If the user asks for something that cannot be answered using this schema,
     return the BEST POSSIBLE query using available columns — do NOT invent columns.
+13. Prefer the simplest shape that answers the question: a single
+    SELECT ... FROM sales_transactions WHERE ... GROUP BY ... ORDER BY ... LIMIT ...
+    Use WITH/subqueries only when a single SELECT cannot express the question.
+14. The table is partitioned by year. Whenever the question refers to a period,
+    filter on the year column itself (year = 2024, year IN (2023, 2024),
+    year BETWEEN 2023 AND 2024), plus month where relevant.
+    NEVER filter time through expressions such as EXTRACT(YEAR FROM invoice_date),
+    DATE_PART(...) or DATE_TRUNC(...) on invoice_date, and when filtering on
+    invoice_date ranges ALSO add the matching year predicate.
 
 ====================
 OUTPUT FORMAT
@@ -78,21 +112,41 @@ OUTPUT FORMAT
 
 
 
-def generate_sql_stream(question: str):
-    """Generate SQL query with streaming support - single function for both streaming and non-streaming"""
-    prompt = f"""
-{SQL_SYSTEM_PROMPT}
+# Lifetime (seconds) of generated SQL in the shared cache
+SQL_CACHE_TTL = float(os.getenv("SQL_CACHE_TTL", str(24 * 3600)))
 
-User Question:
-{question}
+TEXT_MODEL = "gemini-2.5-flash-lite"
+IMAGE_MODEL = "imagen-4.0-generate-001"
 
-Return ONLY valid SQL.
-"""
-    response = client.models.generate_content_stream(
-        model="gemini-2.5-flash-lite",
-        contents=prompt
-    )
-    
+
+def _admit(model: str, kind: str, report_queue: bool = False):
+    """Wait for a scheduler slot for one LLM call; yields QueueStatus updates when report_queue is set"""
+    for position in get_scheduler().wait(model, kind):
+        if report_queue:
+            yield QueueStatus(model, position)
+
+
+def _quota_guard(model: str, error: Exception):
+    """Turn a provider quota error into back-pressure: pause the model and raise SchedulerOverloaded"""
+    if is_quota_error(error):
+        get_scheduler().backoff(model)
+        raise SchedulerOverloaded(f"Model {model} is over quota, please retry shortly", retry_after=5.0) from error
+    raise error
+
+
+def _stream_text(model: str, contents):
+    """Stream text from a model (the caller must already hold a scheduler slot)"""
+    try:
+        response = get_client().models.generate_content_stream(model=model, contents=contents)
+        yield from _iter_text(response)
+    except SchedulerOverloaded:
+        raise
+    except Exception as e:
+        _quota_guard(model, e)
+
+
+def _iter_text(response):
+    """Yield text parts from a Gemini streaming response (handles both response formats)"""
     for chunk in response:
         if hasattr(chunk, 'text') and chunk.text:
             yield chunk.text
@@ -104,6 +158,75 @@ Return ONLY valid SQL.
                         if hasattr(part, 'text') and part.text:
                             yield part.text
 
+
+def clean_sql(sql: str) -> str:
+    """Strip markdown fences and a trailing semicolon from generated SQL"""
+    sql = sql.strip()
+    # remove markdown if Gemini adds it
+    sql = sql.replace("```sql", "").replace("```", "").strip()
+    if sql.endswith(";"):
+        sql = sql[:-1]
+    return sql
+
+
+def _data_hints(question: str) -> str:
+    """Question-specific literals and column cardinalities from the ingestion-time value index"""
+    index = get_value_index()
+    if index is None:
+        return ""
+    try:
+        return index.prompt_hints(question)
+    except Exception as e:
+        print(f"Value index lookup failed: {e}")
+        return ""
+
+
+def _sql_prompt(question: str) -> str:
+    # Collapse whitespace so trivially different phrasings share a cache entry
+    question = " ".join(question.split())
+    return f"""
+{SQL_SYSTEM_PROMPT}{_data_hints(question)}
+
+User Question:
+{question}
+
+Return ONLY valid SQL.
+"""
+
+
+def remember_sql(question: str, sql: str):
+    """Cache the SQL for a question once it has executed successfully"""
+    cache = get_cache()
+    if cache and sql and clean_sql(sql):
+        cache.set_json("sql", cache_key(_sql_prompt(question)), clean_sql(sql), ttl=SQL_CACHE_TTL)
+
+
+def forget_sql(question: str):
+    """Drop the cached SQL for a question (e.g. it stopped executing after a schema change)"""
+    cache = get_cache()
+    if cache:
+        cache.delete("sql", cache_key(_sql_prompt(question)))
+
+
+def generate_sql_stream(question: str, report_queue: bool = False):
+    """
+    Generate SQL query with streaming support - single function for both streaming and non-streaming.
+    With report_queue=True, QueueStatus objects are yielded (between text chunks) while the call is queued.
+    Generated SQL is not cached here: callers call remember_sql() after it has executed.
+    """
+    prompt = _sql_prompt(question)
+    # The key covers the whole prompt, so prompt changes invalidate cached SQL automatically
+    cache = get_cache()
+    if cache:
+        cached_sql = cache.get_json("sql", cache_key(prompt))
+        if cached_sql is not None:
+            yield cached_sql
+            return
+
+    yield from _admit(TEXT_MODEL, "sql", report_queue)
+    for text in _stream_text(TEXT_MODEL, prompt):
+        yield text
+
 def generate_sql(question: str) -> str:
     """Generate SQL query from natural language question - uses stream function internally"""
     print(f"Generating SQL for question: {question}")
@@ -112,16 +235,96 @@ def generate_sql(question: str) -> str:
     for chunk in generate_sql_stream(question):
         sql += chunk
 
-    sql = sql.strip()
-    # remove markdown if Gemini adds it
-    sql = sql.replace("```sql", "").replace("```", "").strip()
-    if sql.endswith(";"):
-        sql = sql[:-1]
+    sql = clean_sql(sql)
     print(f"Generated SQL: {sql}")
     return sql
 
 
-def generate_final_answer_stream(question: str, sql: str, data: list):
+PLANNER_PROMPT = """
+You plan SQL work for an AI data analyst over the PostgreSQL table sales_transactions
+(sales by brand, category, channel, city, salesman, customer, year, month; metrics value and invoiced_quantity).
+
+Split the user's question into independent sub-questions ONLY when it asks for several
+different results that would otherwise need one large query with CTEs or subqueries
+(e.g. a comparison AND a separate ranking, or different metrics at different groupings).
+
+Rules:
+1. Each sub-question must be self-contained: repeat every filter, time period and entity it needs.
+2. Each sub-question must be answerable with ONE simple aggregation query (no CTEs, no joins).
+3. Sub-questions must not depend on each other's results.
+4. If one simple query can answer the whole question (e.g. GROUP BY year, channel), return [].
+5. Return at most {max_subqueries} sub-questions.
+
+Return ONLY a JSON array of strings, e.g. ["Total sales by channel in 2024 and 2025", "Top 5 salesmen by sales in each channel in 2025"].
+"""
+
+
+def _parse_plan(text: str, max_subqueries: int) -> list:
+    """Sub-questions from the planner's JSON array; [] for a single-query plan or unparseable output"""
+    text = text.replace("```json", "").replace("```", "").strip()
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end < start:
+        return []
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return []
+    subquestions = [" ".join(item.split()) for item in items if isinstance(item, str) and item.strip()]
+    return subquestions[:max_subqueries] if len(subquestions) > 1 else []
+
+
+def generate_plan(question: str, max_subqueries: int = 4) -> list:
+    """
+    Ask the planner to split a compound question into independent, self-contained sub-questions.
+    Returns [] when the question should run as a single query. Plans are cached like SQL.
+    """
+    question = " ".join(question.split())
+    prompt = f"""
+{PLANNER_PROMPT.format(max_subqueries=max_subqueries)}
+User Question:
+{question}
+"""
+    cache = get_cache()
+    key = cache_key(prompt)
+    if cache:
+        cached_plan = cache.get_json("plan", key)
+        if cached_plan is not None:
+            return cached_plan
+
+    for _ in _admit(TEXT_MODEL, "plan"):
+        pass
+    subquestions = _parse_plan("".join(_stream_text(TEXT_MODEL, prompt)), max_subqueries)
+    print(f"Planned sub-questions: {subquestions}")
+    if cache:
+        cache.set_json("plan", key, subquestions, ttl=SQL_CACHE_TTL)
+    return subquestions
+
+
+def repair_sql(question: str, failed_sql: str, error: str) -> str:
+    """Ask the generator for a corrected query given the failing SQL and the database error"""
+    prompt = f"""
+{SQL_SYSTEM_PROMPT}{_data_hints(question)}
+
+User Question:
+{question}
+
+The following SQL was generated for this question but FAILED when executed:
+{failed_sql}
+
+PostgreSQL error:
+{error}
+
+Fix the query so it executes successfully and still answers the question.
+Return ONLY the corrected SQL.
+"""
+    for _ in _admit(TEXT_MODEL, "repair"):
+        pass
+    sql = clean_sql("".join(_stream_text(TEXT_MODEL, prompt)))
+    print(f"Repaired SQL: {sql}")
+    return sql
+
+
+def generate_final_answer_stream(question: str, sql: str, data: list, report_queue: bool = False):
     """Generate human-readable answer with streaming support - single function for both streaming and non-streaming"""
     # Limit data size for the prompt (avoid token limits)
     data_preview = data[:10] if len(data) > 10 else data
@@ -139,20 +342,8 @@ SQL Result ({data_summary}):
 
 Explain the result in simple business language. If there are many results, summarize the key findings.
 """
-    response = client.models.generate_content_stream(
-        model="gemini-2.5-flash-lite",
-        contents=prompt
-    )
-    
-    for chunk in response:
-        if hasattr(chunk, 'text') and chunk.text:
-            yield chunk.text
-        elif hasattr(chunk, 'candidates') and chunk.candidates:
-            for candidate in chunk.candidates:
-                if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                    for part in candidate.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            yield part.text
+    yield from _admit(TEXT_MODEL, "answer", report_queue)
+    yield from _stream_text(TEXT_MODEL, prompt)
 
 def generate_final_answer(question: str, sql: str, data: list) -> str:
     """Generate human-readable answer from SQL query and results - uses stream function internally"""
@@ -201,9 +392,11 @@ Requirements:
     
     print(f"Generating chart for question: {question}")
     
+    for _ in _admit(IMAGE_MODEL, "chart"):
+        pass
     try:
-        response = client.models.generate_content(
-            model='imagen-4.0-generate-001',
+        response = get_client().models.generate_content(
+            model=IMAGE_MODEL,
             contents=[chart_prompt],
         )
         
@@ -219,6 +412,8 @@ Requirements:
         
     except Exception as e:
         print(f"Error generating chart: {e}")
+        if is_quota_error(e):
+            _quota_guard(IMAGE_MODEL, e)
         raise Exception(f"Failed to generate chart: {str(e)}")
 
 
@@ -236,7 +431,7 @@ Always provide structured, clear analysis with specific details about what diffe
 """
 
 
-def analyze_documents_stream(question: str, po_content: str, pi_content: str):
+def analyze_documents_stream(question: str, po_content: str, pi_content: str, report_queue: bool = False):
     """Analyze Purchase Order and Proforma Invoice documents with streaming support"""
     prompt = f"""
 {DOCUMENT_ANALYSIS_PROMPT}
@@ -262,21 +457,8 @@ Please analyze these documents and provide:
 
 Format your response in a clear, structured way with tables where appropriate.
 """
-    
-    response = client.models.generate_content_stream(
-        model="gemini-2.5-flash-lite",
-        contents=prompt
-    )
-    
-    for chunk in response:
-        if hasattr(chunk, 'text') and chunk.text:
-            yield chunk.text
-        elif hasattr(chunk, 'candidates') and chunk.candidates:
-            for candidate in chunk.candidates:
-                if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                    for part in candidate.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            yield part.text
+    yield from _admit(TEXT_MODEL, "documents", report_queue)
+    yield from _stream_text(TEXT_MODEL, prompt)
 
 
 def analyze_documents(question: str, po_content: str, pi_content: str) -> str:
@@ -56,6 +56,13 @@ CREATE TABLE sales_transactions (
     value NUMERIC
 );
 
+-- Partitioned variant (see setup_partitioned_sales.sql for partitions, indexes and migration):
+-- same columns, with id BIGSERIAL and
+--     PRIMARY KEY (id, year)
+-- ) PARTITION BY RANGE (year);
+-- one partition per year (sales_transactions_y2024, ...) plus a DEFAULT partition,
+-- a BRIN index on invoice_date and a b-tree index on month in every partition.
+
 
 CREATE TABLE active_store (
     customer_account_name TEXT PRIMARY KEY,
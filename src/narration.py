@@ -0,0 +1,227 @@
+# narration.py
+# Deterministic narration for simple result shapes.
+# A single scalar, a single row, a short ranked list or a year-over-year pair is described
+# with formatted numbers locally, without a Gemini round trip. Anything more complex (or a
+# question that asks for analysis) returns None so the caller falls back to the LLM.
+import os
+import re
+
+# Currency code put in front of amounts; amounts are plain numbers unless it is configured
+CURRENCY = os.getenv("NARRATION_CURRENCY", "").strip()
+MAX_LIST_ROWS = int(os.getenv("NARRATION_MAX_LIST_ROWS", "10"))
+MAX_ROW_FIELDS = 8
+
+_TIME_COLUMNS = ("year", "month")
+_MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+           "September", "October", "November", "December"]
+_CURRENCY_HINTS = ("value", "sales", "revenue", "amount", "price", "total", "sum", "spend")
+_COUNT_HINTS = ("quantity", "qty", "count", "stores", "customers", "units", "number", "orders",
+                "invoices", "items", "accounts")
+_PERCENT_HINTS = ("pct", "percent", "share", "growth", "ratio", "rate")
+# Metrics whose values cannot be added up across rows (no "share of total")
+_NON_ADDITIVE_HINTS = ("avg", "average", "mean", "distinct", "unique", "active", "stores",
+                       "customers", "ratio", "pct", "percent", "share", "rate", "growth", "price")
+# Questions that want interpretation rather than a read-out
+_ANALYSIS_RE = re.compile(r"\b(why|explain|insight|insights|recommend|suggest|analy[sz]e|analysis|reason|cause)\b", re.IGNORECASE)
+
+
+# ==================== Formatting ====================
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _label(column: str) -> str:
+    """total_sales -> Total sales; sum -> Total"""
+    if column.lower() in ("sum", "total"):
+        return "Total"
+    if column.lower() == "count":
+        return "Count"
+    return column.replace("_", " ").strip().capitalize()
+
+
+def _kind(column: str) -> str:
+    name = column.lower()
+    if any(hint in name for hint in _PERCENT_HINTS):
+        return "percent"
+    if any(hint in name for hint in _COUNT_HINTS):
+        return "count"
+    if any(hint in name for hint in _CURRENCY_HINTS):
+        return "currency"
+    return "number"
+
+
+def format_number(value, kind: str = "number") -> str:
+    if value is None:
+        return "n/a"
+    if kind == "currency":
+        return f"{CURRENCY} {value:,.2f}" if CURRENCY else f"{value:,.2f}"
+    if kind == "percent":
+        return f"{value:,.1f}%"
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}"
+
+
+def _format_dimension(column: str, value) -> str:
+    if value is None:
+        return "(none)"
+    if column == "month" and _is_number(value) and 1 <= int(value) <= 12:
+        return _MONTHS[int(value) - 1]
+    return str(value)
+
+
+def _row_label(row: dict, dimensions: list) -> str:
+    if set(dimensions) == {"year", "month"}:
+        return f"{_format_dimension('month', row.get('month'))} {row.get('year')}"
+    return " / ".join(_format_dimension(column, row.get(column)) for column in dimensions)
+
+
+def _context(sql: str) -> str:
+    """' for COLGATE PALMOLIVE in March 2024' from simple equality filters in the SQL"""
+    where = re.split(r"\bWHERE\b", sql or "", flags=re.IGNORECASE)
+    if len(where) < 2:
+        return ""
+    predicates = re.split(r"\b(GROUP\s+BY|ORDER\s+BY|LIMIT|HAVING)\b", where[1], flags=re.IGNORECASE)[0]
+    entities = [value for _, value in re.findall(r"\b(\w+)\s*=\s*'((?:[^']|'')*)'", predicates)]
+    year = re.search(r"\byear\s*=\s*(\d{4})\b", predicates, re.IGNORECASE)
+    month = re.search(r"\bmonth\s*=\s*(\d{1,2})\b", predicates, re.IGNORECASE)
+    text = ""
+    if entities:
+        text += " for " + ", ".join(value.replace("''", "'") for value in entities)
+    if year:
+        period = year.group(1)
+        if month and 1 <= int(month.group(1)) <= 12:
+            period = f"{_MONTHS[int(month.group(1)) - 1]} {period}"
+        text += f" in {period}"
+    return text
+
+
+def _change(old, new, kind: str) -> str:
+    if old in (None, 0) or new is None:
+        return ""
+    delta = new - old
+    direction = "up" if delta > 0 else "down" if delta < 0 else "flat"
+    if direction == "flat":
+        return ", unchanged"
+    return f", {direction} {abs(delta) / abs(old) * 100:.1f}% ({format_number(abs(delta), kind)})"
+
+
+# ==================== Shapes ====================
+
+def _columns(data: list):
+    """Split result columns into (dimensions, metrics): numeric columns other than year/month are metrics"""
+    columns = list(data[0].keys())
+    dimensions, metrics = [], []
+    for column in columns:
+        values = [row.get(column) for row in data if row.get(column) is not None]
+        if column.lower() in _TIME_COLUMNS or not values or not all(_is_number(v) for v in values):
+            dimensions.append(column)
+        else:
+            metrics.append(column)
+    return dimensions, metrics
+
+
+def _scalar(column: str, value, sql: str) -> str:
+    if value is None:
+        return f"No matching records were found{_context(sql)}."
+    return f"{_label(column)}{_context(sql)} came to **{format_number(value, _kind(column))}**."
+
+
+def _single_row(row: dict, sql: str) -> str:
+    lines = [f"Here is the result{_context(sql)}:", ""]
+    for column, value in row.items():
+        text = format_number(value, _kind(column)) if _is_number(value) and column.lower() not in _TIME_COLUMNS \
+            else _format_dimension(column, value)
+        lines.append(f"- **{_label(column)}**: {text}")
+    return "\n".join(lines)
+
+
+def _year_over_year(data: list, metric: str, sql: str) -> str:
+    kind = _kind(metric)
+    old, new = sorted(data, key=lambda row: row["year"])
+    return (f"{_label(metric)}{_context(sql)} came to **{format_number(new[metric], kind)}** in {new['year']} "
+            f"versus {format_number(old[metric], kind)} in {old['year']}"
+            f"{_change(old[metric], new[metric], kind)}.")
+
+
+def _ranked_list(data: list, dimensions: list, metric: str, sql: str) -> str:
+    kind = _kind(metric)
+    values = [row.get(metric) for row in data]
+    is_trend = set(dimensions) <= set(_TIME_COLUMNS)
+    by = "month" if set(dimensions) == {"year", "month"} else " and ".join(_label(column).lower() for column in dimensions)
+    lines = [f"{_label(metric)} by {by}{_context(sql)}:", ""]
+
+    additive = not any(hint in metric.lower() for hint in _NON_ADDITIVE_HINTS)
+    total = sum(v for v in values if v is not None)
+    show_share = additive and not is_trend and total > 0 and all(v is None or v >= 0 for v in values)
+    for position, row in enumerate(data, start=1):
+        value = row.get(metric)
+        # Time series keep their order as bullets; everything else is a numbered ranking
+        marker = "-" if is_trend else f"{position}."
+        line = f"{marker} **{_row_label(row, dimensions)}**: {format_number(value, kind)}"
+        if show_share and value is not None:
+            line += f" ({value / total * 100:.1f}%)"
+        lines.append(line)
+
+    lines.append("")
+    if is_trend:
+        first, last = data[0], data[-1]
+        lines.append(f"From {_row_label(first, dimensions)} to {_row_label(last, dimensions)}, "
+                     f"{_label(metric).lower()} went from {format_number(first.get(metric), kind)} "
+                     f"to {format_number(last.get(metric), kind)}{_change(first.get(metric), last.get(metric), kind)}.")
+    else:
+        ranked = [row for row in data if row.get(metric) is not None]
+        if ranked:
+            leader = max(ranked, key=lambda row: row[metric])
+            summary = f"**{_row_label(leader, dimensions)}** is highest at {format_number(leader[metric], kind)}"
+            if show_share:
+                summary += f", {leader[metric] / total * 100:.1f}% of the {format_number(total, kind)} shown"
+            lines.append(summary + ".")
+    return "\n".join(lines)
+
+
+def approximate_note(info: dict) -> str:
+    """Lead-in for estimated answers (info from StratifiedSample.estimate or SketchIndex.estimate)"""
+    if info.get("method") == "hyperloglog":
+        return (f"_Approximate result: distinct counts merged from HyperLogLog sketches "
+                f"(within ±{info['relative_standard_error'] * 196:.1f}% at 95% confidence); "
+                f"exact counts are available on request._\n\n")
+    return (f"_Approximate result: estimated from a {info['sample_fraction'] * 100:.1f}% sample "
+            f"({info['sample_rows']:,} of {info['population_rows']:,} rows); "
+            f"{info['confidence'] * 100:.0f}% confidence intervals are included with the data._\n\n")
+
+
+def narrate(question: str, sql: str, data: list):
+    """
+    Template answer for simple result shapes, or None when the LLM should narrate:
+    scalar, single row, year-over-year pair and short ranked lists (<= NARRATION_MAX_LIST_ROWS rows).
+    """
+    if _ANALYSIS_RE.search(question or ""):
+        return None
+    if not isinstance(data, list):
+        return None
+    if not data:
+        return f"No matching records were found{_context(sql)}."
+    if not all(isinstance(row, dict) for row in data) or len(data) > MAX_LIST_ROWS:
+        return None
+    if any(set(row) != set(data[0]) for row in data):
+        return None
+
+    dimensions, metrics = _columns(data)
+    if len(data) == 1:
+        row = data[0]
+        if len(row) == 1:
+            column, value = next(iter(row.items()))
+            if value is None or (_is_number(value) and column.lower() not in _TIME_COLUMNS):
+                return _scalar(column, value, sql)
+        if len(row) <= MAX_ROW_FIELDS:
+            return _single_row(row, sql)
+        return None
+
+    if len(metrics) != 1 or not dimensions:
+        return None
+    metric = metrics[0]
+    if dimensions == ["year"] and len(data) == 2 and data[0]["year"] != data[1]["year"]:
+        return _year_over_year(data, metric, sql)
+    return _ranked_list(data, dimensions, metric, sql)
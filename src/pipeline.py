@@ -0,0 +1,172 @@
+# pipeline.py
+# Non-streaming question pipelines shared by /chat and /chat/batch.
+import time
+
+from .llm import generate_sql, remember_sql, generate_final_answer, needs_chart, analyze_documents
+from .query import execute_sql, execute_approximate, estimate_distinct
+from .conversation import derive_follow_up, derived_sql_comment, save_context
+from .repair import SqlRepair
+from .chart_store import get_or_create_chart, chart_url
+from .cache import record_request
+from .narration import narrate, approximate_note
+from .planner import decompose, DecomposedQuery
+
+
+def _noop(provider: str):
+    pass
+
+
+def run_sql_question(question: str, before_call=None, include_chart: bool = True, session_id: str = None,
+                     narration: str = "auto", approximate: bool = False,
+                     exact: bool = False) -> dict:
+    """
+    Answer a sales-data question: generate SQL, execute it, optionally chart it, narrate it.
+    `before_call(provider)` is invoked before each upstream call ("gemini" or "supabase"),
+    which lets callers apply rate limits without the pipeline knowing about them.
+    With a `session_id`, follow-ups are derived in-process from the previous result when possible.
+    With narration="auto", simple result shapes are narrated from a template instead of the LLM.
+    With approximate=True, supported aggregations are estimated from the stratified sample.
+    Active-store counts are merged from the HyperLogLog sketches unless exact=True.
+    Compound questions are split into sub-queries that run concurrently (see planner.py).
+    """
+    before_call = before_call or _noop
+    timings = {}
+    repair_events = None
+    estimate = None
+
+    started = time.perf_counter()
+    derived = derive_follow_up(session_id, question) if session_id else None
+    decomposition = None if derived else decompose(question, before_call)
+    if decomposition is not None:
+        timings["plan_seconds"] = round(time.perf_counter() - started, 4)
+        return _run_decomposed(question, decomposition, include_chart, before_call, timings)
+    if derived:
+        base_sql = derived["sql"]
+        sql = derived_sql_comment(base_sql, derived["derivation"])
+        data = derived["data"]
+        timings["derive_seconds"] = round(time.perf_counter() - started, 4)
+    else:
+        started = time.perf_counter()
+        before_call("gemini")
+        sql = base_sql = generate_sql(question)
+        timings["sql_seconds"] = round(time.perf_counter() - started, 4)
+
+        started = time.perf_counter()
+        estimated = execute_approximate(sql) if approximate else None
+        if estimated is None and not exact:
+            estimated = estimate_distinct(sql)
+        if estimated:
+            data, estimate = estimated
+        else:
+            before_call("supabase")
+            try:
+                data = execute_sql(sql)
+            except Exception as sql_error:
+                # Bounded error-feedback repair; re-raise the original error if it does not succeed
+                repair = SqlRepair(question, sql, str(sql_error), before_call=before_call)
+                repair_events = list(repair.run())
+                if not repair.succeeded:
+                    raise
+                sql = base_sql = repair.sql
+                data = repair.data
+        timings["query_seconds"] = round(time.perf_counter() - started, 4)
+    if estimate is None:
+        # Follow-ups are derived from exact results only
+        save_context(session_id, question, base_sql, data, derived["derivation"] if derived else None)
+    if not derived:
+        # SQL is cached only once it has executed; popular questions are re-run by the warmer
+        remember_sql(question, base_sql)
+        record_request(question, base_sql)
+
+    started = time.perf_counter()
+    answer = narrate(question, sql, data) if narration == "auto" else None
+    narration_source = "template" if answer is not None else "llm"
+    if answer is None:
+        before_call("gemini")
+        answer = generate_final_answer(question, sql, data)
+    if estimate is not None:
+        answer = approximate_note(estimate) + answer
+    timings["answer_seconds"] = round(time.perf_counter() - started, 4)
+
+    # Check if chart is needed (served by URL from the content-addressed chart store)
+    chart_link = None
+    if include_chart and needs_chart(question):
+        started = time.perf_counter()
+        try:
+            before_call("gemini")
+            chart_link = chart_url(get_or_create_chart(question, sql, data))
+        except Exception as chart_error:
+            print(f"Chart generation failed: {chart_error}")
+        timings["chart_seconds"] = round(time.perf_counter() - started, 4)
+
+    result = {
+        "question": question,
+        "generated_sql": base_sql,
+        "data": data,
+        "answer": answer,
+        "chart_url": chart_link,
+        "narration": narration_source,
+        "status": "success",
+        "timings": timings,
+    }
+    if estimate is not None:
+        result["approximate"] = True
+        result["estimate"] = estimate
+    if repair_events:
+        result["sql_repair"] = repair_events
+    if derived:
+        result["derived"] = True
+        result["derivation"] = derived["derivation"]
+    return result
+
+
+def _run_decomposed(question: str, decomposition: DecomposedQuery, include_chart: bool, before_call, timings: dict) -> dict:
+    """Finish run_sql_question for a compound question: concurrent sub-queries, then one answer and chart"""
+    started = time.perf_counter()
+    for _ in decomposition.run():
+        pass
+    timings["query_seconds"] = round(time.perf_counter() - started, 4)
+    sql, data = decomposition.sql, decomposition.data
+
+    started = time.perf_counter()
+    before_call("gemini")
+    answer = generate_final_answer(question, sql, data)
+    timings["answer_seconds"] = round(time.perf_counter() - started, 4)
+
+    chart_link = None
+    if include_chart and decomposition.succeeded and needs_chart(question):
+        started = time.perf_counter()
+        try:
+            before_call("gemini")
+            chart_link = chart_url(get_or_create_chart(question, sql, data))
+        except Exception as chart_error:
+            print(f"Chart generation failed: {chart_error}")
+        timings["chart_seconds"] = round(time.perf_counter() - started, 4)
+
+    return {
+        "question": question,
+        "generated_sql": sql,
+        "data": data,
+        "answer": answer,
+        "chart_url": chart_link,
+        "narration": "llm",
+        "status": "success" if decomposition.succeeded else "error",
+        "decomposed": True,
+        "subqueries": decomposition.results,
+        "timings": timings,
+    }
+
+
+def run_document_question(question: str, po_content: str, pi_content: str, before_call=None) -> dict:
+    """Answer a PO/PI comparison question (document mode)"""
+    before_call = before_call or _noop
+    started = time.perf_counter()
+    before_call("gemini")
+    answer = analyze_documents(question, po_content, pi_content)
+    return {
+        "question": question,
+        "answer": answer,
+        "status": "success",
+        "mode": "document_analysis",
+        "timings": {"answer_seconds": round(time.perf_counter() - started, 4)},
+    }
@@ -0,0 +1,140 @@
+# planner.py
+# Multi-query decomposition for compound questions.
+# Questions that look compound ("compare 2024 vs 2025 by channel and show the top salesmen
+# in each") are split by the LLM planner into independent sub-questions. Each sub-question
+# gets its own SQL (cached per sub-question like any other question) and the sub-queries run
+# concurrently, so wall time approaches the slowest sub-query instead of one large CTE
+# query. The results are assembled into one combined result for the answer and chart stages.
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .cache import record_request
+from .llm import generate_plan, generate_sql, remember_sql
+from .query import execute_sql
+from .repair import SqlRepair
+from .scheduler import priority_class, current_priority_class
+
+PLANNER_ENABLED = os.getenv("PLANNER_ENABLED", "1").lower() in ("1", "true", "yes")
+MAX_SUBQUERIES = int(os.getenv("PLANNER_MAX_SUBQUERIES", "4"))
+SUBQUERY_CONCURRENCY = int(os.getenv("PLANNER_CONCURRENCY", "4"))
+# Rows per sub-query passed on to the answer and chart prompts
+ASSEMBLED_ROWS = 20
+
+# Phrasings that join a second request onto the first; anything else skips the planner call.
+# "for each brand" / "in each city" alone are one GROUP BY query, not a compound question.
+_COMPOUND_RE = re.compile(
+    r"\b(?:and\s+(?:also\s+|then\s+)?(?:show|list|give|tell|find|compare|break|rank|what|which|who|how)"
+    r"|as\s+well\s+as|along\s+with)\b"
+    r"|\?.*\S.*\?",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _noop(provider: str):
+    pass
+
+
+def looks_compound(question: str) -> bool:
+    """Cheap gate so single-part questions never pay for a planner call"""
+    return PLANNER_ENABLED and bool(_COMPOUND_RE.search(question or ""))
+
+
+def decompose(question: str, before_call=None):
+    """
+    Plan a compound question. Returns a DecomposedQuery, or None when the question should run
+    as a single query (not compound, planner disabled, or the planner found one query enough).
+    """
+    if not looks_compound(question):
+        return None
+    (before_call or _noop)("gemini")
+    try:
+        subquestions = generate_plan(question, MAX_SUBQUERIES)
+    except Exception as e:
+        print(f"Planner failed, answering as a single query: {e}")
+        return None
+    return DecomposedQuery(question, subquestions, before_call) if subquestions else None
+
+
+class DecomposedQuery:
+    """
+    Runs the sub-questions of one compound question concurrently. Iterate run() to get
+    SSE-ready subquery_result events in completion order; afterwards `results` holds them in
+    plan order and `sql` / `data` the assembled result for the answer and chart stages.
+    """
+
+    def __init__(self, question: str, subquestions: list, before_call=None, concurrency: int = SUBQUERY_CONCURRENCY):
+        self.question = question
+        self.subquestions = subquestions
+        self.before_call = before_call or _noop
+        self.concurrency = concurrency
+        self.results = [None] * len(subquestions)
+        self.succeeded = False
+
+    def plan_event(self) -> dict:
+        return {"type": "plan", "subqueries": [{"id": i + 1, "question": q} for i, q in enumerate(self.subquestions)]}
+
+    def _run_one(self, index: int, subquestion: str, priority: str) -> dict:
+        started = time.perf_counter()
+        result = {"id": index + 1, "question": subquestion}
+        # Worker threads do not inherit the caller's thread-local priority class
+        with priority_class(priority):
+            try:
+                self.before_call("gemini")
+                sql = result["sql"] = generate_sql(subquestion)
+                self.before_call("supabase")
+                try:
+                    data = execute_sql(sql) or []
+                except Exception as sql_error:
+                    repair = SqlRepair(subquestion, sql, str(sql_error), before_call=self.before_call)
+                    result["sql_repair"] = list(repair.run())
+                    if not repair.succeeded:
+                        raise
+                    sql = result["sql"] = repair.sql
+                    data = repair.data
+                result.update(status="success", data=data, data_count=len(data))
+                # The warmer re-runs popular sub-questions, not the compound question
+                remember_sql(subquestion, sql)
+                record_request(subquestion, sql)
+            except Exception as e:
+                result.update(status="error", error=str(e))
+        result["seconds"] = round(time.perf_counter() - started, 4)
+        return result
+
+    def run(self):
+        priority = current_priority_class()
+        workers = max(1, min(self.concurrency, len(self.subquestions)))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [executor.submit(self._run_one, index, subquestion, priority)
+                       for index, subquestion in enumerate(self.subquestions)]
+            for future in as_completed(futures):
+                result = future.result()
+                self.results[result["id"] - 1] = result
+                yield {"type": "subquery_result", **result}
+        finally:
+            # On a client disconnect, sub-queries that have not started are dropped
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.succeeded = any(result["status"] == "success" for result in self.results)
+
+    @property
+    def sql(self) -> str:
+        """All sub-queries as one annotated script (for display and the answer prompt)"""
+        return "\n\n".join(f"-- {result['id']}. {result['question']}\n{result.get('sql') or '-- (no SQL generated)'};"
+                           for result in self.results if result is not None)
+
+    @property
+    def data(self) -> list:
+        """One entry per sub-query: its question and (up to ASSEMBLED_ROWS) rows, or its error"""
+        assembled = []
+        for result in self.results:
+            if result is None:
+                continue
+            entry = {"question": result["question"]}
+            if result["status"] == "success":
+                entry.update(rows=result["data"][:ASSEMBLED_ROWS], row_count=result["data_count"])
+            else:
+                entry["error"] = result["error"]
+            assembled.append(entry)
+        return assembled
@@ -0,0 +1,212 @@
+# profiling.py
+# Opt-in sampling profiler for single admin requests.
+# A background thread samples the stacks of the threads currently working on the profiled
+# request (sys._current_frames) every PROFILE_INTERVAL_MS and writes the result as a
+# speedscope file (https://www.speedscope.app) under PROFILE_DIR. Nothing here runs
+# unless a request asks for profiling, so the normal request path has no overhead.
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from .serialization import dumps
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(Path(__file__).parent.parent / ".cache" / "profiles")))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000.0
+MAX_PROFILES = int(os.getenv("PROFILE_MAX_STORED", "50"))
+_SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+def is_admin(token: str) -> bool:
+    """Constant-time check of an X-Admin-Token value; admin features are off without ADMIN_TOKEN"""
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def profile_requested(headers, query_params) -> bool:
+    """X-Profile: 1 header or ?profile=1 query flag"""
+    flag = headers.get("x-profile") or query_params.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+
+def is_valid_profile_id(value: str) -> bool:
+    return len(value) == 32 and all(c in "0123456789abcdef" for c in value)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of tracked threads. Call track() around every piece of work that
+    belongs to the request (a streaming response runs on several threadpool threads, one
+    next() at a time), then finish() to stop sampling and store the profile.
+    """
+
+    def __init__(self, name: str, interval: float = PROFILE_INTERVAL):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.interval = interval
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._samples = []
+        self._weights = []
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started = None
+        self._finished = False
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.id[:8]}", daemon=True)
+        self._sampler.start()
+        return self
+
+    @contextmanager
+    def track(self):
+        """Sample the current thread while the block runs"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads[ident] -= 1
+                if not self._threads[ident]:
+                    del self._threads[ident]
+
+    def _frame_index(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frames.get(key)
+        if index is None:
+            index = self._frames[key] = len(self._frames)
+        return index
+
+    def _run(self):
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            with self._lock:
+                targets = [ident for ident in self._threads if ident != own]
+            if not targets:
+                continue
+            frames = sys._current_frames()
+            for ident in targets:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_index(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    # speedscope wants root-first stacks
+                    stack.reverse()
+                    self._samples.append(stack)
+                    self._weights.append(weight)
+
+    def to_speedscope(self) -> dict:
+        frames = [None] * len(self._frames)
+        for (name, filename, line), index in self._frames.items():
+            frames[index] = {"name": name, "file": filename, "line": line}
+        total = sum(self._weights)
+        return {
+            "$schema": _SPEEDSCOPE_SCHEMA,
+            "name": self.name,
+            "exporter": "sales-analytics-api",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": self._samples,
+                "weights": self._weights,
+            }],
+        }
+
+    def finish(self):
+        """Stop sampling and store the profile (idempotent, may be called from several threads)"""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1)
+        wall_seconds = time.perf_counter() - self._started if self._started else 0.0
+        try:
+            save_profile(self, wall_seconds)
+        except Exception as e:
+            print(f"Saving profile {self.id} failed: {e}")
+
+
+def profile_stream(profiler: SamplingProfiler, chunks):
+    """Wrap a streaming body so each chunk is produced under the profiler; finishes it at the end"""
+    iterator = iter(chunks)
+    try:
+        while True:
+            with profiler.track():
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+            yield chunk
+    finally:
+        profiler.finish()
+
+
+# ==================== Storage ====================
+
+def _paths(profile_id: str):
+    return PROFILE_DIR / f"{profile_id}.speedscope.json", PROFILE_DIR / f"{profile_id}.meta.json"
+
+
+def save_profile(profiler: SamplingProfiler, wall_seconds: float):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profile_path, meta_path = _paths(profiler.id)
+    profile_path.write_bytes(dumps(profiler.to_speedscope()))
+    meta = {
+        "id": profiler.id,
+        "name": profiler.name,
+        "created_at": time.time(),
+        "wall_seconds": round(wall_seconds, 4),
+        "sampled_seconds": round(sum(profiler._weights), 4),
+        "samples": len(profiler._samples),
+    }
+    meta_path.write_bytes(dumps(meta))
+    print(f"Profile {profiler.id} saved ({meta['samples']} samples)")
+    _prune()
+
+
+def _prune():
+    metas = sorted(PROFILE_DIR.glob("*.meta.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for meta_path in metas[MAX_PROFILES:]:
+        profile_id = meta_path.name.split(".")[0]
+        for path in _paths(profile_id):
+            path.unlink(missing_ok=True)
+
+
+def list_profiles() -> list:
+    """Stored profiles, newest first"""
+    if not PROFILE_DIR.exists():
+        return []
+    result = []
+    for meta_path in PROFILE_DIR.glob("*.meta.json"):
+        try:
+            result.append(json.loads(meta_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return sorted(result, key=lambda meta: -meta.get("created_at", 0))
+
+
+def profile_path(profile_id: str):
+    """Path of a stored speedscope file, or None"""
+    path = _paths(profile_id)[0]
+    return path if path.exists() else None
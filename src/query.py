@@ -1,11 +1,136 @@
 # query.py
-from .database import supabase
+from .database import get_supabase
+from .cache import get_cache, cache_key
+from .cube import get_cube
+from .sampling import get_sample
+from .hll import get_sketches
+import os
 import re
 
-def execute_sql(sql: str) -> list:
+# Results are shared across workers for this long (seconds); the post-ingestion warmer clears the namespace
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "900"))
+
+# Partition-pruning guard for sales_transactions (partitioned by year):
+# "off", "warn" (log only) or "strict" (reject, so the SQL repair loop rewrites the query).
+# Unset, it is "strict" when the deployed table is partitioned and "warn" otherwise.
+PARTITION_GUARD = os.getenv("PARTITION_GUARD", "").lower()
+_PARTITIONED_CHECK_SQL = (
+    "SELECT c.relkind::text AS kind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+    "WHERE n.nspname = 'public' AND c.relname = 'sales_transactions'"
+)
+_partitioned = None
+
+_YEAR_PREDICATE_RE = re.compile(r'\byear\s*(=|<>|!=|<=|>=|<|>|\bIN\b|\bBETWEEN\b)', re.IGNORECASE)
+_DATE_EXPRESSION_RE = re.compile(
+    r'\b(EXTRACT\s*\(\s*\w+\s+FROM\s+invoice_date|DATE_PART\s*\([^)]*invoice_date|'
+    r'DATE_TRUNC\s*\([^)]*invoice_date|TO_CHAR\s*\(\s*invoice_date)',
+    re.IGNORECASE,
+)
+_INVOICE_DATE_FILTER_RE = re.compile(r'\binvoice_date\s*(=|<=|>=|<|>|\bBETWEEN\b)', re.IGNORECASE)
+
+
+class PartitionGuardError(ValueError):
+    """Raised in strict mode for sales_transactions filters that cannot use partition pruning"""
+
+
+def check_partition_pruning(sql: str) -> list:
+    """
+    Return the reasons a query on sales_transactions would scan every year partition.
+    Filtering time through invoice_date expressions, or on invoice_date without a year
+    predicate, defeats pruning; queries without any time filter are fine (they need all years).
+    """
+    if not re.search(r'\bsales_transactions\b', sql, re.IGNORECASE):
+        return []
+    where_parts = re.split(r'\bWHERE\b', sql, flags=re.IGNORECASE)[1:]
+    if not where_parts:
+        return []
+    predicates = " ".join(where_parts)
+    problems = []
+    if _DATE_EXPRESSION_RE.search(predicates):
+        problems.append("time is filtered through an expression on invoice_date; "
+                        "filter on the year (and month) columns instead, e.g. WHERE year = 2024")
+    elif _INVOICE_DATE_FILTER_RE.search(predicates) and not _YEAR_PREDICATE_RE.search(predicates):
+        problems.append("invoice_date is filtered without a year predicate; "
+                        "add the matching year filter, e.g. AND year BETWEEN 2023 AND 2024")
+    return problems
+
+
+def is_partitioned_schema() -> bool:
+    """Whether sales_transactions is the partitioned table (setup_partitioned_sales.sql); checked once per process"""
+    global _partitioned
+    if _partitioned is None:
+        try:
+            rows = get_supabase().rpc('execute_sql', {'query': _PARTITIONED_CHECK_SQL}).execute().data or []
+        except Exception as e:
+            # Not cached: the next query checks again
+            print(f"Could not detect the sales_transactions schema ({e}); partition guard only warns")
+            return False
+        _partitioned = any(row.get("kind") == "p" for row in rows)
+    return _partitioned
+
+
+def partition_guard_mode() -> str:
+    if PARTITION_GUARD:
+        return PARTITION_GUARD
+    return "strict" if is_partitioned_schema() else "warn"
+
+
+def _apply_partition_guard(sql: str):
+    if PARTITION_GUARD == "off":
+        return
+    problems = check_partition_pruning(sql)
+    if not problems:
+        return
+    message = "Query cannot use year partition pruning: " + "; ".join(problems)
+    if partition_guard_mode() == "strict":
+        raise PartitionGuardError(message)
+    print(f"⚠️  {message}")
+
+def execute_approximate(sql: str):
+    """
+    Estimate an aggregation from the stratified sample (approximate mode).
+    Returns (rows, info) - see StratifiedSample.estimate - or None when no sample is built or
+    the query shape cannot be estimated; the caller then runs the query exactly.
+    """
+    sample = get_sample()
+    if sample is None:
+        return None
+    try:
+        estimate = sample.estimate(sql.strip())
+    except Exception as sample_error:
+        print(f"Approximate execution failed, running the query exactly: {sample_error}")
+        return None
+    if estimate is not None:
+        print(f"Query estimated from the {estimate[1]['sample_rows']}-row sample: {len(estimate[0])} rows")
+    return estimate
+
+
+def estimate_distinct(sql: str):
+    """
+    Estimate an active-store count (COUNT(DISTINCT customer_account_number)) by merging the
+    HyperLogLog sketches. Returns (rows, info) - see SketchIndex.estimate - or None when the
+    sketches are missing or do not cover the query; the caller then runs it exactly.
+    Callers skip this when an exact count is requested; execute_sql then answers from the cube
+    (a distinct scan of its rows) or the database.
+    """
+    sketches = get_sketches()
+    if sketches is None:
+        return None
+    try:
+        estimate = sketches.estimate(sql.strip())
+    except Exception as sketch_error:
+        print(f"Sketch estimation failed, running the query exactly: {sketch_error}")
+        return None
+    if estimate is not None:
+        print(f"Distinct count estimated from sketches: {len(estimate[0])} rows")
+    return estimate
+
+
+def execute_sql(sql: str, refresh: bool = False) -> list:
     """
     Execute SQL query using Supabase RPC function.
     This allows executing raw SQL queries with security checks.
+    With refresh=True the result cache is bypassed for reading and overwritten with the fresh result.
     """
     try:
         sql = sql.strip()
@@ -25,6 +150,29 @@ def execute_sql(sql: str) -> list:
         if re.search(r'\bCREATE\s+(TABLE|DATABASE|FUNCTION|INDEX|VIEW)', sql_upper):
             raise ValueError("CREATE operations are not allowed for security reasons")
         
+        # Common aggregation shapes are answered from the in-process cube without a DB round trip
+        cube = get_cube()
+        if cube is not None:
+            try:
+                local_result = cube.try_execute(sql)
+            except Exception as cube_error:
+                print(f"Cube execution failed, falling back to database: {cube_error}")
+                local_result = None
+            if local_result is not None:
+                print(f"Query answered from local cube: {len(local_result)} rows")
+                return local_result
+        
+        cache = get_cache()
+        key = cache_key(sql)
+        if cache and not refresh:
+            cached_result = cache.get_json("result", key)
+            if cached_result is not None:
+                print(f"Query result served from cache: {len(cached_result)} rows")
+                return cached_result
+        
+        # Queries that would scan every year partition are flagged (or rejected in strict mode)
+        _apply_partition_guard(sql)
+        
         # Use Supabase RPC to execute raw SQL
         # Note: You need to create this RPC function in your Supabase database
         # SQL function to create in Supabase:
@@ -37,7 +185,7 @@ def execute_sql(sql: str) -> list:
         
         try:
             # Call the RPC function with proper parameter name
-            response = supabase.rpc('execute_sql', {'query': sql}).execute()
+            response = get_supabase().rpc('execute_sql', {'query': sql}).execute()
             print(f"RPC response status: {response}")
             
             # Handle the response data
@@ -49,7 +197,10 @@ def execute_sql(sql: str) -> list:
                 return []
             
             print(f"Query result: {len(result) if isinstance(result, list) else 'single'} rows")
-            return result if result else []
+            result = result if result else []
+            if cache:
+                cache.set_json("result", key, result, ttl=RESULT_CACHE_TTL)
+            return result
             
         except Exception as rpc_error:
             error_msg = str(rpc_error)
@@ -84,7 +235,7 @@ def _execute_sql_fallback(sql: str) -> list:
         table_name = table_match.group(1).lower()
         
         # For simple queries, just return all data from table
-        query = supabase.table(table_name).select("*").limit(100)
+        query = get_supabase().table(table_name).select("*").limit(100)
         
         response = query.execute()
         result = response.data if hasattr(response, 'data') else []
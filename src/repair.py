@@ -0,0 +1,129 @@
+# repair.py
+# Bounded error-feedback repair loop for generated SQL.
+# A failing query and its Postgres error are sent back to the generator for a corrected
+# query, up to SQL_REPAIR_MAX_ATTEMPTS times within SQL_REPAIR_BUDGET seconds. Successful
+# repairs are memoized by the failing SQL's fingerprint, so the same mistake is fixed
+# instantly next time without an LLM round trip, and replace the question's cached SQL.
+import hashlib
+import os
+import re
+import time
+
+from .cache import get_cache
+from .llm import repair_sql, remember_sql, forget_sql
+from .query import execute_sql
+
+MAX_REPAIR_ATTEMPTS = int(os.getenv("SQL_REPAIR_MAX_ATTEMPTS", "2"))
+REPAIR_BUDGET_SECONDS = float(os.getenv("SQL_REPAIR_BUDGET", "20"))
+REPAIR_MEMO_TTL = float(os.getenv("SQL_REPAIR_MEMO_TTL", str(7 * 24 * 3600)))
+
+
+def fingerprint_sql(sql: str) -> str:
+    """Hash of the SQL with case, whitespace and a trailing semicolon normalized (literals kept)"""
+    normalized = sql.strip().rstrip(";")
+    # Lower-case everything outside string literals so 'COLGATE' and 'Colgate' stay distinct
+    parts = re.split(r"('(?:[^']|'')*')", normalized)
+    normalized = "".join(part if part.startswith("'") else part.lower() for part in parts)
+    normalized = re.sub(r"\s+", " ", normalized)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class SqlRepair:
+    """
+    Runs the repair loop for one failed query. Iterate run() to get SSE-ready event dicts;
+    afterwards `succeeded`, `sql` and `data` hold the outcome.
+    """
+
+    def __init__(self, question: str, sql: str, error: str, before_call=None):
+        self.question = question
+        self.failed_sql = sql
+        self.error = error
+        self.before_call = before_call
+        self.succeeded = False
+        self.sql = None
+        self.data = None
+
+    def _event(self, status: str, **fields) -> dict:
+        return {"type": "sql_repair", "status": status, **fields}
+
+    def _execute(self, sql: str):
+        if self.before_call:
+            self.before_call("supabase")
+        return execute_sql(sql) or []
+
+    def _remember(self, failing_sqls: list, repaired_sql: str):
+        cache = get_cache()
+        if cache:
+            for failing_sql in failing_sqls:
+                cache.set_json("sql_repair", fingerprint_sql(failing_sql), repaired_sql, ttl=REPAIR_MEMO_TTL)
+        # The question's SQL cache entry may still hold the failing query
+        remember_sql(self.question, repaired_sql)
+
+    def run(self):
+        started = time.perf_counter()
+        cache = get_cache()
+        fingerprint = fingerprint_sql(self.failed_sql)
+
+        # 1. Memoized repair for this exact failing query
+        memo_sql = cache.get_json("sql_repair", fingerprint) if cache else None
+        if memo_sql:
+            yield self._event("memo_hit", sql=memo_sql)
+            try:
+                self.data = self._execute(memo_sql)
+                self.sql = memo_sql
+                self.succeeded = True
+                remember_sql(self.question, memo_sql)
+                yield self._event("succeeded", source="memo", attempts=0, sql=memo_sql,
+                                  seconds=round(time.perf_counter() - started, 4))
+                return
+            except Exception as e:
+                # The data or schema changed under the memo; forget it and repair from scratch
+                cache.delete("sql_repair", fingerprint)
+                yield self._event("memo_stale", error=str(e))
+
+        # 2. LLM repair attempts with error feedback
+        current_sql, current_error = self.failed_sql, self.error
+        failing_sqls = [self.failed_sql]
+        attempts, reason = 0, "max_attempts"
+        for attempt in range(1, MAX_REPAIR_ATTEMPTS + 1):
+            elapsed = time.perf_counter() - started
+            if elapsed >= REPAIR_BUDGET_SECONDS:
+                yield self._event("gave_up", reason="latency_budget", attempts=attempt - 1,
+                                  seconds=round(elapsed, 4))
+                self._forget()
+                return
+            attempts = attempt
+            yield self._event("attempt", attempt=attempt, error=current_error)
+            try:
+                if self.before_call:
+                    self.before_call("gemini")
+                candidate = repair_sql(self.question, current_sql, current_error)
+            except Exception as e:
+                yield self._event("failed", attempt=attempt, error=f"Repair generation failed: {e}")
+                reason = "generation_failed"
+                break
+            if not candidate or candidate == current_sql:
+                yield self._event("failed", attempt=attempt, error="Generator returned the same query")
+                continue
+            try:
+                self.data = self._execute(candidate)
+            except Exception as e:
+                failing_sqls.append(candidate)
+                current_sql, current_error = candidate, str(e)
+                yield self._event("failed", attempt=attempt, sql=candidate, error=current_error)
+                continue
+
+            self.sql = candidate
+            self.succeeded = True
+            self._remember(failing_sqls, candidate)
+            yield self._event("succeeded", source="llm", attempts=attempt, sql=candidate,
+                              seconds=round(time.perf_counter() - started, 4))
+            return
+
+        yield self._event("gave_up", reason=reason, attempts=attempts,
+                          seconds=round(time.perf_counter() - started, 4))
+        self._forget()
+
+    def _forget(self):
+        # A cached query that no longer executes must not be replayed for the rest of its TTL
+        forget_sql(self.question)
@@ -0,0 +1,292 @@
+# sampling.py
+# Stratified row sample of sales_transactions for approximate queries.
+# Built at ingestion: every stratum (by default each (year, month)) contributes a simple
+# random sample of APPROX_SAMPLE_FRACTION of its rows, at least APPROX_MIN_PER_STRATUM,
+# with the whole sample capped at roughly APPROX_MAX_SAMPLE_ROWS so query time does not
+# grow with the fact table. Sums and counts are scaled by the per-stratum weight N_h / n_h
+# and returned with normal-approximation confidence intervals from the stratified
+# variance estimator. COUNT(DISTINCT ...) cannot be scaled from a sample and is not supported.
+import json
+import math
+import os
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+
+try:
+    from .artifacts import ReloadingArtifact
+    from .cube import SalesCube, parse_aggregate_sql, execute_plan, _INTEGER_METRICS
+except ImportError:
+    # Imported by the ingestion scripts run from src/
+    from artifacts import ReloadingArtifact
+    from cube import SalesCube, parse_aggregate_sql, execute_plan, _INTEGER_METRICS
+
+DEFAULT_SAMPLE_PATH = Path(__file__).parent.parent / "data" / "sales_sample.npz"
+
+SAMPLE_FRACTION = float(os.getenv("APPROX_SAMPLE_FRACTION", "0.05"))
+MIN_PER_STRATUM = int(os.getenv("APPROX_MIN_PER_STRATUM", "30"))
+MAX_SAMPLE_ROWS = int(os.getenv("APPROX_MAX_SAMPLE_ROWS", "200000"))
+# Comma-separated stratification columns; empty for a uniform sample
+STRATA = [c.strip() for c in os.getenv("APPROX_STRATA", "year,month").split(",") if c.strip()]
+CONFIDENCE = float(os.getenv("APPROX_CONFIDENCE", "0.95"))
+_Z = NormalDist().inv_cdf(0.5 + CONFIDENCE / 2)
+# Upper bound on groups x strata cells per aggregate (memory guard for high-cardinality GROUP BYs)
+_MAX_CELLS = 5_000_000
+
+
+class Estimate(float):
+    """A scaled aggregate value carrying the half-width of its confidence interval"""
+
+    def __new__(cls, value: float, margin: float):
+        estimate = super().__new__(cls, value)
+        estimate.margin = margin
+        return estimate
+
+
+def _finalize(kind: str, column: str, value):
+    # Counts and integer metrics are rounded like the exact path, keeping the margin
+    if value is not None and (kind == "count" or column in _INTEGER_METRICS):
+        return Estimate(round(value), value.margin)
+    return value
+
+
+class StratifiedSample(SalesCube):
+    """
+    A SalesCube over sampled rows plus the stratum of every row.
+
+    strata:     ndarray[int32]   - stratum code per sampled row
+    population: ndarray[float64] - N_h, rows in the full table per stratum
+    sampled:    ndarray[float64] - n_h, sampled rows per stratum
+    """
+
+    def __init__(self, dims: dict, metrics: dict, n_rows: int, built_at: float = None,
+                 strata=None, population=None, sampled=None, stratum_labels=None):
+        super().__init__(dims, metrics, n_rows, built_at)
+        self.strata = np.zeros(n_rows, dtype=np.int32) if strata is None else strata
+        self.population = np.asarray(population if population is not None else [n_rows], dtype=np.float64)
+        self.sampled = np.asarray(sampled if sampled is not None else [n_rows], dtype=np.float64)
+        self.stratum_labels = stratum_labels or ["all"]
+        # N_h^2 (1 - n_h / N_h) / n_h: the stratum's contribution to Var(total) per unit of s_h^2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._variance_factor = np.where(
+                self.sampled > 1, self.population ** 2 * (1 - self.sampled / self.population) / self.sampled, 0.0)
+
+    @property
+    def population_rows(self) -> int:
+        return int(self.population.sum())
+
+    # ==================== Construction & persistence ====================
+
+    @classmethod
+    def from_frame(cls, df, fraction: float = SAMPLE_FRACTION, strata: list = None,
+                   min_per_stratum: int = MIN_PER_STRATUM, max_rows: int = MAX_SAMPLE_ROWS, seed=None):
+        """Draw a stratified simple random sample from an ingestion DataFrame"""
+        rng = np.random.default_rng(seed)
+        columns = [c for c in (STRATA if strata is None else strata) if c in df.columns]
+        if columns:
+            groups = df.groupby(columns, dropna=False, sort=True).indices
+        else:
+            groups = {"all": np.arange(len(df))}
+        if len(df):
+            fraction = min(fraction, max_rows / len(df))
+
+        chosen, row_strata, population, sampled, labels = [], [], [], [], []
+        for code, (key, positions) in enumerate(groups.items()):
+            size = len(positions)
+            n = min(size, max(min_per_stratum, math.ceil(fraction * size)))
+            chosen.append(rng.choice(positions, size=n, replace=False))
+            row_strata.append(np.full(n, code, dtype=np.int32))
+            population.append(size)
+            sampled.append(n)
+            parts = key if isinstance(key, tuple) else (key,)
+            labels.append("-".join(str(part) for part in parts))
+
+        if chosen:
+            positions = np.concatenate(chosen)
+            row_strata = np.concatenate(row_strata)
+            order = np.argsort(positions, kind="stable")
+            positions, row_strata = positions[order], row_strata[order]
+        else:
+            positions, row_strata = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        cube = SalesCube.from_frame(df.iloc[positions])
+        return cls(cube.dims, cube.metrics, cube.n_rows, strata=row_strata,
+                   population=population, sampled=sampled, stratum_labels=labels)
+
+    def _take(self, positions: np.ndarray, sampled) -> "StratifiedSample":
+        dims = {name: (codes[positions], labels) for name, (codes, labels) in self.dims.items()}
+        metrics = {name: values[positions] for name, values in self.metrics.items()}
+        return StratifiedSample(dims, metrics, len(positions), strata=self.strata[positions],
+                                population=self.population, sampled=sampled,
+                                stratum_labels=self.stratum_labels)
+
+    def append(self, other: "StratifiedSample") -> "StratifiedSample":
+        """Return a sample with `other`'s strata added (strata of separate ingestions stay separate)"""
+        cube = SalesCube.append(self, other)
+        strata = np.concatenate([self.strata.astype(np.int32), other.strata.astype(np.int32) + len(self.population)])
+        return StratifiedSample(cube.dims, cube.metrics, cube.n_rows, strata=strata,
+                                population=np.concatenate([self.population, other.population]),
+                                sampled=np.concatenate([self.sampled, other.sampled]),
+                                stratum_labels=self.stratum_labels + other.stratum_labels)
+
+    def thin(self, max_rows: int = MAX_SAMPLE_ROWS, min_per_stratum: int = MIN_PER_STRATUM, seed=None):
+        """
+        Subsample every stratum so the sample stays near max_rows after appends.
+        A simple random sample of a simple random sample is still one, so weights stay valid.
+        """
+        if self.n_rows <= max_rows:
+            return self
+        rng = np.random.default_rng(seed)
+        ratio = max_rows / self.n_rows
+        kept, sampled = [], self.sampled.copy()
+        for code in range(len(self.population)):
+            positions = np.flatnonzero(self.strata == code)
+            n = min(len(positions), max(min_per_stratum, math.ceil(ratio * len(positions))))
+            kept.append(rng.choice(positions, size=n, replace=False))
+            sampled[code] = n
+        return self._take(np.sort(np.concatenate(kept)), sampled)
+
+    def _extra_arrays(self) -> dict:
+        labels = json.dumps(self.stratum_labels).encode("utf-8")
+        return {
+            "sample__strata": self.strata,
+            "sample__population": self.population,
+            "sample__sampled": self.sampled,
+            "sample__labels": np.frombuffer(labels, dtype=np.uint8),
+        }
+
+    @classmethod
+    def load(cls, path):
+        cube = SalesCube.load(path)
+        with np.load(path, allow_pickle=False) as archive:
+            if "sample__strata" not in archive.files:
+                raise ValueError(f"{path} is not a sample file")
+            return cls(cube.dims, cube.metrics, cube.n_rows, cube.built_at,
+                       strata=archive["sample__strata"],
+                       population=archive["sample__population"],
+                       sampled=archive["sample__sampled"],
+                       stratum_labels=json.loads(archive["sample__labels"].tobytes().decode("utf-8")))
+
+    def nbytes(self) -> int:
+        return super().nbytes() + self.strata.nbytes
+
+    # ==================== Estimation ====================
+
+    def _estimate(self, cells: np.ndarray, y: np.ndarray, n_groups: int) -> list:
+        """Scaled per-group totals of y with confidence margins (rows outside a group count as 0)"""
+        n_strata = len(self.population)
+        size = n_groups * n_strata
+        if size > _MAX_CELLS:
+            raise ValueError(f"too many groups for approximate mode ({n_groups} groups x {n_strata} strata)")
+        s1 = np.bincount(cells, weights=y, minlength=size).reshape(n_groups, n_strata)
+        s2 = np.bincount(cells, weights=y * y, minlength=size).reshape(n_groups, n_strata)
+        totals = s1 @ (self.population / self.sampled)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variances = np.where(self.sampled > 1, (s2 - s1 ** 2 / self.sampled) / (self.sampled - 1), 0.0)
+        margins = _Z * np.sqrt(np.clip(variances, 0, None) @ self._variance_factor)
+        return [Estimate(total, margin) for total, margin in zip(totals.tolist(), margins.tolist())]
+
+    def aggregate(self, by: list, aggregates: list, filters=()) -> list:
+        """
+        Like SalesCube.aggregate, but values are population estimates (Estimate floats).
+        Only "sum" and "count" can be scaled.
+        """
+        mask = self.mask(filters)
+        labels, inverse = self._groups(by, mask)
+        if by and not len(inverse):
+            return []
+        n_groups = len(labels)
+        cells = inverse * len(self.population) + self.strata[mask].astype(np.int64)
+
+        results = []
+        for kind, column in aggregates:
+            if kind == "sum":
+                values = self.metrics[column][mask]
+                present = ~np.isnan(values)
+                counts = np.bincount(inverse[present], minlength=n_groups)
+                estimates = self._estimate(cells, np.where(present, values, 0.0), n_groups)
+                # SUM over only NULLs is NULL in SQL
+                results.append([e if c else None for e, c in zip(estimates, counts.tolist())])
+            elif kind == "count":
+                results.append(self._estimate(cells, np.ones(len(cells)), n_groups))
+            else:
+                raise ValueError(f"Unsupported aggregate in approximate mode: {kind}")
+
+        return [(labels[g], [r[g] for r in results]) for g in range(n_groups)]
+
+    def _supports(self, plan: dict) -> bool:
+        if any(item["kind"] == "count_distinct" for item in plan["select"]):
+            return False
+        return super()._supports(plan)
+
+    def try_execute(self, sql: str):
+        """Estimated rows only (see estimate() for the confidence intervals)"""
+        estimate = self.estimate(sql)
+        return estimate[0] if estimate is not None else None
+
+    def estimate(self, sql: str):
+        """
+        Estimate `sql` from the sample. Returns (rows, info) or None for unsupported shapes.
+        rows are shaped like the exact result; info holds the confidence level, sample sizes
+        and one {aggregate name: {"low", "high", "margin"}} interval dict per row.
+        """
+        plan = parse_aggregate_sql(sql)
+        if plan is None or not self._supports(plan):
+            return None
+        rows = execute_plan(self, plan, finalize=_finalize)
+
+        intervals = []
+        for row in rows:
+            bounds = {}
+            for item in plan["select"]:
+                value = row[item["name"]]
+                if item["kind"] == "column" or value is None:
+                    continue
+                integer = item["kind"] == "count" or item["column"] in _INTEGER_METRICS
+                cast = (lambda v: int(round(v))) if integer else (lambda v: round(float(v), 2))
+                low = value - value.margin
+                if item["kind"] == "count":
+                    low = max(low, 0.0)
+                bounds[item["name"]] = {"low": cast(low), "high": cast(value + value.margin), "margin": cast(value.margin)}
+                row[item["name"]] = int(value) if integer else float(value)
+            intervals.append(bounds)
+
+        info = {
+            "method": "stratified_sample",
+            "confidence": CONFIDENCE,
+            "sample_rows": self.n_rows,
+            "population_rows": self.population_rows,
+            "sample_fraction": round(self.n_rows / self.population_rows, 6) if self.population_rows else 0.0,
+            "intervals": intervals,
+        }
+        return rows, info
+
+
+# ==================== Process-wide sample ====================
+
+def sample_path() -> Path:
+    return Path(os.getenv("APPROX_SAMPLE_PATH", str(DEFAULT_SAMPLE_PATH)))
+
+
+_sample = ReloadingArtifact(sample_path, StratifiedSample.load, enabled_env="APPROX_ENABLED",
+                            describe=lambda sample: f"sales sample: {sample.n_rows} of {sample.population_rows} "
+                                                    f"rows in {len(sample.population)} strata")
+
+
+def get_sample():
+    """Return the loaded sample, or None if approximate mode is disabled or no sample was built"""
+    return _sample.get()
+
+
+def build_and_save_sample(df, append: bool = False):
+    """Ingestion hook: sample the ingested frame (optionally adding to the existing sample)"""
+    path = sample_path()
+    if append and not path.exists():
+        raise FileNotFoundError(f"Cannot append to a missing sample ({path})")
+    sample = StratifiedSample.from_frame(df)
+    if append:
+        sample = StratifiedSample.load(path).append(sample).thin()
+    sample.save(path)
+    print(f"✓ Sales sample saved to {path} ({sample.n_rows} of {sample.population_rows} rows, "
+          f"{len(sample.population)} strata)")
+    return sample
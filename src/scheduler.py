@@ -0,0 +1,211 @@
+# scheduler.py
+# Admission control and priority scheduling for upstream LLM calls.
+# Every Gemini call waits for a slot here: a token bucket per model enforces the request
+# rate, and a bounded priority queue decides who goes next - interactive before batch,
+# and within a class SQL generation before narration before charts. When the queue is
+# full, interactive requests are shed (HTTP 429) instead of piling up.
+import bisect
+import itertools
+import os
+import threading
+import time
+
+from .ratelimit import TokenBucket
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+_CLASS_RANK = {INTERACTIVE: 0, BATCH: 1}
+# Lower rank is served first within a priority class
+_KIND_RANK = {"sql": 0, "repair": 0, "plan": 0, "answer": 1, "documents": 1, "chart": 2}
+
+MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "60"))
+DEFAULT_RPS = float(os.getenv("LLM_RPS_DEFAULT", "10"))
+# Seconds to pause a model after the provider reports an exhausted quota
+QUOTA_BACKOFF = float(os.getenv("LLM_QUOTA_BACKOFF", "5"))
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a call cannot be admitted (queue full or waited too long); maps to HTTP 429"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueStatus:
+    """Yielded by LLM streams (when asked to) while the call waits for a slot"""
+
+    def __init__(self, model: str, position: int):
+        self.model = model
+        self.position = position
+
+
+class _Ticket:
+    __slots__ = ("key", "model", "kind", "priority_class")
+
+    def __init__(self, key, model, kind, priority_class):
+        self.key = key
+        self.model = model
+        self.kind = kind
+        self.priority_class = priority_class
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+_thread_state = threading.local()
+
+
+class priority_class:
+    """Context manager marking LLM calls made by the current thread as e.g. batch traffic"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = getattr(_thread_state, "priority_class", None)
+        _thread_state.priority_class = self.name
+        return self
+
+    def __exit__(self, *exc):
+        _thread_state.priority_class = self._previous
+        return False
+
+
+def current_priority_class() -> str:
+    return getattr(_thread_state, "priority_class", None) or INTERACTIVE
+
+
+class LLMScheduler:
+    def __init__(self, rates: dict = None, max_queue: int = MAX_QUEUE, queue_timeout: float = QUEUE_TIMEOUT):
+        self.rates = rates or {}
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._buckets = {}
+        self._queues = {}
+        self._blocked_until = {}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _bucket(self, model: str) -> TokenBucket:
+        if model not in self._buckets:
+            self._buckets[model] = TokenBucket(self.rates.get(model, DEFAULT_RPS))
+        return self._buckets[model]
+
+    def queue_length(self, model: str) -> int:
+        with self._cond:
+            return len(self._queues.get(model, ()))
+
+    def admission_check(self, model: str):
+        """Shed new interactive work up front when the model's queue is already full"""
+        if self.queue_length(model) >= self.max_queue:
+            raise SchedulerOverloaded(f"LLM queue for {model} is full, please retry shortly", retry_after=2.0)
+
+    def backoff(self, model: str, seconds: float = QUOTA_BACKOFF):
+        """Pause grants for a model, e.g. after the provider returned a quota error"""
+        with self._cond:
+            self._blocked_until[model] = max(self._blocked_until.get(model, 0.0), time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def _try_grant(self, ticket: _Ticket):
+        """Return (granted, position, seconds_until_next_check); must hold the lock"""
+        queue = self._queues[ticket.model]
+        position = bisect.bisect_left(queue, ticket) + 1
+        if position > 1:
+            return False, position, self.queue_timeout
+        blocked = self._blocked_until.get(ticket.model, 0.0) - time.monotonic()
+        if blocked > 0:
+            return False, position, blocked
+        wait = self._bucket(ticket.model).try_acquire()
+        if wait > 0:
+            return False, position, wait
+        queue.pop(0)
+        self._cond.notify_all()
+        return True, 0, 0.0
+
+    def wait(self, model: str, kind: str, priority: str = None, poll: float = 0.5):
+        """
+        Generator: queue for a slot and yield the 1-based queue position whenever it changes.
+        Returns once the call may proceed. Raises SchedulerOverloaded when shed or timed out.
+        """
+        priority = priority or current_priority_class()
+        key = (_CLASS_RANK.get(priority, 1), _KIND_RANK.get(kind, 1), next(self._sequence))
+        ticket = _Ticket(key, model, kind, priority)
+        deadline = time.monotonic() + self.queue_timeout
+
+        with self._cond:
+            queue = self._queues.setdefault(model, [])
+            while len(queue) >= self.max_queue:
+                if priority == INTERACTIVE:
+                    raise SchedulerOverloaded(f"LLM queue for {model} is full, please retry shortly", retry_after=2.0)
+                # Batch work waits for room instead of failing
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SchedulerOverloaded(f"Timed out waiting for room in the {model} queue")
+                self._cond.wait(min(poll, remaining))
+            bisect.insort(queue, ticket)
+
+        granted = False
+        reported = None
+        try:
+            while True:
+                with self._cond:
+                    granted, position, wait = self._try_grant(ticket)
+                    if not granted and position == reported:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise SchedulerOverloaded(f"Timed out waiting for {model} capacity")
+                        self._cond.wait(min(wait, poll, remaining))
+                        continue
+                if granted:
+                    return
+                reported = position
+                yield position
+        finally:
+            if not granted:
+                with self._cond:
+                    queue = self._queues.get(model, [])
+                    if ticket in queue:
+                        queue.remove(ticket)
+                        self._cond.notify_all()
+
+    def acquire(self, model: str, kind: str, priority: str = None):
+        """Blocking form of wait()"""
+        for _ in self.wait(model, kind, priority):
+            pass
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                model: {
+                    "queued": len(queue),
+                    "interactive": sum(1 for t in queue if t.priority_class == INTERACTIVE),
+                    "batch": sum(1 for t in queue if t.priority_class == BATCH),
+                    "rate_per_second": self.rates.get(model, DEFAULT_RPS),
+                }
+                for model, queue in self._queues.items()
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(rates={
+                    "gemini-2.5-flash-lite": float(os.getenv("LLM_TEXT_RPS", str(DEFAULT_RPS))),
+                    "imagen-4.0-generate-001": float(os.getenv("LLM_IMAGE_RPS", "1")),
+                })
+    return _scheduler
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Provider-side rate/quota errors (Gemini returns 429 RESOURCE_EXHAUSTED)"""
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "quota" in message.lower()
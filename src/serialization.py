@@ -0,0 +1,179 @@
+# serialization.py
+# Fast JSON serialization and SSE framing for the streaming endpoints.
+# Uses orjson when it is installed (falls back to the stdlib json module), encodes Decimal
+# (NUMERIC columns), NumPy scalars and dates safely, coalesces token-chunk frames and can
+# gzip the event stream.
+import datetime
+import decimal
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# answer_chunk / sql_chunk frames are merged until this much time has passed or this many bytes are buffered
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "40"))
+SSE_COALESCE_BYTES = int(os.getenv("SSE_COALESCE_BYTES", "8192"))
+SSE_GZIP = os.getenv("SSE_GZIP", "0").lower() in ("1", "true", "yes")
+
+COALESCED_EVENT_TYPES = ("answer_chunk", "sql_chunk")
+_END = object()
+
+
+def _default(obj):
+    """Fallback encoder for types neither json nor orjson handle natively"""
+    if isinstance(obj, decimal.Decimal):
+        # NUMERIC values: keep integers exact, everything else as a float
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, (datetime.date, datetime.datetime, datetime.time)):
+        return obj.isoformat()
+    if hasattr(obj, "item"):
+        # NumPy scalars
+        return obj.item()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj) -> bytes:
+        """Serialize to UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(obj) -> bytes:
+        """Serialize to UTF-8 JSON bytes"""
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def sse_frame(event: dict) -> bytes:
+    return b"data: " + dumps(event) + b"\n\n"
+
+
+class SSEEncoder:
+    """
+    Turns an iterator of event dicts into SSE byte chunks.
+
+    Consecutive answer_chunk / sql_chunk events are merged into one frame until the
+    coalescing window or byte limit is reached; every other event flushes immediately
+    (together with any pending merged frame, in a single write). With gzip enabled the
+    output is one gzip stream, sync-flushed after every write so clients see events promptly.
+
+    The events are pulled on a producer thread, so a merged frame is flushed when its window
+    expires even while the next event is still being generated (a slow LLM call never holds
+    back text that has already arrived).
+    """
+
+    def __init__(self, window_ms: float = None, max_bytes: int = None, gzip: bool = False):
+        self.window = (SSE_COALESCE_MS if window_ms is None else window_ms) / 1000.0
+        self.max_bytes = SSE_COALESCE_BYTES if max_bytes is None else max_bytes
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def _encode(self, payload: bytes) -> bytes:
+        if self._compressor is None:
+            return payload
+        return self._compressor.compress(payload) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def _prefetch(self, events, items: queue.Queue, stop: threading.Event):
+        """Producer thread: hand each event to the encoder; close the source once the consumer stops"""
+        try:
+            for event in events:
+                items.put((event, None))
+                if stop.is_set():
+                    break
+            items.put((_END, None))
+        except BaseException as e:
+            items.put((_END, e))
+        finally:
+            if stop.is_set() and hasattr(events, "close"):
+                events.close()
+
+    def _events(self, events):
+        """Yield (event, arrived) pairs; event is None when the pending frame's window expired first"""
+        items = queue.Queue()
+        stop = threading.Event()
+        threading.Thread(target=self._prefetch, args=(iter(events), items, stop),
+                         name="sse-producer", daemon=True).start()
+        timeout = None
+        try:
+            while True:
+                try:
+                    event, error = items.get(timeout=timeout)
+                except queue.Empty:
+                    timeout = yield None
+                    continue
+                if event is _END:
+                    if error is not None:
+                        raise error
+                    return
+                timeout = yield event
+        finally:
+            stop.set()
+
+    def stream(self, events):
+        pending_type = None
+        pending_parts = []
+        pending_size = 0
+        pending_since = 0.0
+
+        def take_pending() -> bytes:
+            nonlocal pending_type, pending_parts, pending_size
+            if pending_type is None:
+                return b""
+            frame = sse_frame({"type": pending_type, "content": "".join(pending_parts)})
+            pending_type, pending_parts, pending_size = None, [], 0
+            return frame
+
+        if self.window <= 0:
+            for event in events:
+                yield self._encode(sse_frame(event))
+        else:
+            source = self._events(events)
+            try:
+                event = next(source, _END)
+                while event is not _END:
+                    if event is not None:
+                        event_type = event.get("type")
+                        if event_type in COALESCED_EVENT_TYPES and set(event) <= {"type", "content"}:
+                            if pending_type not in (None, event_type):
+                                yield self._encode(take_pending())
+                            if pending_type is None:
+                                pending_type, pending_since = event_type, time.monotonic()
+                            content = event.get("content") or ""
+                            pending_parts.append(content)
+                            pending_size += len(content)
+                            if pending_size >= self.max_bytes:
+                                yield self._encode(take_pending())
+                        else:
+                            yield self._encode(take_pending() + sse_frame(event))
+                    # Wait for the next event only until the pending frame's window expires
+                    remaining = pending_since + self.window - time.monotonic()
+                    if pending_type is not None and remaining <= 0:
+                        yield self._encode(take_pending())
+                        remaining = None
+                    try:
+                        event = source.send(max(0.0, remaining) if pending_type is not None else None)
+                    except StopIteration:
+                        event = _END
+            finally:
+                source.close()
+
+        tail = take_pending()
+        if self._compressor is not None:
+            yield self._compressor.compress(tail) + self._compressor.flush(zlib.Z_FINISH)
+        elif tail:
+            yield tail
+
+
+def wants_gzip(accept_encoding: str) -> bool:
+    """gzip the event stream only when enabled (SSE_GZIP=1) and the client accepts it"""
+    return SSE_GZIP and "gzip" in (accept_encoding or "").lower()
@@ -0,0 +1,247 @@
+# value_index.py
+# Dimension-value index for entity resolution.
+# Built at ingestion over the distinct values of each text dimension (with row frequencies),
+# it resolves entities mentioned in a question ("colgate") to candidate stored literals
+# ('COLGATE PALMOLIVE') with a trigram index, so the SQL prompt can include just those
+# candidates instead of letting the LLM guess.
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+
+try:
+    from .artifacts import ReloadingArtifact
+except ImportError:
+    # Imported by the ingestion scripts run from src/
+    from artifacts import ReloadingArtifact
+
+DEFAULT_INDEX_PATH = Path(__file__).parent.parent / "data" / "value_index.json"
+
+TEXT_DIMENSIONS = [
+    'master_distributor', 'distributor',
+    'line_of_business', 'supplier', 'agency',
+    'category', 'segment', 'brand', 'sub_brand',
+    'country', 'city', 'area',
+    'retailer_group', 'retailer_sub_group', 'channel', 'sub_channel',
+    'salesman', 'customer_account_name',
+]
+# Cardinalities reported in the prompt (kept short on purpose)
+PROMPT_CARDINALITY_COLUMNS = [
+    'category', 'segment', 'brand', 'sub_brand', 'city', 'area',
+    'retailer_group', 'channel', 'sub_channel', 'salesman', 'customer_account_number',
+]
+
+MIN_SCORE = 0.65
+# Score of a phrase whose words are whole words of a longer value, before crediting the share
+# of the value it covers ("khor" -> 'AL KHOR' scores higher than 'AL MEERA-AL KHOR (NEW)')
+_PARTIAL_BASE = 0.55
+MAX_CANDIDATES_PER_PHRASE = 3
+MAX_PHRASE_WORDS = 4
+
+# Words that never name an entity on their own
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "for", "by", "to", "from", "with", "vs",
+    "versus", "what", "which", "who", "how", "many", "much", "is", "are", "was", "were", "show",
+    "me", "give", "list", "top", "bottom", "best", "worst", "total", "sales", "sale", "value",
+    "revenue", "quantity", "units", "sold", "per", "each", "all", "month", "months", "year",
+    "years", "monthly", "yearly", "compare", "comparison", "trend", "chart", "graph", "plot",
+    "do", "does", "did", "doing", "done", "perform", "performed", "performance", "sell", "selling",
+    "between", "during", "last", "this", "than", "more", "less", "active", "stores", "store",
+    "count", "number", "average", "growth", "share", "only", "now", "sort", "order", "descending",
+    "ascending", "highest", "lowest", "brands", "channels", "cities", "salesmen", "customers",
+    # Column names are not values
+    "brand", "channel", "city", "category", "categories", "segment", "segments", "salesman",
+    "customer", "area", "areas", "region", "country", "retailer", "retailers", "group", "groups",
+    "distributor", "distributors", "supplier", "suppliers", "agency", "item", "items",
+}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9&]+", str(text).lower()))
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ValueIndex:
+    """
+    values:        {column: {value: row_count}}
+    cardinalities: {column: distinct_count}  (may include columns not indexed, e.g. account numbers)
+    """
+
+    def __init__(self, values: dict, cardinalities: dict = None, built_at: float = None):
+        self.values = values
+        self.cardinalities = cardinalities or {column: len(v) for column, v in values.items()}
+        self.built_at = built_at or time.time()
+        # Posting lists: trigram -> ids into self._entries
+        self._entries = []
+        self._postings = defaultdict(list)
+        for column, counts in values.items():
+            for value, count in counts.items():
+                normalized = _normalize(value)
+                if not normalized:
+                    continue
+                entry_id = len(self._entries)
+                grams = _trigrams(normalized)
+                self._entries.append((column, value, count, normalized, len(grams), set(normalized.split())))
+                for gram in grams:
+                    self._postings[gram].append(entry_id)
+
+    # ==================== Construction & persistence ====================
+
+    @classmethod
+    def from_frame(cls, df):
+        values = {}
+        for column in TEXT_DIMENSIONS:
+            if column in df.columns:
+                counts = df[column].dropna().astype(str).str.strip().value_counts()
+                values[column] = {value: int(count) for value, count in counts.items() if value}
+        cardinalities = {column: int(df[column].nunique(dropna=True))
+                         for column in PROMPT_CARDINALITY_COLUMNS if column in df.columns}
+        return cls(values, cardinalities)
+
+    def merge(self, other: "ValueIndex") -> "ValueIndex":
+        """Combine with another index (row counts add up), e.g. when ingestion appends data"""
+        values = {column: dict(counts) for column, counts in self.values.items()}
+        for column, counts in other.values.items():
+            target = values.setdefault(column, {})
+            for value, count in counts.items():
+                target[value] = target.get(value, 0) + count
+        cardinalities = dict(self.cardinalities)
+        for column, count in other.cardinalities.items():
+            # Exact distinct counts cannot be merged; take the larger as a lower bound
+            cardinalities[column] = max(cardinalities.get(column, 0), count)
+        for column, counts in values.items():
+            cardinalities[column] = len(counts)
+        return ValueIndex(values, cardinalities)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"values": self.values, "cardinalities": self.cardinalities, "built_at": self.built_at}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        return cls(raw["values"], raw.get("cardinalities"), raw.get("built_at"))
+
+    # ==================== Entity resolution ====================
+
+    def lookup(self, phrase: str, limit: int = MAX_CANDIDATES_PER_PHRASE) -> list:
+        """Best matching stored values for a phrase: [(column, value, row_count, score)]"""
+        normalized = _normalize(phrase)
+        if len(normalized) < 3:
+            return []
+        grams = _trigrams(normalized)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for entry_id in self._postings.get(gram, ()):
+                overlap[entry_id] += 1
+
+        scored = []
+        phrase_words = set(normalized.split())
+        for entry_id, common in overlap.items():
+            column, value, count, entry_text, entry_grams, entry_words = self._entries[entry_id]
+            # Similarity to the whole value tolerates typos ("colgte" -> "colgate")
+            score = 2.0 * common / (len(grams) + entry_grams)
+            if entry_text == normalized:
+                score = 1.0
+            elif phrase_words <= entry_words:
+                # Every word of the phrase is a whole word of the value ("colgate" -> "colgate palmolive"),
+                # credited by how much of the value the phrase covers
+                coverage = len(normalized) / len(entry_text)
+                score = max(score, _PARTIAL_BASE + (1 - _PARTIAL_BASE) * coverage)
+            if score >= MIN_SCORE:
+                scored.append((column, value, count, round(score, 3)))
+        # Best score first, then low-cardinality columns (city, brand, channel) over long tails
+        # such as customer names, then the most frequent value
+        scored.sort(key=lambda item: (-item[3], len(self.values.get(item[0], ())), -item[2]))
+        return scored[:limit]
+
+    def resolve(self, question: str) -> list:
+        """
+        Resolve entity mentions in a question.
+        Returns [{"phrase", "column", "value", "rows", "score"}], longest phrases first,
+        without reusing words already covered by a better match. A phrase spanning a filler word
+        or number ("silk in doha") only counts when it is a stored value exactly.
+        """
+        words = re.findall(r"[A-Za-z0-9&]+", question)
+        covered = set()
+        results = []
+        for length in range(min(MAX_PHRASE_WORDS, len(words)), 0, -1):
+            for start in range(0, len(words) - length + 1):
+                span = set(range(start, start + length))
+                if span & covered:
+                    continue
+                phrase_words = words[start:start + length]
+                if all(w.lower() in _STOPWORDS or w.isdigit() for w in phrase_words):
+                    continue
+                # Mentions are bounded by content words, not fillers or years ("dubai in 2024" -> "dubai")
+                if any(w.lower() in _STOPWORDS or w.isdigit() for w in (phrase_words[0], phrase_words[-1])):
+                    continue
+                phrase = " ".join(phrase_words)
+                matches = self.lookup(phrase)
+                if any(w.lower() in _STOPWORDS or w.isdigit() for w in phrase_words[1:-1]):
+                    matches = [match for match in matches if match[3] == 1.0]
+                if not matches:
+                    continue
+                best = matches[0][3]
+                for column, value, count, score in matches:
+                    if score >= best - 0.1:
+                        results.append({"phrase": phrase, "column": column, "value": value, "rows": count, "score": score})
+                covered |= span
+        return results
+
+    def prompt_hints(self, question: str) -> str:
+        """Compact, question-specific prompt section: candidate literals plus column cardinalities"""
+        lines = []
+        resolved = self.resolve(question)
+        if resolved:
+            lines.append("Stored values the question may refer to (use one only if it is what the question means; "
+                         "the literals are spelled exactly as in the data):")
+            for item in resolved:
+                literal = item["value"].replace("'", "''")
+                lines.append(f"- \"{item['phrase']}\" may refer to {item['column']} = '{literal}' ({item['rows']} rows)")
+        cardinalities = [f"{column}={self.cardinalities[column]}"
+                         for column in PROMPT_CARDINALITY_COLUMNS if column in self.cardinalities]
+        if cardinalities:
+            lines.append("Distinct values per column: " + ", ".join(cardinalities))
+        if not lines:
+            return ""
+        return "\n====================\nDATA HINTS\n====================\n\n" + "\n".join(lines) + "\n"
+
+
+# ==================== Process-wide index ====================
+
+def index_path() -> Path:
+    return Path(os.getenv("VALUE_INDEX_PATH", str(DEFAULT_INDEX_PATH)))
+
+
+_index = ReloadingArtifact(index_path, ValueIndex.load,
+                           describe=lambda index: f"value index: {sum(len(v) for v in index.values.values())} values")
+
+
+def get_value_index():
+    """Return the loaded index, or None if it has not been built (reloaded when the file changes)"""
+    return _index.get()
+
+
+def build_and_save_value_index(df, append: bool = False):
+    """Ingestion hook: index the distinct values of the ingested frame"""
+    path = index_path()
+    if append and not path.exists():
+        raise FileNotFoundError(f"Cannot append to a missing value index ({path})")
+    index = ValueIndex.from_frame(df)
+    if append:
+        index = ValueIndex.load(path).merge(index)
+    index.save(path)
+    print(f"✓ Value index saved to {path} ({sum(len(v) for v in index.values.values())} values)")
+    return index
@@ -0,0 +1,133 @@
+# warmer.py
+# Post-ingestion cache warmer.
+# Reads the most frequent questions from the request history in the shared cache and
+# re-runs them against the new data - SQL generation, query execution and (optionally)
+# charts - so the first users after a data refresh get cache-hit latency. Work is bounded
+# by a time budget and a concurrency limit. The warmer is a separate process with its own
+# LLM scheduler, so its batch priority only orders its own calls: it does not queue behind
+# the API workers' interactive traffic, and WARM_CONCURRENCY is what caps the load it adds
+# to the LLM provider and the database.
+#
+# Usage (ingestion runs this automatically):
+#   python -m src.warmer --top 50 --budget 120 --concurrency 4
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .cache import get_cache
+from .chart_store import get_or_create_chart
+from .llm import generate_sql, remember_sql, needs_chart
+from .query import execute_sql
+from .repair import fingerprint_sql
+from .scheduler import priority_class, BATCH
+
+WARM_TOP_N = int(os.getenv("WARM_TOP_N", "50"))
+WARM_BUDGET_SECONDS = float(os.getenv("WARM_BUDGET_SECONDS", "120"))
+WARM_CONCURRENCY = int(os.getenv("WARM_CONCURRENCY", "4"))
+WARM_HISTORY_DAYS = int(os.getenv("WARM_HISTORY_DAYS", "7"))
+WARM_CHARTS = os.getenv("WARM_CHARTS", "1").lower() in ("1", "true", "yes")
+
+
+def warm_entry(entry: dict, include_charts: bool = True) -> dict:
+    """Refresh the SQL, result and chart cache entries for one historical question"""
+    started = time.perf_counter()
+    question = entry["question"]
+    report = {"question": question, "count": entry["count"]}
+    with priority_class(BATCH):
+        # SQL: the prompt includes data hints, so new data can mean a new cache key
+        try:
+            sql = generate_sql(question)
+            report["sql_source"] = "generated" if fingerprint_sql(sql) != fingerprint_sql(entry["sql"]) else "unchanged"
+        except Exception as e:
+            sql = entry["sql"]
+            report["sql_source"] = f"history ({e})"
+        report["sql_fingerprint"] = fingerprint_sql(sql)[:16]
+
+        try:
+            data = execute_sql(sql, refresh=True) or []
+            report["rows"] = len(data)
+            remember_sql(question, sql)
+        except Exception as e:
+            report.update(status="error", error=str(e), seconds=round(time.perf_counter() - started, 4))
+            return report
+
+        if include_charts and needs_chart(question):
+            try:
+                report["chart_id"] = get_or_create_chart(question, sql, data)
+            except Exception as e:
+                report["chart_error"] = str(e)
+
+    report.update(status="refreshed", seconds=round(time.perf_counter() - started, 4))
+    return report
+
+
+def warm_caches(top_n: int = WARM_TOP_N, budget_seconds: float = WARM_BUDGET_SECONDS,
+                concurrency: int = WARM_CONCURRENCY, days: int = WARM_HISTORY_DAYS,
+                include_charts: bool = WARM_CHARTS, clear_results: bool = True) -> dict:
+    """
+    Re-run the top-N recent questions within the time and concurrency budget.
+    Returns (and stores under ("warmer", "last_report")) a report of what was refreshed.
+    """
+    started = time.perf_counter()
+    cache = get_cache()
+    if cache is None:
+        print("Cache warmer skipped: the shared cache is disabled (CACHE_ENABLED=0)")
+        return {"status": "skipped", "reason": "cache disabled"}
+
+    entries = cache.top_requests(limit=top_n, days=days)
+    if clear_results:
+        # Results computed on the old data must not be served any more
+        cache.clear("result")
+    print(f"Warming caches for {len(entries)} popular questions "
+          f"(budget {budget_seconds:.0f}s, concurrency {concurrency})...")
+
+    deadline = time.monotonic() + budget_seconds
+    results = []
+
+    def run(entry):
+        # Entries that have not started when the budget runs out are skipped
+        if time.monotonic() >= deadline:
+            return {"question": entry["question"], "count": entry["count"], "status": "skipped"}
+        return warm_entry(entry, include_charts=include_charts)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(run, entry) for entry in entries]
+        for future in as_completed(futures):
+            item = future.result()
+            results.append(item)
+            if item["status"] == "refreshed":
+                print(f"✓ {item['question'][:60]} ({item.get('rows', 0)} rows, {item['seconds']}s)")
+            elif item["status"] == "error":
+                print(f"✗ {item['question'][:60]}: {item['error']}")
+
+    report = {
+        "status": "completed",
+        "finished_at": time.time(),
+        "seconds": round(time.perf_counter() - started, 4),
+        "candidates": len(entries),
+        "refreshed": sum(1 for item in results if item["status"] == "refreshed"),
+        "failed": sum(1 for item in results if item["status"] == "error"),
+        "skipped": sum(1 for item in results if item["status"] == "skipped"),
+        "entries": sorted(results, key=lambda item: -item["count"]),
+    }
+    cache.set_json("warmer", "last_report", report)
+    print(f"Cache warm-up finished: {report['refreshed']} refreshed, {report['failed']} failed, "
+          f"{report['skipped']} skipped in {report['seconds']}s")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh caches for the most popular recent questions")
+    parser.add_argument("--top", type=int, default=WARM_TOP_N, help="Number of questions to refresh")
+    parser.add_argument("--budget", type=float, default=WARM_BUDGET_SECONDS, help="Time budget in seconds")
+    parser.add_argument("--concurrency", type=int, default=WARM_CONCURRENCY, help="Questions refreshed in parallel")
+    parser.add_argument("--days", type=int, default=WARM_HISTORY_DAYS, help="Request history window in days")
+    parser.add_argument("--no-charts", action="store_true", help="Do not regenerate charts")
+    args = parser.parse_args(argv)
+    warm_caches(top_n=args.top, budget_seconds=args.budget, concurrency=args.concurrency,
+                days=args.days, include_charts=WARM_CHARTS and not args.no_charts)
+
+
+if __name__ == "__main__":
+    main()
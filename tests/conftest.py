@@ -0,0 +1,38 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src import cache
+from src.data_pipeline import SHEET, excel_path, transform
+
+# Enough rows of the real workbook to cover several months, brands and customers
+SAMPLE_ROWS = 2000
+
+
+@pytest.fixture(scope="session")
+def sales_frame():
+    """The first SAMPLE_ROWS rows of data/sales.xlsx, cleaned exactly like ingestion does"""
+    if not os.path.exists(excel_path):
+        pytest.skip(f"{excel_path} is not available")
+    raw = pd.read_excel(excel_path, sheet_name=SHEET, nrows=SAMPLE_ROWS)
+    frame, _ = transform(raw, verbose=False)
+    return frame
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(tmp_path, monkeypatch):
+    """A fresh shared cache per test, so tests never touch .cache/ or each other's entries"""
+    monkeypatch.setenv("CACHE_ENABLED", "1")
+    instance = cache.SharedCache(tmp_path / "shared_cache.sqlite3", max_bytes=1024 * 1024)
+    monkeypatch.setattr(cache, "_cache", instance)
+    return instance
+
+
+@pytest.fixture
+def api():
+    """HTTP client for the FastAPI app (start-up hooks are not run)"""
+    from fastapi.testclient import TestClient
+    from src.app import app
+
+    return TestClient(app)
@@ -0,0 +1,91 @@
+import json
+import threading
+
+from src import app as app_module
+from src.batch import dedupe_questions, run_batch
+
+
+def _lines(chunks) -> list:
+    return [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+
+
+def test_dedupe_ignores_case_and_whitespace():
+    groups = dedupe_questions(["Sales by city", "Top brands", "  sales   BY city ", "Top brands"])
+
+    assert groups == [("Sales by city", [0, 2]), ("Top brands", [1, 3])]
+
+
+def test_duplicates_are_answered_once():
+    calls = []
+
+    def run_one(question, before_call):
+        calls.append(question)
+        return {"status": "success", "answer": question}
+
+    lines = _lines(run_batch(["Sales by city", "sales by city", "Top brands"], run_one))
+
+    assert sorted(calls) == ["Sales by city", "Top brands"]
+    results = {line["question"]: line for line in lines if line["type"] == "result"}
+    assert results["Sales by city"]["indices"] == [0, 1]
+    assert results["Top brands"]["indices"] == [2]
+    summary = lines[-1]
+    assert summary["type"] == "summary"
+    assert (summary["total"], summary["unique"], summary["succeeded"], summary["failed"]) == (3, 2, 2, 0)
+
+
+def test_results_stream_in_completion_order_then_summary():
+    fast_done = threading.Event()
+
+    def run_one(question, before_call):
+        if question == "slow":
+            # Only finishes after the second question has
+            fast_done.wait(timeout=5)
+        else:
+            fast_done.set()
+        return {"status": "success"}
+
+    lines = _lines(run_batch(["slow", "fast"], run_one, parallelism=2))
+
+    assert [line.get("question") for line in lines] == ["fast", "slow", None]
+    assert lines[-1]["type"] == "summary"
+
+
+def test_failures_are_reported_per_question():
+    def run_one(question, before_call):
+        if question == "raises":
+            raise RuntimeError("upstream down")
+        if question == "errors":
+            return {"status": "error", "error": "bad SQL"}
+        return {"status": "success"}
+
+    lines = _lines(run_batch(["raises", "errors", "works"], run_one))
+
+    results = {line["question"]: line for line in lines if line["type"] == "result"}
+    assert results["raises"]["status"] == "error"
+    assert results["raises"]["error"] == "upstream down"
+    assert results["errors"]["error"] == "bad SQL"
+    assert results["works"]["status"] == "success"
+    assert lines[-1]["succeeded"] == 1
+    assert lines[-1]["failed"] == 2
+
+
+def test_batch_endpoint_streams_ndjson(api, monkeypatch):
+    def fake_run_sql_question(question, before_call=None, include_chart=True, narration="auto"):
+        return {"status": "success", "answer": question.upper()}
+
+    monkeypatch.setattr(app_module, "run_sql_question", fake_run_sql_question)
+
+    response = api.post("/chat/batch", json={"questions": ["a", "A", "b"]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = _lines([response.content])
+    assert sorted(line["result"]["answer"] for line in lines if line["type"] == "result") == ["A", "B"]
+    assert lines[-1]["type"] == "summary"
+    assert lines[-1]["unique"] == 2
+
+
+def test_batch_endpoint_rejects_empty_batches(api):
+    response = api.post("/chat/batch", json={"questions": []})
+
+    assert response.status_code == 400
@@ -0,0 +1,100 @@
+import sqlite3
+
+from src import cache
+from src.cache import SharedCache
+
+
+def test_set_and_get_round_trip(shared_cache):
+    shared_cache.set("sql", "a", b"SELECT 1")
+    shared_cache.set_json("result", "a", {"rows": [1, 2]})
+
+    assert shared_cache.get("sql", "a") == b"SELECT 1"
+    assert shared_cache.get_json("result", "a") == {"rows": [1, 2]}
+    assert shared_cache.get("sql", "missing") is None
+
+
+def test_expired_entries_are_misses(shared_cache, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(cache.time, "time", lambda: now)
+    shared_cache.set("sql", "short", b"x", ttl=10)
+    shared_cache.set("sql", "forever", b"y")
+
+    now += 11
+    assert shared_cache.get("sql", "short") is None
+    assert shared_cache.get("sql", "forever") == b"y"
+
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(cache.time, "time", lambda: now)
+    store = SharedCache(tmp_path / "small.sqlite3", max_bytes=250)
+    for key in ("a", "b"):
+        store.set("ns", key, b"x" * 100)
+        now += 1
+    # Reading "a" makes "b" the least recently used entry
+    assert store.get("ns", "a") is not None
+    now += 1
+
+    store.set("ns", "c", b"x" * 100)
+
+    assert store.get("ns", "a") is not None
+    assert store.get("ns", "b") is None
+    assert store.get("ns", "c") is not None
+
+
+def test_values_larger_than_the_budget_are_not_stored(tmp_path):
+    store = SharedCache(tmp_path / "small.sqlite3", max_bytes=10)
+    store.set("ns", "big", b"x" * 11)
+    assert store.get("ns", "big") is None
+
+
+def test_stats_count_hits_misses_and_bytes(shared_cache):
+    shared_cache.set("sql", "a", b"12345")
+    shared_cache.get("sql", "a")
+    shared_cache.get("sql", "a")
+    shared_cache.get("sql", "b")
+
+    stats = shared_cache.stats()["sql"]
+
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == round(2 / 3, 4)
+    assert stats["entries"] == 1
+    assert stats["bytes"] == 5
+
+
+def test_clear_drops_one_namespace(shared_cache):
+    shared_cache.set("sql", "a", b"1")
+    shared_cache.set("result", "a", b"2")
+
+    shared_cache.clear("result")
+
+    assert shared_cache.get("sql", "a") == b"1"
+    assert shared_cache.get("result", "a") is None
+
+
+def test_request_history_ranks_by_count(shared_cache):
+    shared_cache.record_request("Total sales by city", "SELECT 1")
+    shared_cache.record_request("total   sales by CITY", "SELECT 2")
+    shared_cache.record_request("Top brands", "SELECT 3")
+
+    top = shared_cache.top_requests()
+
+    assert [item["count"] for item in top] == [2, 1]
+    assert top[0]["sql"] == "SELECT 2"
+
+
+class _BrokenConnection:
+    def execute(self, *args, **kwargs):
+        raise sqlite3.OperationalError("disk I/O error")
+
+
+def test_sqlite_errors_never_escape(shared_cache, monkeypatch):
+    monkeypatch.setattr(shared_cache, "_conn", lambda: _BrokenConnection())
+
+    assert shared_cache.get("sql", "a") is None
+    shared_cache.set("sql", "a", b"1")
+    shared_cache.delete("sql", "a")
+    shared_cache.clear()
+    shared_cache.record_request("question", "SELECT 1")
+    assert shared_cache.top_requests() == []
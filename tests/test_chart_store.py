@@ -0,0 +1,48 @@
+import pytest
+
+from src import chart_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Chart store in a temporary directory; records the charts the image model is asked for"""
+    monkeypatch.setenv("CHART_STORE_PATH", str(tmp_path / "charts"))
+    generated = []
+
+    def generate_chart_image(question, sql, data):
+        generated.append(question)
+        return b"\x89PNG fake chart"
+
+    monkeypatch.setattr(chart_store, "generate_chart_image", generate_chart_image)
+    return generated
+
+
+def test_identical_results_share_one_chart(store):
+    data = [{"brand": "Silk", "sum": 10.0}]
+    first = chart_store.get_or_create_chart("Sales by brand", "SELECT ...", data)
+    second = chart_store.get_or_create_chart("sales by brand?", "SELECT ...", data)
+    other = chart_store.get_or_create_chart("Sales by brand", "SELECT ...", [{"brand": "Silk", "sum": 11.0}])
+
+    assert first == second != other
+    assert store == ["Sales by brand", "Sales by brand"]
+
+
+def test_charts_are_served_with_etag_and_immutable_caching(store, api, monkeypatch):
+    # Without Pillow every client gets the stored PNG
+    monkeypatch.setattr(chart_store, "Image", None)
+    key = chart_store.get_or_create_chart("Sales by brand", "SELECT ...", [])
+
+    response = api.get(chart_store.chart_url(key), headers={"Accept": "image/webp,image/*"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["cache-control"] == chart_store.CACHE_CONTROL
+    assert response.content == b"\x89PNG fake chart"
+
+    revalidated = api.get(chart_store.chart_url(key), headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+
+def test_unknown_charts_are_not_found(store, api):
+    assert api.get("/charts/" + "0" * 40).status_code == 404
+    assert api.get("/charts/not-a-chart-id").status_code == 404
@@ -0,0 +1,94 @@
+import pytest
+
+from src import conversation
+from src.conversation import derive_follow_up, save_context
+
+PREVIOUS = [
+    {"city": "DOHA", "channel": "Retail", "total_value": 500.0},
+    {"city": "AL KHOR", "channel": "Retail", "total_value": 120.0},
+    {"city": "AL WAKRA", "channel": "Wholesale", "total_value": 300.0},
+    {"city": "DOHA", "channel": "Wholesale", "total_value": 80.0},
+]
+SQL = "SELECT city, channel, SUM(value) AS total_value FROM sales GROUP BY city, channel"
+
+
+@pytest.fixture
+def session():
+    save_context("s1", "Sales by city and channel", SQL, PREVIOUS)
+    return "s1"
+
+
+def test_top_n_sorts_by_the_metric_and_limits(session):
+    derived = derive_follow_up(session, "now only the top 2")
+
+    assert [row["total_value"] for row in derived["data"]] == [500.0, 300.0]
+    assert derived["sql"] == SQL
+    assert derived["base_question"] == "Sales by city and channel"
+    assert derived["derivation"] == ["sort by total_value descending", "keep first 2 rows"]
+
+
+def test_sort_ascending(session):
+    derived = derive_follow_up(session, "sort by value ascending")
+
+    assert [row["total_value"] for row in derived["data"]] == [80.0, 120.0, 300.0, 500.0]
+
+
+def test_filter_on_a_value_of_the_prior_result(session):
+    derived = derive_follow_up(session, "just Doha")
+
+    assert derived["data"] == [PREVIOUS[0], PREVIOUS[3]]
+
+
+def test_exclusion_and_threshold_filters(session):
+    derived = derive_follow_up(session, "exclude wholesale")
+    assert {row["channel"] for row in derived["data"]} == {"Retail"}
+
+    derived = derive_follow_up(session, "only those above 200")
+    assert [row["city"] for row in derived["data"]] == ["DOHA", "AL WAKRA"]
+
+
+def test_regroup_sums_the_metric_by_another_dimension(session):
+    derived = derive_follow_up(session, "total by channel")
+
+    assert derived["data"] == [
+        {"channel": "Retail", "total_value": 620.0},
+        {"channel": "Wholesale", "total_value": 380.0},
+    ]
+
+
+def test_derivations_accumulate_across_follow_ups(session):
+    first = derive_follow_up(session, "just Doha")
+    save_context(session, "just Doha", first["sql"], first["data"], first["derivation"])
+
+    second = derive_follow_up(session, "top 1")
+
+    assert second["data"] == [PREVIOUS[0]]
+    assert second["derivation"][0].startswith("filter city IN")
+    assert second["derivation"][-1] == "keep first 1 rows"
+
+
+def test_unrecognized_follow_ups_need_fresh_sql(session):
+    assert derive_follow_up(session, "what about last year's margin") is None
+    assert derive_follow_up(session, "top 2 by brand") is None
+
+
+def test_averages_are_not_re_aggregated():
+    rows = [{"city": "DOHA", "channel": "Retail", "avg_value": 10.0},
+            {"city": "DOHA", "channel": "Wholesale", "avg_value": 20.0}]
+    save_context("s2", "Average sale by city and channel", "SELECT ...", rows)
+
+    assert derive_follow_up("s2", "total by city") is None
+
+
+def test_unknown_sessions_have_no_context():
+    assert derive_follow_up("never-seen", "top 5") is None
+
+
+def test_context_falls_back_to_process_memory_without_the_cache(monkeypatch):
+    monkeypatch.setenv("CACHE_ENABLED", "0")
+    monkeypatch.setattr(conversation, "_local_sessions", type(conversation._local_sessions)())
+    save_context("local", "Sales by city and channel", SQL, PREVIOUS)
+
+    derived = derive_follow_up("local", "bottom 1")
+
+    assert derived["data"] == [PREVIOUS[3]]
@@ -0,0 +1,144 @@
+import os
+
+import pytest
+
+from src import cube as cube_module
+from src.artifacts import ReloadingArtifact
+from src.cube import SalesCube, parse_aggregate_sql, month_number
+
+
+@pytest.fixture(scope="module")
+def cube(sales_frame):
+    return SalesCube.from_frame(sales_frame)
+
+
+def total(frame, column="value"):
+    return round(float(frame[column].astype(float).sum()), 2)
+
+
+# ==================== parse_aggregate_sql ====================
+
+def test_parse_group_by_shape():
+    plan = parse_aggregate_sql(
+        "SELECT brand, SUM(value) AS total_sales FROM sales_transactions "
+        "WHERE year = 2024 AND month IN (1, 2) AND channel <> 'HORECA' "
+        "GROUP BY brand ORDER BY total_sales DESC LIMIT 5;"
+    )
+    assert plan["select"] == [
+        {"kind": "column", "column": "brand", "name": "brand"},
+        {"kind": "sum", "column": "value", "name": "total_sales"},
+    ]
+    assert plan["filters"] == [("year", "in", [2024]), ("month", "in", [1, 2]), ("channel", "not in", ["HORECA"])]
+    assert plan["group_by"] == ["brand"]
+    assert plan["order"] == [(1, True)]
+    assert plan["limit"] == 5
+
+
+def test_parse_between_ordinals_and_distinct_counts():
+    plan = parse_aggregate_sql(
+        "SELECT year, COUNT(DISTINCT customer_account_number) FROM sales_transactions "
+        "WHERE year BETWEEN 2023 AND 2024 AND brand = 'O''NEILL' GROUP BY 1 ORDER BY 1"
+    )
+    assert plan["select"][1] == {"kind": "count_distinct", "column": "customer_account_number", "name": "count"}
+    assert plan["filters"] == [("year", ">=", [2023]), ("year", "<=", [2024]), ("brand", "in", ["O'NEILL"])]
+    assert plan["group_by"] == ["year"]
+    assert plan["order"] == [(0, False)]
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT brand, SUM(value) FROM sales_transactions GROUP BY brand HAVING SUM(value) > 10",
+    "SELECT s.brand, SUM(s.value) FROM sales_transactions s JOIN brands b ON b.name = s.brand GROUP BY s.brand",
+    "SELECT COUNT(salesman) FROM sales_transactions",
+    "SELECT SUM(value) FROM active_store",
+    "SELECT brand, city, SUM(value) FROM sales_transactions GROUP BY brand",
+    "SELECT brand FROM sales_transactions",
+    "WITH t AS (SELECT * FROM sales_transactions) SELECT SUM(value) FROM t",
+])
+def test_parse_rejects_unsupported_shapes(sql):
+    assert parse_aggregate_sql(sql) is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("JAN", 1), ("January", 1), ("sept", 9), (" dec ", 12), (3, 3), ("11", 11), (7.0, 7),
+    ("Q1", None), (13, None), (None, None), ("3.5", None),
+])
+def test_month_number(value, expected):
+    assert month_number(value) == expected
+
+
+# ==================== SalesCube on real rows ====================
+
+def test_sum_by_brand_matches_pandas(cube, sales_frame):
+    rows = cube.try_execute("SELECT brand, SUM(value) AS sales FROM sales_transactions "
+                            "GROUP BY brand ORDER BY sales DESC LIMIT 3")
+    expected = sales_frame.groupby("brand")["value"].sum().astype(float).round(2).nlargest(3)
+    assert [row["brand"] for row in rows] == expected.index.tolist()
+    assert [round(row["sales"], 2) for row in rows] == expected.tolist()
+
+
+def test_month_name_and_number_filters_agree(cube, sales_frame):
+    by_name = cube.try_execute("SELECT SUM(value) FROM sales_transactions WHERE month = 'JAN'")
+    by_number = cube.try_execute("SELECT SUM(value) FROM sales_transactions WHERE year = 2024 AND month = 1")
+    january = sales_frame[sales_frame["month"] == 1]
+    assert len(january)
+    assert by_name == by_number == [{"sum": total(january)}]
+
+
+def test_group_by_month_keeps_one_group_per_month(cube, sales_frame):
+    rows = cube.try_execute("SELECT month, COUNT(*) AS n FROM sales_transactions GROUP BY month ORDER BY month")
+    counts = sales_frame.groupby("month").size()
+    assert rows == [{"month": int(month), "n": int(n)} for month, n in counts.items()]
+
+
+def test_unresolved_literal_is_left_to_the_database(cube):
+    assert cube.try_execute("SELECT SUM(value) FROM sales_transactions WHERE month = 'Q1'") is None
+    assert cube.try_execute("SELECT SUM(value) FROM sales_transactions WHERE year = 'last'") is None
+
+
+def test_distinct_customers_and_integer_sums(cube, sales_frame):
+    brand = sales_frame["brand"].mode()[0]
+    rows = cube.try_execute(
+        f"SELECT COUNT(DISTINCT customer_account_number) AS stores, SUM(invoiced_quantity) AS units "
+        f"FROM sales_transactions WHERE brand = '{brand}'"
+    )
+    subset = sales_frame[sales_frame["brand"] == brand]
+    assert rows == [{"stores": subset["customer_account_number"].nunique(),
+                     "units": int(subset["invoiced_quantity"].sum())}]
+    assert isinstance(rows[0]["units"], int)
+
+
+def test_unknown_filter_value_gives_null_sum(cube):
+    assert cube.try_execute("SELECT SUM(value) FROM sales_transactions WHERE brand = 'NO SUCH BRAND'") == [{"sum": None}]
+
+
+def test_append_and_reload_match_a_single_build(cube, sales_frame, tmp_path):
+    half = len(sales_frame) // 2
+    appended = SalesCube.from_frame(sales_frame.iloc[:half]).append(SalesCube.from_frame(sales_frame.iloc[half:]))
+    appended.save(tmp_path / "cube.npz")
+    reloaded = SalesCube.load(tmp_path / "cube.npz")
+    sql = "SELECT city, month, SUM(value) AS sales FROM sales_transactions GROUP BY city, month ORDER BY city, month"
+    assert reloaded.n_rows == len(sales_frame)
+    assert reloaded.try_execute(sql) == cube.try_execute(sql)
+
+
+def test_group_keys_that_would_overflow_int64_are_grouped_directly(cube, monkeypatch):
+    by = ["city", "brand", "month"]
+    packed = cube.aggregate(by, [("sum", "value"), ("count", None)])
+    # Force the unpacked path, as for GROUP BYs whose radices multiply past 2**63
+    monkeypatch.setattr(cube_module, "_MAX_PACKED_KEY", 0)
+    stacked = cube.aggregate(by, [("sum", "value"), ("count", None)])
+    assert stacked == packed
+    assert sum(count for _, (_, count) in stacked) == cube.n_rows
+
+
+def test_corrupt_artifact_is_treated_as_absent(cube, tmp_path):
+    path = tmp_path / "cube.npz"
+    path.write_bytes(b"not a cube")
+    artifact = ReloadingArtifact(lambda: path, SalesCube.load, lambda c: f"cube ({c.n_rows} rows)")
+    assert artifact.get() is None
+
+    # Rebuilding the file is picked up at the next mtime check
+    cube.save(path)
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 1))
+    artifact._checked = 0.0
+    assert artifact.get().n_rows == cube.n_rows
@@ -0,0 +1,81 @@
+import pytest
+
+from src import hll, query
+from src.cube import SalesCube
+from src.hll import SketchIndex, relative_standard_error
+
+
+@pytest.fixture(scope="module")
+def sketches(sales_frame):
+    return SketchIndex.from_frame(sales_frame)
+
+
+def assert_close(estimate, exact):
+    # Four standard errors: the check must not be flaky, only catch wrong merges
+    assert abs(estimate - exact) <= max(2, 4 * relative_standard_error() * exact)
+
+
+def test_total_active_stores(sketches, sales_frame):
+    rows, info = sketches.estimate("SELECT COUNT(DISTINCT customer_account_number) AS stores FROM sales_transactions")
+    assert info["method"] == "hyperloglog"
+    assert_close(rows[0]["stores"], sales_frame["customer_account_number"].nunique())
+
+
+def test_month_name_filter_counts_only_that_month(sketches, sales_frame):
+    rows, _ = sketches.estimate("SELECT COUNT(DISTINCT customer_account_number) AS stores "
+                                "FROM sales_transactions WHERE year = 2024 AND month = 'JAN'")
+    january = sales_frame[sales_frame["month"] == 1]["customer_account_number"].nunique()
+    assert_close(rows[0]["stores"], january)
+    assert january < sales_frame["customer_account_number"].nunique()
+
+
+def test_grouped_by_brand_and_month(sketches, sales_frame):
+    rows, info = sketches.estimate(
+        "SELECT brand, month, COUNT(DISTINCT customer_account_number) AS stores FROM sales_transactions "
+        "GROUP BY brand, month ORDER BY brand, month"
+    )
+    exact = sales_frame.groupby(["brand", "month"])["customer_account_number"].nunique()
+    assert [(row["brand"], row["month"]) for row in rows] == list(exact.index)
+    for row in rows:
+        assert_close(row["stores"], exact[(row["brand"], row["month"])])
+    assert len(info["intervals"]) == len(rows)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(DISTINCT customer_account_number) FROM sales_transactions WHERE month = 'Q1'",
+    "SELECT COUNT(DISTINCT customer_account_number) FROM sales_transactions WHERE brand = 'X' AND city = 'Y'",
+    "SELECT COUNT(DISTINCT customer_account_number) FROM sales_transactions WHERE category = 'X'",
+    "SELECT SUM(value) FROM sales_transactions",
+])
+def test_uncovered_queries_are_declined(sketches, sql):
+    assert sketches.estimate(sql) is None
+
+
+def test_merge_matches_a_single_build(sketches, sales_frame):
+    half = len(sales_frame) // 2
+    merged = SketchIndex.from_frame(sales_frame.iloc[:half]).merge(SketchIndex.from_frame(sales_frame.iloc[half:]))
+    rebuilt = {key: row for row, key in enumerate(merged.keys)}
+    assert set(rebuilt) == set(sketches.keys)
+    for row, key in enumerate(sketches.keys):
+        assert (merged.registers[rebuilt[key]] == sketches.registers[row]).all()
+
+
+def test_append_needs_existing_sketches(sales_frame, tmp_path, monkeypatch):
+    monkeypatch.setenv("HLL_PATH", str(tmp_path / "sketches.npz"))
+    with pytest.raises(FileNotFoundError):
+        hll.build_and_save_sketches(sales_frame, append=True)
+
+
+def test_sketches_answer_while_the_cube_is_present(sketches, sales_frame, monkeypatch):
+    sql = "SELECT COUNT(DISTINCT customer_account_number) FROM sales_transactions WHERE month = 2"
+    cube = SalesCube.from_frame(sales_frame)
+    assert cube.can_answer(sql)
+    monkeypatch.setattr(query, "get_sketches", lambda: sketches)
+    monkeypatch.setattr(query, "get_cube", lambda: cube)
+
+    rows, info = query.estimate_distinct(sql)
+
+    assert info["method"] == "hyperloglog"
+    exact = query.execute_sql(sql)
+    assert exact == cube.try_execute(sql)
+    assert rows[0]["count"] == pytest.approx(exact[0]["count"], rel=0.05)
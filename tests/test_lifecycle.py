@@ -0,0 +1,61 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src import lifecycle
+
+
+@pytest.fixture
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(lifecycle, "_state", {"ready": False, "import_seconds": 0.1, "warmup_seconds": None,
+                                              "ready_seconds": None, "warmup": {}})
+    monkeypatch.setattr(lifecycle, "_warmup_hooks", [])
+
+
+def test_importing_the_app_creates_no_clients():
+    code = ("import src.app, src.llm, src.database; "
+            "assert src.llm._client is None and src.database._supabase is None; "
+            "assert 'google.genai' not in __import__('sys').modules")
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).parent.parent)
+
+
+def test_healthz_is_always_ok(api, fresh_state):
+    assert api.get("/healthz").json() == {"status": "ok"}
+
+
+def test_readyz_reports_starting_until_startup_ran(api, fresh_state):
+    response = api.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+
+    lifecycle.run_startup(warmup=False)
+    response = api.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    assert response.json()["warmup"] == {}
+
+
+def test_failing_warmup_hook_does_not_block_readiness(fresh_state):
+    calls = []
+
+    @lifecycle.warmup_hook
+    def broken():
+        raise RuntimeError("no credentials")
+
+    @lifecycle.warmup_hook
+    def working():
+        calls.append("working")
+
+    report = lifecycle.run_startup(warmup=True)
+    assert report["ready"] is True
+    assert report["warmup"]["broken"]["status"] == "error: no credentials"
+    assert report["warmup"]["working"]["status"] == "ok"
+    assert calls == ["working"]
+
+
+def test_warmup_is_opt_in(fresh_state, monkeypatch):
+    monkeypatch.delenv("WARMUP_ON_STARTUP", raising=False)
+    lifecycle.warmup_hook(lambda: pytest.fail("warm-up ran without WARMUP_ON_STARTUP=1"))
+    assert lifecycle.run_startup()["warmup_seconds"] is None
@@ -0,0 +1,116 @@
+import pytest
+
+from src import narration
+from src.narration import approximate_note, format_number, narrate
+
+
+def test_scalar_with_filters_from_the_sql():
+    text = narrate("Total Silk sales in March 2024",
+                   "SELECT SUM(value) FROM sales_transactions WHERE brand = 'Silk' AND year = 2024 AND month = 3",
+                   [{"sum": 1236974.78}])
+
+    assert text == "Total for Silk in March 2024 came to **1,236,974.78**."
+
+
+def test_counts_are_whole_numbers():
+    text = narrate("How many stores bought Neo?",
+                   "SELECT COUNT(DISTINCT customer_account_number) AS stores FROM sales_transactions WHERE brand = 'Neo'",
+                   [{"stores": 412}])
+
+    assert text == "Stores for Neo came to **412**."
+
+
+def test_empty_result():
+    assert narrate("Sales of Silk in 2019", "SELECT SUM(value) FROM sales_transactions WHERE year = 2019", []) == \
+        "No matching records were found in 2019."
+
+
+def test_single_row_lists_every_field():
+    text = narrate("Best month", "SELECT year, month, SUM(value) AS total_sales FROM sales_transactions ...",
+                   [{"year": 2024, "month": 3, "total_sales": 1500.5}])
+
+    assert text.splitlines() == [
+        "Here is the result:",
+        "",
+        "- **Year**: 2024",
+        "- **Month**: March",
+        "- **Total sales**: 1,500.50",
+    ]
+
+
+def test_year_over_year_pair():
+    text = narrate("Sales 2023 vs 2024", "SELECT year, SUM(value) AS total_sales FROM sales_transactions GROUP BY year",
+                   [{"year": 2024, "total_sales": 1100.0}, {"year": 2023, "total_sales": 1000.0}])
+
+    assert text == ("Total sales came to **1,100.00** in 2024 versus 1,000.00 in 2023, up 10.0% (100.00).")
+
+
+def test_ranked_list_shows_shares_of_the_total():
+    data = [{"brand": "Silk", "total_sales": 300.0}, {"brand": "Neo", "total_sales": 100.0}]
+
+    lines = narrate("Sales by brand", "SELECT brand, SUM(value) AS total_sales FROM sales_transactions GROUP BY brand",
+                    data).splitlines()
+
+    assert lines == [
+        "Total sales by brand:",
+        "",
+        "1. **Silk**: 300.00 (75.0%)",
+        "2. **Neo**: 100.00 (25.0%)",
+        "",
+        "**Silk** is highest at 300.00, 75.0% of the 400.00 shown.",
+    ]
+
+
+def test_non_additive_metrics_get_no_shares():
+    data = [{"brand": "Silk", "active_stores": 30}, {"brand": "Neo", "active_stores": 10}]
+
+    text = narrate("Active stores by brand", "SELECT ...", data)
+
+    assert "%" not in text
+    assert "**Silk** is highest at 30." in text
+
+
+def test_monthly_trend_keeps_its_order():
+    data = [{"year": 2024, "month": 1, "total_sales": 100.0},
+            {"year": 2024, "month": 2, "total_sales": 50.0},
+            {"year": 2024, "month": 3, "total_sales": 80.0}]
+
+    lines = narrate("Monthly sales in 2024", "SELECT ...", data).splitlines()
+
+    assert lines[0] == "Total sales by month:"
+    assert lines[2:5] == ["- **January 2024**: 100.00", "- **February 2024**: 50.00", "- **March 2024**: 80.00"]
+    assert lines[-1] == "From January 2024 to March 2024, total sales went from 100.00 to 80.00, down 20.0% (20.00)."
+
+
+@pytest.mark.parametrize("question", [
+    "Why did Silk sales drop in March?",
+    "Explain the sales by brand",
+    "Give me insights on channel performance",
+    "Analyze sales by city",
+])
+def test_analysis_questions_go_to_the_llm(question):
+    assert narrate(question, "SELECT ...", [{"brand": "Silk", "total_sales": 300.0}]) is None
+
+
+@pytest.mark.parametrize("data", [
+    # Too many rows
+    [{"brand": f"B{i}", "total_sales": float(i)} for i in range(narration.MAX_LIST_ROWS + 1)],
+    # Two metrics
+    [{"brand": "Silk", "total_sales": 1.0, "units": 2}, {"brand": "Neo", "total_sales": 3.0, "units": 4}],
+    # Rows with different columns
+    [{"brand": "Silk", "total_sales": 1.0}, {"city": "DOHA", "total_sales": 2.0}],
+])
+def test_complex_shapes_go_to_the_llm(data):
+    assert narrate("Sales", "SELECT ...", data) is None
+
+
+def test_currency_is_only_shown_when_configured(monkeypatch):
+    assert format_number(1234.5, "currency") == "1,234.50"
+    monkeypatch.setattr(narration, "CURRENCY", "QAR")
+    assert format_number(1234.5, "currency") == "QAR 1,234.50"
+
+
+def test_approximate_notes():
+    assert "HyperLogLog" in approximate_note({"method": "hyperloglog", "relative_standard_error": 0.01})
+    note = approximate_note({"sample_fraction": 0.05, "sample_rows": 1000, "population_rows": 20000, "confidence": 0.95})
+    assert "5.0% sample (1,000 of 20,000 rows)" in note
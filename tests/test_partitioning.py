@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src import data_pipeline, query
+from src.data_pipeline import ensure_partitions, load, transform
+from src.query import PartitionGuardError
+
+
+class FakeSupabase:
+    """Records RPC calls and inserted batches"""
+
+    def __init__(self):
+        self.rpcs = []
+        self.batches = []
+
+    def rpc(self, name, params):
+        self.rpcs.append((name, params))
+        return self
+
+    def table(self, name):
+        return self
+
+    def insert(self, rows):
+        self.batches.append(rows)
+        return self
+
+    def execute(self):
+        return self
+
+
+@pytest.fixture
+def fresh_partitions(monkeypatch):
+    monkeypatch.setattr(data_pipeline, "_ensured_years", set())
+
+
+def test_missing_year_is_derived_from_invoice_date_or_the_row_is_skipped():
+    raw = pd.DataFrame({
+        "Brand": ["Silk", "Silk", "Neo"],
+        "Invoice Date": ["2023-05-04", "2024-01-02", None],
+        "Year": [None, 2024, None],
+        "Month": ["MAY", "JAN", "FEB"],
+        "Value": [1.0, 2.0, 3.0],
+    })
+
+    frame, records = transform(raw, verbose=False)
+
+    assert [record["year"] for record in records] == [2023, 2024]
+    assert len(frame) == 2
+    assert list(frame["brand"]) == ["Silk", "Silk"]
+
+
+def test_partitions_need_the_service_role_key(fresh_partitions, monkeypatch):
+    monkeypatch.setattr(data_pipeline, "get_service_supabase", lambda: None)
+
+    assert ensure_partitions([2024]) is False
+
+
+def test_partitions_are_created_once_with_the_service_client(fresh_partitions, monkeypatch):
+    service = FakeSupabase()
+    monkeypatch.setattr(data_pipeline, "get_service_supabase", lambda: service)
+
+    assert ensure_partitions([2024, 2023, 2024])
+    assert ensure_partitions([2023])
+
+    assert service.rpcs == [("ensure_sales_partition", {"p_year": 2023}),
+                            ("ensure_sales_partition", {"p_year": 2024})]
+
+
+def test_batches_target_a_single_year(fresh_partitions, monkeypatch):
+    service, client = FakeSupabase(), FakeSupabase()
+    monkeypatch.setattr(data_pipeline, "get_service_supabase", lambda: service)
+    records = [{"year": year, "value": i} for i, year in enumerate([2024, 2023, 2024, 2023, 2024])]
+
+    inserted, failed = load(records, client, batch_size=2, verbose=False)
+
+    assert (inserted, failed) == (5, 0)
+    assert [[row["year"] for row in batch] for batch in client.batches] == [[2023, 2023], [2024, 2024], [2024]]
+    # Partitions are created with the service client, never with the API's client
+    assert client.rpcs == []
+    assert len(service.rpcs) == 2
+
+
+def test_partition_function_is_only_granted_to_the_service_role():
+    script = (Path(__file__).parent.parent / "setup_partitioned_sales.sql").read_text()
+    grants = [line for line in script.splitlines() if line.startswith("GRANT EXECUTE ON FUNCTION public.ensure_sales_partition")]
+
+    assert grants == ["GRANT EXECUTE ON FUNCTION public.ensure_sales_partition(integer) TO service_role;"]
+
+
+UNPRUNABLE = "SELECT SUM(value) FROM sales_transactions WHERE EXTRACT(YEAR FROM invoice_date) = 2024"
+
+
+def test_guard_is_strict_on_the_partitioned_schema(monkeypatch):
+    monkeypatch.setattr(query, "PARTITION_GUARD", "")
+    monkeypatch.setattr(query, "_partitioned", True)
+
+    with pytest.raises(PartitionGuardError):
+        query._apply_partition_guard(UNPRUNABLE)
+    query._apply_partition_guard("SELECT SUM(value) FROM sales_transactions WHERE year = 2024")
+
+
+def test_guard_only_warns_on_a_plain_table_or_when_configured(monkeypatch):
+    monkeypatch.setattr(query, "PARTITION_GUARD", "")
+    monkeypatch.setattr(query, "_partitioned", False)
+    query._apply_partition_guard(UNPRUNABLE)
+
+    monkeypatch.setattr(query, "PARTITION_GUARD", "warn")
+    monkeypatch.setattr(query, "_partitioned", True)
+    query._apply_partition_guard(UNPRUNABLE)
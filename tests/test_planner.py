@@ -0,0 +1,22 @@
+import pytest
+
+from src.planner import looks_compound
+
+
+@pytest.mark.parametrize("question", [
+    "Show sales for each brand in 2024",
+    "Total sales in each city for 2025",
+    "Show sales for 2024 and 2025 separately",
+    "Top 5 salesmen by sales in 2025",
+])
+def test_single_queries_skip_the_planner(question):
+    assert not looks_compound(question)
+
+
+@pytest.mark.parametrize("question", [
+    "Compare 2024 vs 2025 sales by channel and show the top salesmen in each",
+    "What were total sales in 2024? Which brand led?",
+    "Sales by brand as well as active stores by city",
+])
+def test_compound_questions_reach_the_planner(question):
+    assert looks_compound(question)
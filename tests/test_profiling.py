@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.responses import StreamingResponse
+
+from src import app as app_module
+from src import profiling
+from src.app import ChatRequest
+from src.profiling import SamplingProfiler, list_profiles, profile_stream
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path / "profiles")
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+
+
+def sampler_running(profiler) -> bool:
+    return any(thread.name == f"profiler-{profiler.id[:8]}" for thread in threading.enumerate())
+
+
+class FakeRequest:
+    headers = {"x-profile": "1", "x-admin-token": "secret"}
+    query_params = {}
+
+
+def test_stream_finishes_the_profile_after_the_last_chunk():
+    profiler = SamplingProfiler("stream").start()
+
+    assert list(profile_stream(profiler, iter([b"a", b"b"]))) == [b"a", b"b"]
+
+    assert not sampler_running(profiler)
+    assert [meta["id"] for meta in list_profiles()] == [profiler.id]
+
+
+def test_disconnect_before_the_body_is_read_still_stops_the_sampler(monkeypatch):
+    started = []
+
+    def handle_chat(request, http_request, profiler=None):
+        started.append(profiler)
+        return StreamingResponse(profile_stream(profiler, iter([b"data: {}\n\n"])))
+
+    monkeypatch.setattr(app_module, "handle_chat", handle_chat)
+
+    response = app_module.chat(ChatRequest(question="Sales by brand", stream=True), FakeRequest(), None)
+    profiler = started[0]
+    assert sampler_running(profiler)
+    assert response.headers["x-profile-id"] == profiler.id
+
+    # The body is never iterated; the response's background task runs after the client is gone
+    asyncio.run(response.background())
+
+    assert not sampler_running(profiler)
+    assert [meta["id"] for meta in list_profiles()] == [profiler.id]
+
+
+def test_failed_handler_stops_the_sampler(monkeypatch):
+    started = []
+
+    def handle_chat(request, http_request, profiler=None):
+        started.append(profiler)
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(app_module, "handle_chat", handle_chat)
+
+    with pytest.raises(RuntimeError):
+        app_module.chat(ChatRequest(question="Sales by brand"), FakeRequest(), None)
+
+    assert not sampler_running(started[0])
+
+
+def test_profiling_needs_the_admin_token(api):
+    response = api.post("/chat", json={"question": "Sales by brand"},
+                        headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+
+    assert response.status_code == 403
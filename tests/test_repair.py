@@ -0,0 +1,132 @@
+import pytest
+
+from src import repair
+from src.repair import SqlRepair, fingerprint_sql
+
+QUESTION = "Total sales by brand"
+BROKEN = "SELECT brnd, SUM(value) FROM sales_transactions GROUP BY brnd"
+FIXED = "SELECT brand, SUM(value) FROM sales_transactions GROUP BY brand"
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """execute_sql stand-in: only FIXED runs; records every executed query"""
+    executed = []
+
+    def execute_sql(sql):
+        executed.append(sql)
+        if sql != FIXED:
+            raise RuntimeError('column "brnd" does not exist')
+        return [{"brand": "Silk", "sum": 10.0}]
+
+    monkeypatch.setattr(repair, "execute_sql", execute_sql)
+    return executed
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    """repair_sql stand-in returning queued answers (exceptions are raised); records every call"""
+    calls = []
+    answers = []
+
+    def repair_sql(question, failed_sql, error):
+        calls.append((failed_sql, error))
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(repair, "repair_sql", repair_sql)
+    return calls, answers
+
+
+def run(sql=BROKEN):
+    loop = SqlRepair(QUESTION, sql, 'column "brnd" does not exist')
+    return loop, list(loop.run())
+
+
+def test_llm_repair_succeeds_and_is_memoized(database, generator, shared_cache):
+    calls, answers = generator
+    answers.append(FIXED)
+
+    loop, events = run()
+
+    assert loop.succeeded and loop.sql == FIXED
+    assert loop.data == [{"brand": "Silk", "sum": 10.0}]
+    assert [e["status"] for e in events] == ["attempt", "succeeded"]
+    assert events[-1]["source"] == "llm"
+    assert shared_cache.get_json("sql_repair", fingerprint_sql(BROKEN)) == FIXED
+
+
+def test_memo_hit_skips_the_generator(database, generator, shared_cache):
+    calls, _ = generator
+    # Same query modulo case and whitespace
+    shared_cache.set_json("sql_repair", fingerprint_sql(BROKEN), FIXED)
+
+    loop, events = run("select brnd,   SUM(value) from sales_transactions group by brnd;")
+
+    assert calls == []
+    assert [e["status"] for e in events] == ["memo_hit", "succeeded"]
+    assert events[-1]["source"] == "memo"
+    assert events[-1]["attempts"] == 0
+    assert loop.sql == FIXED
+
+
+def test_stale_memo_is_dropped_and_repaired_again(database, generator, shared_cache):
+    _, answers = generator
+    answers.append(FIXED)
+    shared_cache.set_json("sql_repair", fingerprint_sql(BROKEN), "SELECT nothing_here FROM sales_transactions")
+
+    loop, events = run()
+
+    assert [e["status"] for e in events] == ["memo_hit", "memo_stale", "attempt", "succeeded"]
+    assert shared_cache.get_json("sql_repair", fingerprint_sql(BROKEN)) == FIXED
+
+
+def test_attempts_stop_at_the_maximum(database, generator, monkeypatch):
+    monkeypatch.setattr(repair, "MAX_REPAIR_ATTEMPTS", 2)
+    calls, answers = generator
+    answers.extend(["SELECT still_broken FROM sales_transactions", "SELECT also_broken FROM sales_transactions"])
+
+    loop, events = run()
+
+    assert not loop.succeeded
+    assert len(calls) == 2
+    # The second attempt sees the error of the first candidate
+    assert calls[1][0] == "SELECT still_broken FROM sales_transactions"
+    assert (events[-1]["status"], events[-1]["reason"], events[-1]["attempts"]) == ("gave_up", "max_attempts", 2)
+
+
+def test_latency_budget_exhaustion_gives_up_before_calling_the_generator(database, generator, monkeypatch):
+    monkeypatch.setattr(repair, "REPAIR_BUDGET_SECONDS", 0)
+    calls, _ = generator
+
+    loop, events = run()
+
+    assert calls == []
+    assert not loop.succeeded
+    assert [e["status"] for e in events] == ["gave_up"]
+    assert events[0]["reason"] == "latency_budget"
+    assert events[0]["attempts"] == 0
+
+
+def test_generation_failure_reports_the_attempts_that_ran(database, generator, monkeypatch):
+    monkeypatch.setattr(repair, "MAX_REPAIR_ATTEMPTS", 3)
+    _, answers = generator
+    answers.append(RuntimeError("LLM unavailable"))
+
+    loop, events = run()
+
+    assert [e["status"] for e in events] == ["attempt", "failed", "gave_up"]
+    assert events[-1]["reason"] == "generation_failed"
+    assert events[-1]["attempts"] == 1
+
+
+def test_giving_up_forgets_the_cached_sql(database, generator, monkeypatch):
+    monkeypatch.setattr(repair, "REPAIR_BUDGET_SECONDS", 0)
+    forgotten = []
+    monkeypatch.setattr(repair, "forget_sql", forgotten.append)
+
+    run()
+
+    assert forgotten == [QUESTION]
@@ -0,0 +1,33 @@
+import pytest
+
+from src import sampling
+from src.sampling import StratifiedSample
+
+
+def test_full_sample_reproduces_exact_totals(sales_frame):
+    sample = StratifiedSample.from_frame(sales_frame, fraction=1.0, seed=1)
+    rows, info = sample.estimate("SELECT month, SUM(value) AS sales FROM sales_transactions GROUP BY month ORDER BY month")
+    expected = sales_frame.groupby("month")["value"].sum().astype(float)
+    assert [row["month"] for row in rows] == expected.index.tolist()
+    assert [round(row["sales"], 2) for row in rows] == expected.round(2).tolist()
+    assert all(bounds["sales"]["margin"] == 0 for bounds in info["intervals"])
+    assert info["population_rows"] == len(sales_frame)
+
+
+def test_month_name_filter_is_estimated(sales_frame):
+    sample = StratifiedSample.from_frame(sales_frame, fraction=0.2, seed=1)
+    rows, info = sample.estimate("SELECT SUM(value) AS sales FROM sales_transactions WHERE month = 'JAN'")
+    exact = float(sales_frame.loc[sales_frame["month"] == 1, "value"].astype(float).sum())
+    bounds = info["intervals"][0]["sales"]
+    assert rows[0]["sales"] is not None
+    assert bounds["low"] <= exact <= bounds["high"]
+
+
+def test_append_needs_an_existing_sample(sales_frame, tmp_path, monkeypatch):
+    monkeypatch.setenv("APPROX_SAMPLE_PATH", str(tmp_path / "sample.npz"))
+    with pytest.raises(FileNotFoundError):
+        sampling.build_and_save_sample(sales_frame, append=True)
+    first = sampling.build_and_save_sample(sales_frame.iloc[:1000])
+    appended = sampling.build_and_save_sample(sales_frame.iloc[1000:], append=True)
+    assert first.population_rows == 1000
+    assert appended.population_rows == len(sales_frame)
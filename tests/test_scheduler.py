@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from src import app as app_module
+from src.ratelimit import TokenBucket
+from src.scheduler import BATCH, INTERACTIVE, LLMScheduler, SchedulerOverloaded, current_priority_class, priority_class
+
+MODEL = "test-model"
+
+
+def wait_for_queue(scheduler, length, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while scheduler.queue_length(MODEL) < length:
+        assert time.monotonic() < deadline, "calls were not queued in time"
+        time.sleep(0.005)
+
+
+def test_interactive_calls_go_first_then_sql_before_narration_before_charts():
+    scheduler = LLMScheduler()
+    # One grant every 50 ms, so the grant order is also the order the threads record
+    scheduler._buckets[MODEL] = TokenBucket(20, capacity=1)
+    scheduler.backoff(MODEL, 0.3)
+    granted = []
+    lock = threading.Lock()
+
+    def call(name, kind, priority):
+        scheduler.acquire(MODEL, kind, priority)
+        with lock:
+            granted.append(name)
+
+    calls = [
+        ("batch chart", "chart", BATCH),
+        ("batch sql", "sql", BATCH),
+        ("interactive chart", "chart", INTERACTIVE),
+        ("interactive answer", "answer", INTERACTIVE),
+        ("interactive sql", "sql", INTERACTIVE),
+    ]
+    threads = []
+    for queued, args in enumerate(calls, start=1):
+        thread = threading.Thread(target=call, args=args)
+        thread.start()
+        threads.append(thread)
+        # Queue them one at a time so arrival order is deterministic
+        wait_for_queue(scheduler, queued)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert granted == ["interactive sql", "interactive answer", "interactive chart", "batch sql", "batch chart"]
+
+
+def test_priority_class_is_per_thread_and_restored():
+    assert current_priority_class() == INTERACTIVE
+    with priority_class(BATCH):
+        assert current_priority_class() == BATCH
+        seen = []
+        worker = threading.Thread(target=lambda: seen.append(current_priority_class()))
+        worker.start()
+        worker.join()
+        assert seen == [INTERACTIVE]
+    assert current_priority_class() == INTERACTIVE
+
+
+def test_full_queue_sheds_interactive_calls_and_makes_batch_wait():
+    scheduler = LLMScheduler(max_queue=1, queue_timeout=0.2)
+    scheduler.backoff(MODEL, 60)
+    # A suspended wait() keeps its place at the head of the queue
+    holder = scheduler.wait(MODEL, "sql", INTERACTIVE)
+    assert next(holder) == 1
+
+    with pytest.raises(SchedulerOverloaded) as shed:
+        scheduler.admission_check(MODEL)
+    assert shed.value.retry_after == 2.0
+    with pytest.raises(SchedulerOverloaded, match="is full"):
+        scheduler.acquire(MODEL, "sql", INTERACTIVE)
+
+    started = time.monotonic()
+    with pytest.raises(SchedulerOverloaded, match="Timed out"):
+        scheduler.acquire(MODEL, "sql", BATCH)
+    assert time.monotonic() - started >= 0.2
+
+    holder.close()
+    assert scheduler.queue_length(MODEL) == 0
+
+
+def test_queued_calls_report_their_position():
+    scheduler = LLMScheduler()
+    scheduler.backoff(MODEL, 0.3)
+    holder = threading.Thread(target=scheduler.acquire, args=(MODEL, "sql", INTERACTIVE))
+    holder.start()
+    wait_for_queue(scheduler, 1)
+
+    positions = list(scheduler.wait(MODEL, "chart", INTERACTIVE))
+
+    # Granted as soon as it reaches the head of the queue
+    assert positions == [2]
+    assert scheduler.stats()[MODEL]["queued"] == 0
+    holder.join(timeout=5)
+
+
+def test_chat_returns_429_with_retry_after_when_the_queue_is_full(api, monkeypatch):
+    full = LLMScheduler(max_queue=0)
+    monkeypatch.setattr(app_module, "get_scheduler", lambda: full)
+
+    response = api.post("/chat", json={"question": "Total sales by brand"})
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2"
+    assert response.json()["status"] == "error"
@@ -0,0 +1,102 @@
+import datetime
+import decimal
+import gzip
+import json
+import time
+import zlib
+
+import numpy as np
+
+from src.serialization import SSEEncoder, dumps, sse_frame
+
+
+def frames(chunks) -> list:
+    """Decoded SSE events in the concatenated output"""
+    text = b"".join(chunks).decode("utf-8")
+    return [json.loads(frame[len("data: "):]) for frame in text.split("\n\n") if frame]
+
+
+def test_decimal_dates_and_numpy_values_are_encoded():
+    encoded = json.loads(dumps({
+        "total": decimal.Decimal("1236974.78"),
+        "count": decimal.Decimal("42"),
+        "day": datetime.date(2024, 1, 31),
+        "units": np.int64(7),
+        "share": np.float64(0.5),
+    }))
+
+    assert encoded == {"total": 1236974.78, "count": 42, "day": "2024-01-31", "units": 7, "share": 0.5}
+    assert isinstance(encoded["count"], int)
+
+
+def test_chunks_within_the_window_share_one_frame():
+    events = [{"type": "answer_chunk", "content": word} for word in ("Sales ", "rose ", "4%")]
+    events.append({"type": "complete"})
+
+    chunks = list(SSEEncoder(window_ms=10_000).stream(events))
+
+    # The merged frame is written together with the event that ended it
+    assert len(chunks) == 1
+    assert frames(chunks) == [{"type": "answer_chunk", "content": "Sales rose 4%"}, {"type": "complete"}]
+
+
+def test_window_expiry_flushes_while_the_next_event_is_generated():
+    def events():
+        yield {"type": "answer_chunk", "content": "first"}
+        time.sleep(0.3)
+        yield {"type": "answer_chunk", "content": "second"}
+
+    started = time.monotonic()
+    arrivals = []
+    for chunk in SSEEncoder(window_ms=20).stream(events()):
+        arrivals.append((time.monotonic() - started, frames([chunk])))
+
+    assert arrivals[0][1] == [{"type": "answer_chunk", "content": "first"}]
+    assert arrivals[0][0] < 0.25
+    assert arrivals[-1][1] == [{"type": "answer_chunk", "content": "second"}]
+
+
+def test_byte_limit_and_type_changes_flush_the_pending_frame():
+    events = [
+        {"type": "sql_chunk", "content": "SELECT "},
+        {"type": "answer_chunk", "content": "abcd"},
+        {"type": "answer_chunk", "content": "efgh"},
+        {"type": "answer_chunk", "content": "ij"},
+    ]
+
+    decoded = frames(SSEEncoder(window_ms=10_000, max_bytes=8).stream(events))
+
+    assert decoded == [
+        {"type": "sql_chunk", "content": "SELECT "},
+        {"type": "answer_chunk", "content": "abcdefgh"},
+        {"type": "answer_chunk", "content": "ij"},
+    ]
+
+
+def test_chunks_with_extra_fields_are_not_merged():
+    events = [{"type": "answer_chunk", "content": "a", "index": 1}, {"type": "answer_chunk", "content": "b", "index": 2}]
+
+    assert frames(SSEEncoder(window_ms=10_000).stream(events)) == events
+
+
+def test_zero_window_writes_every_event():
+    events = [{"type": "answer_chunk", "content": "a"}, {"type": "answer_chunk", "content": "b"}]
+
+    chunks = list(SSEEncoder(window_ms=0).stream(events))
+
+    assert chunks == [sse_frame(event) for event in events]
+
+
+def test_gzip_output_is_one_stream_readable_after_every_chunk():
+    events = [{"type": "status", "message": "Generating SQL..."},
+              {"type": "answer_chunk", "content": "done"},
+              {"type": "complete", "total": decimal.Decimal("10.50")}]
+
+    chunks = list(SSEEncoder(window_ms=10_000, gzip=True).stream(events))
+
+    assert frames([gzip.decompress(b"".join(chunks))]) == [
+        events[0], events[1], {"type": "complete", "total": 10.5},
+    ]
+    # Sync flushes: the first chunk alone already decodes to the first event
+    partial = zlib.decompressobj(31).decompress(chunks[0])
+    assert frames([partial]) == [events[0]]
@@ -0,0 +1,71 @@
+import pytest
+
+from src.value_index import ValueIndex
+
+
+@pytest.fixture(scope="module")
+def index(sales_frame):
+    return ValueIndex.from_frame(sales_frame)
+
+
+def resolved(index, question):
+    return [(item["phrase"], item["column"], item["value"]) for item in index.resolve(question)]
+
+
+def test_exact_values_resolve_in_every_matching_column(index):
+    assert resolved(index, "silk sales") == [("silk", "brand", "Silk"), ("silk", "sub_brand", "Silk")]
+
+
+def test_mentions_do_not_run_across_filler_words(index):
+    found = resolved(index, "sales of silk in doha")
+
+    assert ("silk", "brand", "Silk") in found
+    assert ("doha", "city", "DOHA") in found
+    assert all(phrase in ("silk", "doha") for phrase, _, _ in found)
+
+
+def test_one_word_of_a_long_customer_name_is_not_a_match(index):
+    # The sample has customers such as 'AL MEERA-AL KHOR (NEW)' but no AL KHOR city
+    assert any("AL KHOR" in name for name in index.values["customer_account_name"])
+
+    assert resolved(index, "show sales in Khor") == []
+
+
+def test_plural_of_a_word_inside_customer_names_is_not_a_match(index):
+    assert any("HYPERMARKET" in name for name in index.values["customer_account_name"])
+
+    assert resolved(index, "how did hypermarkets do") == []
+
+
+def test_typos_of_a_whole_value_still_resolve(index):
+    assert ("solerne", "brand", "Solerone") in resolved(index, "solerne sales")
+
+
+def test_ties_prefer_low_cardinality_columns():
+    index = ValueIndex({
+        "city": {"AL KHOR": 40, "DOHA": 21994},
+        "customer_account_name": {"AL KHOR": 500, **{f"STORE {i}": 1 for i in range(50)}},
+    })
+
+    matches = index.lookup("al khor")
+
+    assert [column for column, *_ in matches] == ["city", "customer_account_name"]
+
+
+def test_partial_matches_score_by_coverage_of_the_value():
+    index = ValueIndex({
+        "city": {"AL KHOR": 40},
+        "customer_account_name": {"AL MEERA-AL KHOR (NEW)": 136, "DANA GULF SUPER MARKET-SHAR-E-ASMAKH": 5},
+    })
+
+    assert [value for _, value, _, _ in index.lookup("khor")] == ["AL KHOR"]
+    assert index.lookup("sharjah") == []
+
+
+def test_prompt_hints_offer_candidates_not_instructions(index):
+    hints = index.prompt_hints("silk sales")
+
+    assert "may refer to" in hints
+    assert "brand = 'Silk'" in hints
+    assert "EXACT" not in hints
+    assert "brand=4" in hints